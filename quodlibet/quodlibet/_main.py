@@ -374,7 +374,7 @@ def run(window, before_quit=None):
 
 def enable_periodic_save(save_library):
     import quodlibet.library
-    from quodlibet.util import copool
+    from quodlibet.util import copool, compilecache
     from quodlibet import config
 
     timeout = 5 * 60 * 1000  # 5 minutes
@@ -382,6 +382,7 @@ def enable_periodic_save(save_library):
     def periodic_config_save():
         while 1:
             config.save()
+            compilecache.save()
             yield
 
     copool.add(periodic_config_save, timeout=timeout)
@@ -42,6 +42,7 @@ from quodlibet.qltk.menubutton import MenuButton
 from quodlibet.qltk import Icons
 from quodlibet.util import copool, connect_destroy
 from quodlibet.util.library import background_filter
+from quodlibet.util.collection import prefetch
 from quodlibet.util import connect_obj, DeferredSignal
 from quodlibet.qltk.cover import get_no_cover_pixbuf
 from quodlibet.qltk.image import add_border_widget, get_surface_for_pixbuf
@@ -178,6 +179,24 @@ def compare_avgplaycount(a1, a2):
             cmp(a1.key, a2.key))
 
 
+SORT_KEYS = {
+    4: ["~#rating"],
+    5: ["~#playcount:avg"],
+}
+"""Numeric album keys compared by the sort orders, by sort order index"""
+
+
+def prefetch_sort_keys(model, num):
+    """Computes the album values a sort order compares in one pass, before
+    sorting compares the albums one by one
+    """
+
+    keys = SORT_KEYS.get(num)
+    if keys:
+        albums = (row[0].album for row in model)
+        prefetch((a for a in albums if a is not None), keys)
+
+
 class PreferencesButton(Gtk.HBox):
     def __init__(self, browser, model):
         super(PreferencesButton, self).__init__()
@@ -205,6 +224,7 @@ class PreferencesButton(Gtk.HBox):
                                  use_underline=True)
             model.set_sort_func(100 + i, func)
             if i == active:
+                prefetch_sort_keys(model, i)
                 model.set_sort_column_id(100 + i, Gtk.SortType.ASCENDING)
                 item.set_active(True)
             item.connect("toggled",
@@ -230,6 +250,7 @@ class PreferencesButton(Gtk.HBox):
     def __sort_toggled_cb(self, item, model, num):
         if item.get_active():
             config.set("browsers", "album_sort", str(num))
+            prefetch_sort_keys(model, num)
             model.set_sort_column_id(100 + num, Gtk.SortType.ASCENDING)
 
     def __compare_title(self, model, i1, i2, data):
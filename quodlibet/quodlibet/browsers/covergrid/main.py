@@ -19,7 +19,7 @@ from .prefs import Preferences, DEFAULT_PATTERN_TEXT
 from quodlibet.browsers.albums.models import (AlbumModel,
     AlbumFilterModel, AlbumSortModel)
 from quodlibet.browsers.albums.main import (get_cover_size,
-    AlbumTagCompletion, PreferencesButton, VisibleUpdate)
+    AlbumTagCompletion, PreferencesButton, VisibleUpdate, prefetch_sort_keys)
 
 import quodlibet
 from quodlibet import app
@@ -73,6 +73,7 @@ class PreferencesButton(PreferencesButton):
                                  use_underline=True)
             model.set_sort_func(100 + i, func)
             if i == active:
+                prefetch_sort_keys(model, i)
                 model.set_sort_column_id(100 + i, Gtk.SortType.ASCENDING)
                 item.set_active(True)
             item.connect("toggled",
@@ -196,7 +196,7 @@ class PanedBrowser(Browser, util.InstanceTracker):
         query = self._sb_box.get_query(star.keys())
         if query.is_parsable:
             self._filter = query.search
-            songs = list(filter(self._filter, self._library))
+            songs = query.filter(self._library)
             bg = background_filter()
             if bg:
                 songs = list(filter(bg, songs))
@@ -76,7 +76,8 @@ def process_arguments(argv):
     actions = []
     controls = ["next", "previous", "play", "pause", "play-pause", "stop",
                 "hide-window", "show-window", "toggle-window",
-                "focus", "quit", "unfilter", "refresh", "force-previous"]
+                "focus", "quit", "unfilter", "refresh", "force-previous",
+                "generate-thumbnails"]
     controls_opt = ["seek", "repeat", "query", "volume", "filter",
                     "set-rating", "set-browser", "open-browser", "shuffle",
                     "song-list", "queue", "stop-after", "random",
@@ -109,6 +110,8 @@ def process_arguments(argv):
         ("focus", _("Focus the running player")),
         ("unfilter", _("Remove active browser filters")),
         ("refresh", _("Refresh and rescan library")),
+        ("generate-thumbnails",
+            _("Create the thumbnails of all album covers in the background")),
         ("list-browsers", _("List available browsers")),
         ("print-playlist", _("Print the current playlist")),
         ("print-queue", _("Print the contents of the queue")),
@@ -506,6 +506,12 @@ def _refresh(app):
     scan_library(app.library, False)
 
 
+@registry.register("generate-thumbnails")
+def _generate_thumbnails(app):
+    from quodlibet.util.cover.thumbgen import pregenerate_thumbnails
+    pregenerate_thumbnails(app.library, app.cover_manager)
+
+
 @registry.register("print-query", args=1)
 def _print_query(app, query):
     """Queries library, dumping filenames of matches to stdout
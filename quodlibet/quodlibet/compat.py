@@ -34,6 +34,8 @@ if PY2:
     izip_longest, izip
     import Queue as queue
     queue
+    import copy_reg as copyreg
+    copyreg
 
     xrange = xrange
     long = long
@@ -106,6 +108,8 @@ elif PY3:
     import codecs
     import queue
     queue
+    import copyreg
+    copyreg
 
     xrange = range
     long = int
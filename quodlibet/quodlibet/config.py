@@ -54,6 +54,10 @@ INITIAL = {
     "library": {
         "exclude": "",
         "refresh_on_start": "true",
+
+        # number of processes reading new files during a scan,
+        # 0 = one per CPU, 1 = load in the main process
+        "scan_workers": "0",
     },
 
     # State about the player, to restore on startup
@@ -273,6 +277,9 @@ INITIAL = {
         "force_filename": "false",
         "filename": "folder.jpg",
         "search_filenames": "cover.jpg,folder.jpg,.folder.jpg",
+
+        # memory for decoded covers kept around, in MiB
+        "pixbuf_cache_size": "32",
     },
 
     "display": {
@@ -339,6 +346,12 @@ def init(filename=None):
                 pass
 
 
+def get_filename():
+    """Returns the file the config got loaded from or None"""
+
+    return _filename
+
+
 def save(filename=None):
     """Writes the active config to filename, ignoring all possible errors.
 
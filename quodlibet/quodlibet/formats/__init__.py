@@ -12,8 +12,11 @@ from ._audio import PEOPLE, AudioFile, DUMMY_SONG, decode_value, \
 from ._image import EmbeddedImage, APICType
 from ._misc import AudioFileError, init, MusicFile, types, loaders, filter, \
     mimes
-from ._serialize import load_audio_files, dump_audio_files, SerializationError
+from ._serialize import load_audio_files, dump_audio_files, \
+    load_audio_files_many, SerializationError
+from ._tagcache import TagCache, init_tag_cache, get_tag_cache
 
 AudioFile, AudioFileError, EmbeddedImage, DUMMY_SONG, PEOPLE, decode_value,
 APICType, FILESYSTEM_TAGS, TIME_TAGS, init, MusicFile, types, loaders, filter,
-mimes, load_audio_files, dump_audio_files, SerializationError
+mimes, load_audio_files, dump_audio_files, load_audio_files_many,
+SerializationError, TagCache, init_tag_cache, get_tag_cache
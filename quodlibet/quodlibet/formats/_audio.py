@@ -73,6 +73,148 @@ VARIOUS_ARTISTS_VALUES = 'V.A.', 'various artists', 'Various Artists'
 """Values for ~people representing lots of people, most important last"""
 
 
+SHARED_TAGS = frozenset([
+    "~mountpoint", "~encoding", "~#bitrate", "~#samplerate", "~#channels",
+    "~#bitdepth", "~#rating", "~#playcount", "~#skipcount",
+    "album", "albumsort", "albumartist", "albumartistsort", "artist",
+    "artistsort", "composer", "composersort", "performer", "conductor",
+    "lyricist", "arranger", "author", "originalartist", "genre", "date",
+    "originaldate", "year", "discnumber", "tracknumber", "discsubtitle",
+    "labelid", "organization", "label", "language", "grouping", "media",
+    "releasecountry", "copyright", "encodedby", "encoder", "website",
+    "musicbrainz_albumid", "musicbrainz_artistid",
+    "musicbrainz_albumartistid", "musicbrainz_releasegroupid",
+    "musicbrainz_albumstatus", "musicbrainz_albumtype",
+    "replaygain_album_gain", "replaygain_album_peak",
+    "replaygain_reference_loudness",
+])
+"""Tags with values usually shared between many songs"""
+
+_MAX_SHARED = 500000
+_shared_keys = {}
+_shared_values = {}
+
+
+def share_key(key):
+    """Returns an equal tag name, the same object as for other songs if
+    possible, to reduce the memory used by large libraries.
+
+    Args:
+        key (str)
+    Returns:
+        str
+    """
+
+    shared = _shared_keys.get(key)
+    if shared is not None:
+        return shared
+    if len(_shared_keys) < _MAX_SHARED:
+        _shared_keys[key] = key
+    return key
+
+
+def share_value(value):
+    """Like `share_key()` but for the value of one of `SHARED_TAGS`.
+
+    Args:
+        value (object)
+    Returns:
+        object
+    """
+
+    # 1 == 1.0 == True and u"a" == b"a" on PY2, so one table per type
+    values = _shared_values.get(type(value))
+    if values is None:
+        values = _shared_values[type(value)] = {}
+    shared = values.get(value)
+    if shared is not None:
+        return shared
+    if len(values) < _MAX_SHARED:
+        values[value] = value
+    return value
+
+
+def share_tags(tags):
+    """Makes the tag names of a dict and the values of `SHARED_TAGS` the
+    same objects as for other songs, see `share_key()`. The dict only gets
+    rebuilt if one of its names isn't shared yet.
+
+    Args:
+        tags (dict): a plain dict or dict subclass, its `__setitem__` isn't
+            used
+    """
+
+    get_key = _shared_keys.get
+    for key in tags:
+        if get_key(key) is not key:
+            pairs = list(tags.items())
+            dict.clear(tags)
+            dict.update(tags, [(share_key(k), v) for k, v in pairs])
+            break
+
+    for key in SHARED_TAGS.intersection(tags):
+        dict.__setitem__(tags, key, share_value(tags[key]))
+
+
+MEMOIZED_TAGS = frozenset([
+    "~people", "~people:real", "~people:roles", "~peoplesort",
+    "~peoplesort:roles", "~performers", "~performer", "~performerssort",
+    "~performersort", "~performers:roles", "~performer:roles",
+    "~performerssort:roles", "~performersort:roles", "~basename",
+    "~dirname", "~uri", "~format", "~codec", "~encoding", "~language",
+    "~#date", "~year", "~#year", "~originalyear", "~#originalyear",
+    "~#track", "~#disc", "~#tracks", "~#discs",
+])
+"""Synthetic tags which only depend on the song's own tags, so their
+values get remembered until the song changes"""
+
+VOLATILE_TAGS = ("playlists", "lyrics", "rating")
+"""Parts of synthetic tag names with values not only depending on the
+song's tags, or changing without the song changing"""
+
+_memoized = {}
+_memo_stats = [0, 0]
+
+
+def _is_memoized(key):
+    """If the value of a synthetic or tied tag can be remembered"""
+
+    try:
+        return _memoized[key]
+    except KeyError:
+        pass
+
+    if "~" in key[1:]:
+        result = all(
+            t in MEMOIZED_TAGS or "~" not in t for t in util.tagsplit(key))
+    else:
+        result = key in MEMOIZED_TAGS
+
+    if len(_memoized) > 1000:
+        _memoized.clear()
+    _memoized[key] = result
+    return result
+
+
+def get_memo_stats():
+    """Returns how often synthetic tag values were taken from the per song
+    memo since the last reset, see `MEMOIZED_TAGS`.
+
+    Returns:
+        Tuple[int, int, float]: (hits, misses, hit rate)
+    """
+
+    hits, misses = _memo_stats
+    total = hits + misses
+    return hits, misses, (float(hits) / total if total else 0.0)
+
+
+def reset_memo_stats():
+    """Resets the counters of `get_memo_stats()`"""
+
+    _memo_stats[:] = [0, 0]
+
+
 def decode_value(tag, value):
     """Returns a unicode representation of the passed value, based on
     the type and the tag it originated from.
@@ -211,18 +353,60 @@ class AudioFile(dict, ImageContainer):
         else:
             value = text_type(value)
 
+        key = share_key(key)
+        if key in SHARED_TAGS:
+            value = share_value(value)
         dict.__setitem__(self, key, value)
-
-        pop = self.__dict__.pop
-        pop("album_key", None)
-        pop("sort_key", None)
+        self._forget_derived()
 
     def __delitem__(self, key):
         dict.__delitem__(self, key)
+        self._forget_derived()
+
+    @property
+    def memo(self):
+        """A dict for remembering values derived from the tags, emptied
+        whenever they change. Keys have to be unique for each kind of
+        value, like the object computing it.
+        """
+
+        memo = self.__dict__.get("_memo")
+        if memo is None:
+            memo = self.__dict__["_memo"] = {}
+        return memo
+
+    def _forget_derived(self):
+        """Drops everything computed from the tags, call after they
+        change
+        """
 
         pop = self.__dict__.pop
         pop("album_key", None)
         pop("sort_key", None)
+        pop("_memo", None)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._forget_derived()
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self._forget_derived()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._forget_derived()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        self._forget_derived()
+        return value
+
+    def clear(self):
+        dict.clear(self)
+        self._forget_derived()
 
     @property
     def key(self):
@@ -272,6 +456,8 @@ class AudioFile(dict, ImageContainer):
             raise
         else:
             self.update(saved)
+        finally:
+            self._forget_derived()
 
     def realkeys(self):
         """Returns a list of keys that are not internal, i.e. they don't
@@ -317,183 +503,27 @@ class AudioFile(dict, ImageContainer):
         """
 
         if key[:1] == "~":
-            key = key[1:]
-            if "~" in key:
-                real_key = "~" + key
-                values = []
-                sub_tags = util.tagsplit(real_key)
-                # If it's genuinely a tied tag (not ~~people etc), we want
-                # to delimit the multi-values separately from the tying
-                j = joiner if len(sub_tags) > 1 else "\n"
-                for t in sub_tags:
-                    vs = [decode_value(real_key, v) for v in (self.list(t))]
-                    v = j.join(vs)
-                    if v:
-                        values.append(v)
-                return connector.join(values) or default
-            elif key == "#track":
-                try:
-                    return int(self["tracknumber"].split("/")[0])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "#disc":
-                try:
-                    return int(self["discnumber"].split("/")[0])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "length":
-                length = self.get("~#length")
-                if length is None:
-                    return default
-                else:
-                    return util.format_time_display(length)
-            elif key == "#rating":
-                return dict.get(self, "~" + key, config.RATINGS.default)
-            elif key == "rating":
-                return util.format_rating(self("~#rating"))
-            elif key == "people":
-                return "\n".join(self.list_unique(PEOPLE)) or default
-            elif key == "people:real":
-                # Issue 1034: Allow removal of V.A. if others exist.
-                unique = self.list_unique(PEOPLE)
-                # Order is important, for (unlikely case): multiple removals
-                for val in VARIOUS_ARTISTS_VALUES:
-                    if len(unique) > 1 and val in unique:
-                        unique.remove(val)
-                return "\n".join(unique) or default
-            elif key == "people:roles":
-                return (self._role_call("performer", PEOPLE)
-                        or default)
-            elif key == "peoplesort":
-                return ("\n".join(self.list_unique(PEOPLE_SORT)) or
-                        self("~people", default, connector))
-            elif key == "peoplesort:roles":
-                # Ignores non-sort tags if there are any sort tags (e.g. just
-                # returns "B" for {artist=A, performersort=B}).
-                # TODO: figure out the "correct" behavior for mixed sort tags
-                return (self._role_call("performersort", PEOPLE_SORT)
-                        or self("~peoplesort", default, connector))
-            elif key in ("performers", "performer"):
-                return self._prefixvalue("performer") or default
-            elif key in ("performerssort", "performersort"):
-                return (self._prefixvalue("performersort") or
-                        self("~" + key[-4:], default, connector))
-            elif key in ("performers:roles", "performer:roles"):
-                return (self._role_call("performer") or default)
-            elif key in ("performerssort:roles", "performersort:roles"):
-                return (self._role_call("performersort")
-                        or self("~" + key.replace("sort", ""), default,
-                                connector))
-            elif key == "basename":
-                return os.path.basename(self["~filename"]) or self["~filename"]
-            elif key == "dirname":
-                return os.path.dirname(self["~filename"]) or self["~filename"]
-            elif key == "uri":
-                try:
-                    return self["~uri"]
-                except KeyError:
-                    return fsn2uri(self["~filename"])
-            elif key == "format":
-                return self.get("~format", text_type(self.format))
-            elif key == "codec":
-                codec = self.get("~codec")
-                if codec is None:
-                    return self("~format")
-                return codec
-            elif key == "encoding":
-                parts = filter(None,
-                               [self.get("~encoding"), self.get("encodedby")])
-                encoding = u"\n".join(parts)
-                return encoding or default
-            elif key == "language":
-                codes = self.list("language")
-                if not codes:
-                    return default
-                return u"\n".join(iso639.translate(c) or c for c in codes)
-            elif key == "bitrate":
-                return util.format_bitrate(self("~#bitrate"))
-            elif key == "#date":
-                date = self.get("date")
-                if date is None:
-                    return default
-                return util.date_key(date)
-            elif key == "year":
-                return self.get("date", default)[:4]
-            elif key == "#year":
-                try:
-                    return int(self.get("date", default)[:4])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "originalyear":
-                return self.get("originaldate", default)[:4]
-            elif key == "#originalyear":
-                try:
-                    return int(self.get("originaldate", default)[:4])
-                except (ValueError, TypeError, KeyError):
-                    return default
-            elif key == "#tracks":
-                try:
-                    return int(self["tracknumber"].split("/")[1])
-                except (ValueError, IndexError, TypeError, KeyError):
-                    return default
-            elif key == "#discs":
-                try:
-                    return int(self["discnumber"].split("/")[1])
-                except (ValueError, IndexError, TypeError, KeyError):
-                    return default
-            elif key == "lyrics":
-                # First, try the embedded lyrics.
-                try:
-                    return self[key]
-                except KeyError:
-                    pass
+            if not _is_memoized(key):
+                return self._synthesize(key, default, connector, joiner)
 
-                # If there are no embedded lyrics, try to read them from
-                # the external file.
-                fn = self.lyric_filename
-                try:
-                    fileobj = open(fn, "rb")
-                except EnvironmentError:
-                    return default
-                else:
-                    print_d("Reading lyrics from %s" % fn)
-                    return fileobj.read().decode("utf-8", "replace")
-            elif key == "filesize":
-                return util.format_size(self("~#filesize", 0))
-            elif key == "playlists":
-                # See Issue 876
-                # Avoid circular references from formats/__init__.py
-                from quodlibet.util.collection import Playlist
-                playlists = Playlist.playlists_featuring(self)
-                return "\n".join([s.name for s in playlists]) or default
-            elif key.startswith("#replaygain_"):
-                try:
-                    val = self.get(key[1:], default)
-                    return round(float(val.split(" ")[0]), 2)
-                except (ValueError, TypeError, AttributeError):
-                    return default
-            elif key[:1] == "#":
-                key = "~" + key
-                if key in self:
-                    return self[key]
-                elif key in NUMERIC_ZERO_DEFAULT:
-                    return 0
-                else:
-                    try:
-                        val = self[key[2:]]
-                    except KeyError:
-                        return default
-                    try:
-                        return int(val)
-                    except ValueError:
-                        try:
-                            return float(val)
-                        except ValueError:
-                            return default
+            memo = self.memo
+            if default == u"" and connector == " - " and joiner == ", ":
+                memo_key = key
             else:
-                return dict.get(self, "~" + key, default)
-
-        elif key == "title":
+                memo_key = (key, default, connector, joiner)
+            try:
+                value = memo[memo_key]
+            except KeyError:
+                _memo_stats[1] += 1
+                value = memo[memo_key] = self._synthesize(
+                    key, default, connector, joiner)
+            except TypeError:
+                # unhashable default
+                return self._synthesize(key, default, connector, joiner)
+            else:
+                _memo_stats[0] += 1
+            return value
+        if key == "title":
             title = dict.get(self, "title")
             if title is None:
                 basename = self("~basename")
@@ -508,6 +538,185 @@ class AudioFile(dict, ImageContainer):
                 key = SORT_TO_TAG[key]
         return dict.get(self, key, default)
 
+    def _synthesize(self, key, default, connector, joiner):
+        """Computes the value of a synthetic or tied tag for `__call__`"""
+
+        key = key[1:]
+        if "~" in key:
+            real_key = "~" + key
+            values = []
+            sub_tags = util.tagsplit(real_key)
+            # If it's genuinely a tied tag (not ~~people etc), we want
+            # to delimit the multi-values separately from the tying
+            j = joiner if len(sub_tags) > 1 else "\n"
+            for t in sub_tags:
+                vs = [decode_value(real_key, v) for v in (self.list(t))]
+                v = j.join(vs)
+                if v:
+                    values.append(v)
+            return connector.join(values) or default
+        elif key == "#track":
+            try:
+                return int(self["tracknumber"].split("/")[0])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "#disc":
+            try:
+                return int(self["discnumber"].split("/")[0])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "length":
+            length = self.get("~#length")
+            if length is None:
+                return default
+            else:
+                return util.format_time_display(length)
+        elif key == "#rating":
+            return dict.get(self, "~" + key, config.RATINGS.default)
+        elif key == "rating":
+            return util.format_rating(self("~#rating"))
+        elif key == "people":
+            return "\n".join(self.list_unique(PEOPLE)) or default
+        elif key == "people:real":
+            # Issue 1034: Allow removal of V.A. if others exist.
+            unique = self.list_unique(PEOPLE)
+            # Order is important, for (unlikely case): multiple removals
+            for val in VARIOUS_ARTISTS_VALUES:
+                if len(unique) > 1 and val in unique:
+                    unique.remove(val)
+            return "\n".join(unique) or default
+        elif key == "people:roles":
+            return (self._role_call("performer", PEOPLE)
+                    or default)
+        elif key == "peoplesort":
+            return ("\n".join(self.list_unique(PEOPLE_SORT)) or
+                    self("~people", default, connector))
+        elif key == "peoplesort:roles":
+            # Ignores non-sort tags if there are any sort tags (e.g. just
+            # returns "B" for {artist=A, performersort=B}).
+            # TODO: figure out the "correct" behavior for mixed sort tags
+            return (self._role_call("performersort", PEOPLE_SORT)
+                    or self("~peoplesort", default, connector))
+        elif key in ("performers", "performer"):
+            return self._prefixvalue("performer") or default
+        elif key in ("performerssort", "performersort"):
+            return (self._prefixvalue("performersort") or
+                    self("~" + key[-4:], default, connector))
+        elif key in ("performers:roles", "performer:roles"):
+            return (self._role_call("performer") or default)
+        elif key in ("performerssort:roles", "performersort:roles"):
+            return (self._role_call("performersort")
+                    or self("~" + key.replace("sort", ""), default,
+                            connector))
+        elif key == "basename":
+            return os.path.basename(self["~filename"]) or self["~filename"]
+        elif key == "dirname":
+            return os.path.dirname(self["~filename"]) or self["~filename"]
+        elif key == "uri":
+            try:
+                return self["~uri"]
+            except KeyError:
+                return fsn2uri(self["~filename"])
+        elif key == "format":
+            return self.get("~format", text_type(self.format))
+        elif key == "codec":
+            codec = self.get("~codec")
+            if codec is None:
+                return self("~format")
+            return codec
+        elif key == "encoding":
+            parts = filter(None,
+                           [self.get("~encoding"), self.get("encodedby")])
+            encoding = u"\n".join(parts)
+            return encoding or default
+        elif key == "language":
+            codes = self.list("language")
+            if not codes:
+                return default
+            return u"\n".join(iso639.translate(c) or c for c in codes)
+        elif key == "bitrate":
+            return util.format_bitrate(self("~#bitrate"))
+        elif key == "#date":
+            date = self.get("date")
+            if date is None:
+                return default
+            return util.date_key(date)
+        elif key == "year":
+            return self.get("date", default)[:4]
+        elif key == "#year":
+            try:
+                return int(self.get("date", default)[:4])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "originalyear":
+            return self.get("originaldate", default)[:4]
+        elif key == "#originalyear":
+            try:
+                return int(self.get("originaldate", default)[:4])
+            except (ValueError, TypeError, KeyError):
+                return default
+        elif key == "#tracks":
+            try:
+                return int(self["tracknumber"].split("/")[1])
+            except (ValueError, IndexError, TypeError, KeyError):
+                return default
+        elif key == "#discs":
+            try:
+                return int(self["discnumber"].split("/")[1])
+            except (ValueError, IndexError, TypeError, KeyError):
+                return default
+        elif key == "lyrics":
+            # First, try the embedded lyrics.
+            try:
+                return self[key]
+            except KeyError:
+                pass
+
+            # If there are no embedded lyrics, try to read them from
+            # the external file.
+            fn = self.lyric_filename
+            try:
+                fileobj = open(fn, "rb")
+            except EnvironmentError:
+                return default
+            else:
+                print_d("Reading lyrics from %s" % fn)
+                return fileobj.read().decode("utf-8", "replace")
+        elif key == "filesize":
+            return util.format_size(self("~#filesize", 0))
+        elif key == "playlists":
+            # See Issue 876
+            # Avoid circular references from formats/__init__.py
+            from quodlibet.util.collection import Playlist
+            playlists = Playlist.playlists_featuring(self)
+            return "\n".join([s.name for s in playlists]) or default
+        elif key.startswith("#replaygain_"):
+            try:
+                val = self.get(key[1:], default)
+                return round(float(val.split(" ")[0]), 2)
+            except (ValueError, TypeError, AttributeError):
+                return default
+        elif key[:1] == "#":
+            key = "~" + key
+            if key in self:
+                return self[key]
+            elif key in NUMERIC_ZERO_DEFAULT:
+                return 0
+            else:
+                try:
+                    val = self[key[2:]]
+                except KeyError:
+                    return default
+                try:
+                    return int(val)
+                except ValueError:
+                    try:
+                        return float(val)
+                    except ValueError:
+                        return default
+        else:
+            return dict.get(self, "~" + key, default)
+
     def _role_call(self, role_tag, sub_keys=None):
         role_tag_keys = self.prefixkeys(role_tag)
 
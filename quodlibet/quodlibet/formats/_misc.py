@@ -110,12 +110,27 @@ def get_loader(filename):
 
 
 def MusicFile(filename):
-    """Returns a AudioFile instance or None"""
+    """Returns a AudioFile instance or None
+
+    If enabled, the file is taken from or stored in the tag cache (see
+    `init_tag_cache()`).
+    """
+
+    # _tagcache depends on AudioFile, which depends on this module
+    from ._tagcache import get_tag_cache
 
     loader = get_loader(filename)
     if loader is not None:
+        cache = get_tag_cache()
+        if cache is not None:
+            song = cache.get(filename)
+            if song is not None:
+                return song
         try:
-            return loader(filename)
+            song = loader(filename)
+            if cache is not None and song is not None:
+                cache.put(filename, song)
+            return song
         except AudioFileError:
             print_w("Error loading %r" % filename)
             util.print_exc()
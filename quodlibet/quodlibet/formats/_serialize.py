@@ -14,16 +14,32 @@ from senf import bytes2fsn, fsn2bytes, fsnative
 from quodlibet.util.picklehelper import pickle_loads, pickle_dumps
 from quodlibet.util import is_windows
 from quodlibet.compat import PY3, text_type
-from ._audio import AudioFile
+from ._audio import AudioFile, SHARED_TAGS, share_key, share_value, \
+    share_tags
 
 
 class SerializationError(Exception):
     pass
 
 
+def _decode_key(k):
+    if isinstance(k, bytes):
+        k = k.decode("utf-8", "replace")
+    else:
+        # strip surrogates
+        try:
+            k.encode("utf-8")
+        except UnicodeEncodeError:
+            k = k.encode("utf-8", "replace").decode("utf-8")
+    return share_key(k)
+
+
 def _py2_to_py3(items):
     assert PY3
 
+    # the same keys appear in most items, decode each only once
+    keys = {}
+
     for i in items:
         try:
             l = list(i.items())
@@ -31,14 +47,11 @@ def _py2_to_py3(items):
             raise SerializationError
         i.clear()
         for k, v in l:
-            if isinstance(k, bytes):
-                k = k.decode("utf-8", "replace")
-            else:
-                # strip surrogates
-                try:
-                    k.encode("utf-8")
-                except UnicodeEncodeError:
-                    k = k.encode("utf-8", "replace").decode("utf-8")
+            try:
+                k = keys[k]
+            except KeyError:
+                keys[k] = _decode_key(k)
+                k = keys[k]
 
             if k == "~filename" or k == "~mountpoint":
                 if isinstance(v, bytes):
@@ -57,11 +70,22 @@ def _py2_to_py3(items):
                 except UnicodeEncodeError:
                     v = v.encode("utf-8", "replace").decode("utf-8")
 
+            if k in SHARED_TAGS:
+                v = share_value(v)
             i[k] = v
 
     return items
 
 
+def _share(items):
+    # Like _py2_to_py3() for items which don't need any conversion: only
+    # makes the keys and values the same objects as for other items
+    for i in items:
+        share_tags(i)
+
+    return items
+
+
 def _py3_to_py2(items):
     assert PY3
 
@@ -128,33 +152,24 @@ def _py2_to_py2(items):
     return items
 
 
-def load_audio_files(data, process=True):
-    """unpickles the item list and if some class isn't found unpickle
-    as a dict and filter them out afterwards.
-
-    In case everything gets filtered out will raise SerializationError
-    (because then likely something larger went wrong)
-
-    Args:
-        data (bytes)
-        process (bool): if the dict key/value types should be converted,
-            either to be usable from py3 or to convert to newer types
-    Returns:
-        List[AudioFile]
-    Raises:
-        SerializationError
+class _AudioFileLoader(object):
+    """Unpickles lists of AudioFiles, sharing the class lookup state
+    between multiple calls to `load()`
     """
 
-    dummy = type("dummy", (dict,), {})
-    error_occured = []
-    temp_type_cache = {}
+    def __init__(self, process=True, normalized=False):
+        self._process = process
+        self._normalized = normalized
+        self._dummy = type("dummy", (dict,), {})
+        self._error_occured = []
+        self._temp_type_cache = {}
 
-    def lookup_func(base, module, name):
+    def _lookup_func(self, base, module, name):
         try:
             real_type = base(module, name)
         except (ImportError, AttributeError):
-            error_occured.append(True)
-            return dummy
+            self._error_occured.append(True)
+            return self._dummy
 
         if module.split(".")[0] not in ("quodlibet", "tests"):
             return real_type
@@ -162,42 +177,98 @@ def load_audio_files(data, process=True):
         # return a straight dict subclass so that unpickle doesn't call
         # our __setitem__. Further down we simply change the __class__
         # to our real type.
+        temp_type_cache = self._temp_type_cache
         if not real_type in temp_type_cache:
             new_type = type(name, (dict,), {"real_type": real_type})
             temp_type_cache[real_type] = new_type
 
         return temp_type_cache[real_type]
 
-    try:
-        items = pickle_loads(data, lookup_func)
-    except pickle.UnpicklingError as e:
-        raise SerializationError(e)
+    def load(self, data):
+        del self._error_occured[:]
 
-    if error_occured:
-        items = [i for i in items if not isinstance(i, dummy)]
+        try:
+            items = pickle_loads(data, self._lookup_func)
+        except pickle.UnpicklingError as e:
+            raise SerializationError(e)
+
+        if self._error_occured:
+            items = [i for i in items if not isinstance(i, self._dummy)]
+
+            if not items:
+                raise SerializationError(
+                    "all class lookups failed. something is wrong")
+
+        if self._process:
+            if self._normalized:
+                items = _share(items)
+            elif PY3:
+                items = _py2_to_py3(items)
+            else:
+                items = _py2_to_py2(items)
 
-        if not items:
-            raise SerializationError(
-                "all class lookups failed. something is wrong")
+        try:
+            for i in items:
+                i.__class__ = i.real_type
+        except AttributeError as e:
+            raise SerializationError(e)
 
-    if process:
-        if PY3:
-            items = _py2_to_py3(items)
-        else:
-            items = _py2_to_py2(items)
+        return items
 
-    try:
-        for i in items:
-            i.__class__ = i.real_type
-    except AttributeError as e:
-        raise SerializationError(e)
 
-    return items
+def load_audio_files(data, process=True, normalized=False):
+    """unpickles the item list and if some class isn't found unpickle
+    as a dict and filter them out afterwards.
+
+    In case everything gets filtered out will raise SerializationError
+    (because then likely something larger went wrong)
+
+    Args:
+        data (bytes)
+        process (bool): if the dict key/value types should be converted,
+            either to be usable from py3 or to convert to newer types
+        normalized (bool): if the data was written by
+            `dump_audio_files()` with process=False and the same Python
+            major version, in which case the conversion can be skipped
+    Returns:
+        List[AudioFile]
+    Raises:
+        SerializationError
+    """
+
+    return _AudioFileLoader(process, normalized).load(data)
+
+
+def load_audio_files_many(datas, process=True, normalized=False):
+    """Like load_audio_files() but for many separately pickled lists,
+    which is faster than calling load_audio_files() for each.
+
+    Args:
+        datas (Iterable[bytes])
+        process (bool)
+        normalized (bool)
+    Returns:
+        List[List[AudioFile] or None]: None for each list which failed to
+            load
+    """
+
+    loader = _AudioFileLoader(process, normalized)
+    result = []
+    for data in datas:
+        try:
+            result.append(loader.load(data))
+        except SerializationError:
+            result.append(None)
+    return result
 
 
 def dump_audio_files(item_list, process=True):
     """Pickles a list of AudioFiles
 
+    With process=False the types are kept as they are, which is faster
+    to load again (see `load_audio_files()`) but only by the same Python
+    major version.
+
     Returns:
         bytes
     Raises:
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Loaded files, kept in an SQLite database between runs.
+
+Entries are keyed by the path and only used as long as the modification
+time and size of the file stay the same. The database is shared by all
+processes using it (the library scan, operon and their workers) and only
+used by the same program and Python version which wrote it.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+
+import mutagen
+
+import quodlibet
+from quodlibet.util.sqlitecache import FileCache
+from ._serialize import load_audio_files, dump_audio_files, \
+    SerializationError
+
+
+FORMAT = 1
+"""Gets increased whenever the stored entries change"""
+
+
+class TagCache(FileCache):
+    """Maps paths to the AudioFile loaded from them, stored in an SQLite
+    database.
+    """
+
+    NAME = u"tag cache"
+    TABLE = "files"
+    COLUMNS = [("data", "BLOB")]
+
+    def _get_version(self):
+        return u"%d %s %s %s" % (
+            FORMAT, quodlibet.get_build_description(),
+            mutagen.version_string, sys.version)
+
+    def get(self, filename):
+        """Returns the AudioFile stored for the file, or None if there is
+        none or the file has changed since.
+
+        Args:
+            filename (fsnative)
+        Returns:
+            AudioFile or None
+        """
+
+        try:
+            stat = os.stat(filename)
+        except EnvironmentError:
+            return
+
+        values = self.lookup(filename, stat)
+        if values is None:
+            return
+
+        try:
+            song = load_audio_files(bytes(values[0]), normalized=True)[0]
+        except (SerializationError, IndexError):
+            return
+        # like a newly loaded file
+        song["~#added"] = int(time.time())
+        return song
+
+    def put(self, filename, song):
+        """Stores the AudioFile loaded from a file. Files which were
+        modified just now are skipped.
+
+        Args:
+            filename (fsnative): the path passed to the loader
+            song (AudioFile)
+        """
+
+        mtime = song("~#mtime")
+        if self.is_too_recent(mtime):
+            return
+
+        try:
+            data = dump_audio_files([song], process=False)
+        except SerializationError:
+            return
+
+        self.store(filename, mtime, song("~#filesize"),
+                   (sqlite3.Binary(data),))
+
+
+def init_tag_cache(filename):
+    """Makes `MusicFile` use the cache for the rest of the process"""
+
+    TagCache.install(filename)
+
+
+def get_tag_cache():
+    """Returns the TagCache or None if not enabled"""
+
+    return TagCache.get_installed()
@@ -20,7 +20,7 @@ from quodlibet import print_d
 
 from quodlibet.library.libraries import SongFileLibrary, SongLibrary
 from quodlibet.library.librarians import SongLibrarian
-from quodlibet.util.path import mtime
+from quodlibet.library.journal import last_saved
 
 
 def init(cache_fn=None):
@@ -52,5 +52,6 @@ def save(save_period=None):
         if not filename or not lib.dirty:
             continue
 
-        if not save_period or abs(time.time() - mtime(filename)) > save_period:
+        if not save_period or \
+                abs(time.time() - last_saved(filename)) > save_period:
             lib.save()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Numeric tags of all songs of a library, stored in arrays.
+
+Each song gets a row, each tag a column containing floats, missing values
+are NaN. Operations over a whole column can use map() and friends instead
+of calling `AudioFile.__call__` for each song.
+"""
+
+from array import array
+
+from quodlibet import config
+from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import iteritems, itervalues, integer_types
+
+
+NAN = float("nan")
+
+
+def _get_number(song, tag, default):
+    value = song.get(tag)
+    if value is None:
+        return default
+    if isinstance(value, (float, ) + integer_types) and \
+            not isinstance(value, bool):
+        return float(value)
+    return NAN
+
+
+class NumericColumns(object):
+    """Keeps the values of some numeric tags of all songs in a library in
+    arrays and up to date through the library signals.
+
+    A column gets filled the first time it's needed. Rows of removed
+    songs get reused for added ones.
+    """
+
+    TAGS = frozenset(["~#playcount", "~#rating", "~#added", "~#lastplayed",
+                      "~#length", "~#bitrate", "~#mtime"])
+    """The tags which get stored, all read directly from the song"""
+
+    def __init__(self, library):
+        self._library = library
+        self._columns = {}
+        self._rows = {}
+        self._free = []
+        self.songs = []
+        """The song for each row, None for unused rows"""
+
+        self._sig_ids = [
+            library.connect('added', self.__added),
+            library.connect('changed', self.__changed),
+            library.connect('removed', self.__removed),
+        ]
+
+    def destroy(self):
+        for sig_id in self._sig_ids:
+            self._library.disconnect(sig_id)
+        self._sig_ids = []
+        self._columns.clear()
+        self._rows.clear()
+        self.songs = []
+
+    def _get_default(self, tag):
+        if tag in NUMERIC_ZERO_DEFAULT:
+            return 0.0
+        return NAN
+
+    def _fill(self, songs):
+        rows = self._rows
+        columns = list(iteritems(self._columns))
+        for song in songs:
+            row = rows.get(id(song))
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                    self.songs[row] = song
+                else:
+                    row = len(self.songs)
+                    self.songs.append(song)
+                    for tag, column in columns:
+                        column.append(NAN)
+                rows[id(song)] = row
+            for tag, column in columns:
+                column[row] = _get_number(song, tag, self._get_default(tag))
+
+    def __added(self, library, songs):
+        if self._columns:
+            self._fill(songs)
+
+    def __changed(self, library, songs):
+        if self._columns:
+            self._fill([s for s in songs if s in library])
+
+    def __removed(self, library, songs):
+        rows = self._rows
+        columns = list(itervalues(self._columns))
+        for song in songs:
+            row = rows.pop(id(song), None)
+            if row is None:
+                continue
+            self.songs[row] = None
+            self._free.append(row)
+            for column in columns:
+                column[row] = NAN
+
+    def get_column(self, tag):
+        """Returns the values of a tag for all rows, in the order of `songs`.
+        Values which aren't numbers or missing and without a default are
+        NaN.
+
+        Args:
+            tag (str): one of `TAGS`
+        Returns:
+            Sequence[float]: must not be modified
+        """
+
+        column = self._columns.get(tag)
+        if column is None:
+            print_d("Filling column %r" % tag)
+            if not self._columns:
+                # rows aren't kept up to date without any columns
+                self._free = []
+                self.songs = list(itervalues(self._library))
+                # keyed by id() as that's faster than AudioFile.__hash__,
+                # `songs` keeps them alive
+                self._rows = dict(
+                    (id(song), row) for row, song in enumerate(self.songs))
+
+            default = self._get_default(tag)
+            column = self._columns[tag] = array(
+                "d", [_get_number(s, tag, default) if s is not None else NAN
+                      for s in self.songs])
+
+        if tag == "~#rating":
+            # the default can change, so it's not stored
+            default = config.RATINGS.default
+            return [default if v != v else v for v in column]
+        return column
+
+    def index(self, song):
+        """Returns the row of a song or None"""
+
+        return self._rows.get(id(song))
+
+    def get_sort_func(self, tag):
+        """Like `AudioFile.sort_by_func()` for a tag in `TAGS`, but with
+        the values taken from the column.
+        """
+
+        column = self.get_column(tag)
+        rows = self._rows
+
+        def sort_func(song):
+            row = rows.get(id(song))
+            if row is not None:
+                value = column[row]
+                if value == value:
+                    return value
+            return song(tag, 0)
+
+        return sort_func
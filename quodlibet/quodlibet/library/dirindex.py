@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""An index of scanned directories, to skip listing unchanged ones when
+scanning.
+
+Adding, removing or renaming a file changes the modification time of its
+directory, so a directory with the same modification time as during the
+last complete scan still contains the same files and sub directories,
+which the index remembers. Whether those files are in the library is up
+to the caller, as files can fail to load or get removed from the library
+without the directory changing.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.path import ishidden, mkdir
+from quodlibet.util.picklehelper import pickle_loads, pickle_dumps, \
+    PickleError
+from quodlibet.util.dprint import print_d, print_w
+
+
+VERSION = 2
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+
+def dirindex_path(filename):
+    """The path of the index belonging to a library file"""
+
+    return filename + ".dirs"
+
+
+def _list_dir(path):
+    """Returns the sub directories and files of a directory, like a step
+    of os.walk(). Symlinked directories are left out, as they don't get
+    followed.
+
+    Returns:
+        Tuple[List[fsnative], List[fsnative], Set[fsnative]]: the names of
+            the directories, files and the files which are symlinks
+    Raises:
+        EnvironmentError
+    """
+
+    dnames, fnames, links = [], [], set()
+    if scandir is None:
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                if not os.path.islink(full):
+                    dnames.append(name)
+            else:
+                fnames.append(name)
+                if os.path.islink(full):
+                    links.add(name)
+        return dnames, fnames, links
+
+    # the entry types usually come with the listing, so only symlinks
+    # need an extra stat
+    for entry in scandir(path):
+        is_link = entry.is_symlink()
+        try:
+            is_dir = entry.is_dir()
+        except EnvironmentError:
+            is_dir = False
+        if is_dir:
+            if not is_link:
+                dnames.append(entry.name)
+        else:
+            fnames.append(entry.name)
+            if is_link:
+                links.add(entry.name)
+    return dnames, fnames, links
+
+
+def _read_dir(path, entry, skip):
+    """Returns the modification time, the sub directories and the files
+    of a directory which aren't skipped, taken from the entry of the index
+    if the directory didn't change.
+
+    Raises:
+        EnvironmentError
+    """
+
+    mtime = os.stat(path).st_mtime
+    if entry is not None and entry[0] == mtime:
+        return entry
+
+    dnames, fnames, links = _list_dir(path)
+    real_path = os.path.realpath(path)
+    paths = []
+    for filename in fnames:
+        fullfilename = os.path.join(path, filename)
+        if skip(fullfilename):
+            continue
+        if filename in links:
+            fullfilename = os.path.realpath(fullfilename)
+        else:
+            fullfilename = os.path.join(real_path, filename)
+        if skip(fullfilename):
+            continue
+        paths.append(fullfilename)
+    return mtime, dnames, paths
+
+
+def _get_settings(exclude, skip_hidden):
+    return (sorted(exclude), skip_hidden)
+
+
+class DirectoryIndex(object):
+    """Maps directories to their modification time, sub directories and
+    files as seen during the last complete scan.
+
+    The scan settings (excluded paths etc.) are part of the index, scanning
+    with different ones ignores the existing index.
+    """
+
+    THREADS = 8
+    """Number of threads reading directories in parallel, as on network
+    file systems most of the time is spent waiting"""
+
+    MAX_PENDING = 32
+    """Number of directories queued for reading at most"""
+
+    def __init__(self):
+        self._dirs = {}
+        self._settings = None
+        self.dirty = False
+
+    def __len__(self):
+        return len(self._dirs)
+
+    def clear(self):
+        self.dirty = bool(self._dirs)
+        self._dirs = {}
+        self._settings = None
+
+    def load(self, filename):
+        """Loads the index, in case of an error the index stays empty
+
+        Args:
+            filename (fsnative)
+        """
+
+        self.clear()
+        self.dirty = False
+        try:
+            with open(filename, "rb") as h:
+                version, settings, dirs = pickle_loads(h.read())
+        except EnvironmentError:
+            return
+        except (PickleError, ValueError, TypeError):
+            print_w("Couldn't load directory index %r" % filename)
+            return
+
+        if version == VERSION:
+            self._settings = settings
+            self._dirs = dirs
+            print_d("Loaded %d directories from %r" % (len(dirs), filename))
+
+    def save(self, filename):
+        """Saves the index
+
+        Args:
+            filename (fsnative)
+        """
+
+        try:
+            mkdir(os.path.dirname(filename))
+            data = pickle_dumps((VERSION, self._settings, self._dirs), 2)
+            with atomic_save(filename, "wb") as h:
+                h.write(data)
+        except (EnvironmentError, PickleError):
+            print_w("Couldn't save directory index %r" % filename)
+        else:
+            self.dirty = False
+
+    def update(self, seen, exclude=[], skip_hidden=True, failed=[]):
+        """Replaces the index with the result of a complete scan.
+
+        Args:
+            seen (dict): filled by `walk()`
+            exclude (List[fsnative]): as passed to `walk()`
+            skip_hidden (bool): as passed to `walk()`
+            failed (Iterable[fsnative]): files yielded by `walk()` which
+                couldn't be handled, their directories get left out
+        """
+
+        failed = set(failed)
+        if failed:
+            seen = dict((path, entry) for path, entry in seen.items()
+                        if failed.isdisjoint(entry[2]))
+
+        self._settings = _get_settings(exclude, skip_hidden)
+        self._dirs = seen
+        self.dirty = True
+
+    def forget(self, paths):
+        """Removes the directories of files from the index, so the next
+        walk lists them again.
+
+        Args:
+            paths (Iterable[fsnative]): files
+        """
+
+        for dirname in set(os.path.dirname(p) for p in paths):
+            if self._dirs.pop(dirname, None) is not None:
+                self.dirty = True
+
+    def walk(self, cancellable, roots, exclude=[], skip_hidden=True,
+             seen=None):
+        """Yields the files of all directories like `iter_paths()`, only
+        listing directories which changed since the index was updated.
+
+        Can be run in a thread, the index doesn't get modified. Directories
+        are read in a pool of threads, the files get yielded in no
+        particular order.
+
+        Args:
+            cancellable (Cancellable): stops walking once cancelled
+            roots (List[fsnative])
+            exclude (List[fsnative])
+            skip_hidden (bool)
+            seen (dict or None): gets filled with the directories found,
+                pass to `update()` once all of them were handled
+        Yields:
+            fsnative: absolute dereferenced paths
+        """
+
+        if seen is None:
+            seen = {}
+
+        known = self._dirs
+        if self._settings != _get_settings(exclude, skip_hidden):
+            known = {}
+
+        def skip(path):
+            if skip_hidden and ishidden(path):
+                return True
+            return any((path.startswith(p) for p in exclude))
+
+        def wanted(path):
+            if skip_hidden and ishidden(path):
+                return False
+            # all files below would be excluded
+            return not any((path.startswith(p) for p in exclude))
+
+        # directories get read in threads as soon as they are found,
+        # at most MAX_PENDING at a time
+        executor = ThreadPoolExecutor(self.THREADS)
+        found = [r for r in reversed(roots) if wanted(r)]
+        running = {}
+        try:
+            while (found or running) and not cancellable.is_cancelled():
+                while found and len(running) < self.MAX_PENDING:
+                    path = found.pop()
+                    future = executor.submit(
+                        _read_dir, path, known.get(path), skip)
+                    running[future] = path
+
+                done = wait(running, return_when=FIRST_COMPLETED)[0]
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        mtime, dnames, paths = future.result()
+                    except EnvironmentError:
+                        continue
+
+                    for fullfilename in paths:
+                        yield fullfilename
+
+                    seen[path] = (mtime, dnames, paths)
+                    for dname in reversed(dnames):
+                        dpath = os.path.join(path, dname)
+                        if wanted(dpath):
+                            found.append(dpath)
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""An append-only change log for pickled libraries.
+
+The library file written by `PicklingMixin` is a full snapshot of all
+items. Rewriting it on every save takes time proportional to the library
+size, so instead only the items which changed since the last save get
+appended to a journal next to it. Loading replays the journal on top
+of the snapshot and once the journal gets too large it gets folded back
+into a new snapshot (compaction).
+
+Journal layout, repeated until EOF:
+
+    op (1 byte) | payload length (4 bytes) | crc32 of payload (4 bytes)
+    payload (the result of `dump_audio_files()`)
+
+A truncated or corrupt record (e.g. the program crashed during a write)
+ends the replay, everything before it still gets applied.
+"""
+
+import os
+import struct
+import zlib
+
+from senf import fsnative
+
+from quodlibet.formats import AudioFile, load_audio_files, \
+    dump_audio_files, SerializationError
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mtime, filesize
+
+
+OP_UPDATE = 1
+"""The payload items replace the ones with the same key or get added"""
+
+OP_REMOVE = 2
+"""The items with the keys of the payload items get removed"""
+
+_HEADER = struct.Struct(">BII")
+
+
+def journal_path(filename):
+    """The path of the journal belonging to a library file"""
+
+    return filename + fsnative(u".journal")
+
+
+def compacting_path(filename):
+    """The path of a journal which is currently being compacted into
+    the library file.
+    """
+
+    return filename + fsnative(u".journal.old")
+
+
+def last_saved(filename):
+    """The last time the library or its journal was written to.
+
+    Returns:
+        float: seconds since epoch or 0 if it was never saved
+    """
+
+    return max(mtime(filename), mtime(journal_path(filename)))
+
+
+def _write_record(fileobj, op, items):
+    payload = dump_audio_files(items)
+    crc = zlib.crc32(payload) & 0xffffffff
+    fileobj.write(_HEADER.pack(op, len(payload), crc))
+    fileobj.write(payload)
+
+
+def read_records(filename):
+    """Yields (op, items, end) tuples for all valid records in the journal,
+    `end` being the file offset after the record.
+
+    Args:
+        filename (fsnative): path of the journal
+    Yields:
+        Tuple[int, List[AudioFile], int]
+    """
+
+    try:
+        with open(filename, "rb") as fileobj:
+            data = fileobj.read()
+    except EnvironmentError:
+        return
+
+    offset = 0
+    size = _HEADER.size
+    while offset + size <= len(data):
+        op, length, crc = _HEADER.unpack_from(data, offset)
+        start = offset + size
+        payload = data[start:start + length]
+        if len(payload) != length or \
+                zlib.crc32(payload) & 0xffffffff != crc or \
+                op not in (OP_UPDATE, OP_REMOVE):
+            print_w("Journal %r truncated, ignoring the rest" % filename)
+            return
+        try:
+            items = load_audio_files(payload)
+        except SerializationError:
+            print_w("Journal %r corrupted, ignoring the rest" % filename)
+            return
+        offset = start + length
+        yield op, items, offset
+
+
+def _truncate(filename, length):
+    if filesize(filename) <= length:
+        return
+    print_d("Truncating journal %r to %d bytes" % (filename, length))
+    try:
+        with open(filename, "rb+") as fileobj:
+            fileobj.truncate(length)
+    except EnvironmentError:
+        pass
+
+
+def replay(filename, contents):
+    """Applies the journals of a library file to the items loaded from it.
+
+    Incomplete records at the end of a journal get removed so that new
+    ones can be appended.
+
+    Args:
+        filename (fsnative): path of the library file
+        contents (Dict[fsnative, AudioFile]): key to item mapping of the
+            library file content, gets updated in place
+    """
+
+    for path in [compacting_path(filename), journal_path(filename)]:
+        end = 0
+        for op, records, end in read_records(path):
+            if op == OP_UPDATE:
+                for item in records:
+                    contents[item.key] = item
+            else:
+                for item in records:
+                    contents.pop(item.key, None)
+        _truncate(path, end)
+
+
+class Journal(object):
+    """Appends item changes to the journal of a library file"""
+
+    COMPACT_MIN_SIZE = 1024 ** 2
+    """Never compact journals smaller than this (bytes)"""
+
+    COMPACT_RATIO = 0.5
+    """Compact once the journal is larger than this fraction of the
+    library file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = journal_path(filename)
+
+    @property
+    def size(self):
+        return filesize(self.path)
+
+    def append(self, updated, removed):
+        """Appends a change set.
+
+        Args:
+            updated (List[AudioFile]): items which were added or changed
+            removed (List[fsnative]): keys of items which were removed
+        Raises:
+            EnvironmentError
+            SerializationError
+        """
+
+        if not updated and not removed:
+            return
+
+        print_d("Journaling %d updated, %d removed items." % (
+            len(updated), len(removed)))
+
+        with open(self.path, "ab") as fileobj:
+            if updated:
+                _write_record(fileobj, OP_UPDATE, updated)
+            if removed:
+                stubs = [AudioFile({"~filename": key}) for key in removed]
+                _write_record(fileobj, OP_REMOVE, stubs)
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+
+    def needs_compaction(self):
+        """If the journal has grown large enough so that replaying it
+        would cost more than rewriting the library file.
+        """
+
+        size = self.size
+        if size < self.COMPACT_MIN_SIZE:
+            return False
+        return size > filesize(self.filename) * self.COMPACT_RATIO
+
+    def rotate(self):
+        """Moves the current journal out of the way so new changes can be
+        appended while its content gets compacted.
+
+        In case a previous compaction failed the current journal gets
+        appended to the old one.
+
+        Raises:
+            EnvironmentError
+        """
+
+        old_path = compacting_path(self.filename)
+        if not os.path.exists(self.path):
+            return
+
+        if os.path.exists(old_path):
+            with open(self.path, "rb") as src:
+                with open(old_path, "ab") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+            os.unlink(self.path)
+        else:
+            os.rename(self.path, old_path)
+
+    def finish_compaction(self):
+        """To be called once the library file contains everything from
+        the rotated journal.
+        """
+
+        try:
+            os.unlink(compacting_path(self.filename))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Removes all journals, to be called after the library file was
+        written in full.
+        """
+
+        for path in [self.path, compacting_path(self.filename)]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
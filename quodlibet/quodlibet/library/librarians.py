@@ -167,6 +167,9 @@ class SongLibrarian(Librarian):
                 pass
             else:
                 re_add.append(library)
+                forget_key = getattr(library, "_forget_key", None)
+                if forget_key is not None:
+                    forget_key(song.key)
         song.rename(newname)
         for library in re_add:
             library._contents[song.key] = song
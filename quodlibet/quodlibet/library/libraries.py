@@ -16,26 +16,35 @@ least useful but most content-agnostic.
 
 import os
 import shutil
+import threading
 import time
 
 from gi.repository import GObject
 from senf import fsn2text, fsnative
 
 from quodlibet import _
-from quodlibet.formats import MusicFile, AudioFileError, load_audio_files, \
-    dump_audio_files, SerializationError
+from quodlibet.formats import MusicFile, AudioFile, AudioFileError, \
+    load_audio_files, SerializationError
 from quodlibet.query import Query
 from quodlibet.qltk.notif import Task
+from quodlibet.library import journal, snapshot, parallel
+from quodlibet.library.dirindex import DirectoryIndex, dirindex_path
+from quodlibet.library.tagindex import TagIndex
+from quodlibet.library.columns import NumericColumns
+from quodlibet.library.querycache import QueryCache
+from quodlibet.library.sortkeys import SortKeys
+from quodlibet.library.snapshot import LazyContents, load_snapshot, \
+    dump_snapshot, is_snapshot
 from quodlibet.util.atomic import atomic_save
 from quodlibet.util.collection import Album
 from quodlibet.util.collections import DictMixin
 from quodlibet import util
 from quodlibet import formats
 from quodlibet.util.dprint import print_d, print_w
-from quodlibet.util.path import unexpand, mkdir, normalize_path, ishidden, \
-    ismount
+from quodlibet.util.thread import iter_threaded, Cancellable
+from quodlibet.util.path import unexpand, mkdir, normalize_path, ismount
 from quodlibet.compat import iteritems, iterkeys, itervalues, listkeys, \
-    listvalues, listfilter
+    listvalues, listitems
 
 
 class Library(GObject.GObject, DictMixin):
@@ -152,6 +161,9 @@ class Library(GObject.GObject, DictMixin):
     def values(self):
         return self._contents.values()
 
+    def items(self):
+        return listitems(self._contents)
+
     def _load_item(self, item):
         """Load (add) an item into this library"""
         # Subclasses should override this if they want to check
@@ -160,6 +172,15 @@ class Library(GObject.GObject, DictMixin):
         self.dirty = True
         self._contents[item.key] = item
 
+    def _load_contents(self, contents):
+        """Load a key -> item mapping into the library (on start)
+
+        Args:
+            contents (LazyContents)
+        """
+
+        self._load_init(contents.values())
+
     def _load_init(self, items):
         """Load many items into the library (on start)"""
         # Subclasses should override this if they want to check
@@ -209,18 +230,26 @@ class Library(GObject.GObject, DictMixin):
 def _load_items(filename):
     """Load items from disk.
 
-    In case of an error returns default or an empty list.
+    Returns:
+        LazyContents: a key -> item mapping, or None in case of an error
     """
 
     try:
         with open(filename, "rb") as fp:
-            data = fp.read()
+            header = fp.read(len(snapshot.MAGIC))
+            data = None if is_snapshot(header) else header + fp.read()
     except EnvironmentError:
         print_w("Couldn't load library file from: %r" % filename)
-        return []
+        return
 
     try:
+        if data is None:
+            return load_snapshot(filename)
+        # older library files are a single pickled list of items
         items = load_audio_files(data)
+    except EnvironmentError:
+        print_w("Couldn't load library file from: %r" % filename)
+        return
     except SerializationError:
         # there are too many ways this could fail
         util.print_exc()
@@ -231,16 +260,101 @@ def _load_items(filename):
         except EnvironmentError:
             util.print_exc()
 
-        return []
+        return
+
+    contents = LazyContents(normalized=False)
+    for item in items:
+        contents[item.key] = item
+    return contents
+
 
-    return items
+def _copy_item(item):
+    """Returns a copy of an AudioFile which pickles the same, or the item
+    itself if it isn't one.
+    """
+
+    if not isinstance(item, AudioFile):
+        return item
+    # only the tags get pickled, see AudioFile.__getstate__()
+    copy = dict.__new__(type(item))
+    dict.update(copy, item)
+    return copy
 
 
 class PicklingMixin(object):
-    """A mixin to provide persistence of a library by pickling to disk"""
+    """A mixin to provide persistence of a library by pickling to disk.
+
+    The library file is a snapshot (see `quodlibet.library.snapshot`)
+    from which items get unpickled once they are accessed, if the library
+    supports it (see `_load_contents()`).
+
+    If change tracking is enabled through `_track_changes()` only the
+    items which changed since the last save get written to a journal (see
+    `quodlibet.library.journal`), which gets compacted into the library
+    file in a background thread once it gets too large.
+    """
 
     filename = None
 
+    _journal = None
+    _pending = None
+    _compacting = None
+    _migrate = False
+
+    def _track_changes(self):
+        """Record added/changed/removed items so that saving only has to
+        write those.
+        """
+
+        self._pending = {}
+        self.connect('added', self.__pending)
+        self.connect('changed', self.__pending_changed)
+        self.connect('removed', self.__pending)
+
+    def __pending(self, library, items):
+        # If the items are still around (or got removed) is decided
+        # on save, see _persists()
+        pending = self._pending
+        for item in items:
+            try:
+                pending[item.key] = item
+            except KeyError:
+                continue
+
+    def __pending_changed(self, library, items):
+        # 'changed' also gets emitted for items not in the library, like
+        # songs of playlists
+        pending = self._pending
+        for item in items:
+            try:
+                if self._persists(item):
+                    pending[item.key] = item
+            except KeyError:
+                continue
+
+    def _forget_key(self, key):
+        """Tell the journal that there is no item for `key` anymore, e.g.
+        because the item was renamed.
+        """
+
+        if self._pending is not None:
+            self._pending[key] = None
+
+    def _persists(self, item):
+        """If the item is part of the saved content"""
+
+        return item in self
+
+    def _get_snapshot(self):
+        """The content to save.
+
+        Returns:
+            Tuple[List[AudioFile], List[Tuple]]: items and already pickled
+                records, see `dump_snapshot()`
+        """
+
+        return self.get_content(), []
+
     def load(self, filename):
         """Load a library from a file, containing a picked list.
 
@@ -250,27 +364,79 @@ class PicklingMixin(object):
         self.filename = filename
         print_d("Loading contents of %r." % filename, self)
 
-        items = _load_items(filename)
+        contents = _load_items(filename)
+        if contents is None:
+            # nothing to append to, the next save has to write everything
+            contents = LazyContents()
+            self._journal = None
+        else:
+            self._journal = journal.Journal(filename)
+        journal.replay(filename, contents)
 
         # this loads all items without checking their validity, but makes
         # sure that non-mounted items are masked
-        self._load_init(items)
+        self._load_contents(contents)
+
+        # files in an older format get written again with the next save,
+        # in the background, so the next start doesn't have to convert
+        # all items
+        if not contents.normalized:
+            print_d("Library file %r needs migration." % filename, self)
+            self._migrate = True
+            self.dirty = True
 
         print_d("Done loading contents of %r." % filename, self)
 
     def save(self, filename=None):
-        """Save the library to the given filename, or the default if `None`"""
+        """Save the library to the given filename, or the default if `None`
+
+        Saving to the default location only appends the changes to the
+        journal if possible.
+        """
 
         if filename is None:
             filename = self.filename
 
+        if filename != self.filename or self._pending is None or \
+                self._journal is None:
+            self.__save_full(filename)
+            return
+
+        updated = []
+        removed = []
+        for key, item in listitems(self._pending):
+            if item is not None and self._persists(item):
+                updated.append(item)
+            else:
+                removed.append(key)
+
+        try:
+            self._journal.append(updated, removed)
+        except SerializationError:
+            util.print_exc()
+            return
+        except EnvironmentError:
+            print_w("Couldn't save library to path: %r" % filename)
+            return
+
+        self._pending.clear()
+        self.dirty = False
+
+        if self._journal.needs_compaction() or self._migrate:
+            self.compact()
+
+    def __save_full(self, filename):
         print_d("Saving contents to %r." % filename, self)
 
+        if self._compacting is not None:
+            self._compacting.join()
+
         try:
             dirname = os.path.dirname(filename)
             mkdir(dirname)
+            items, records = self._get_snapshot()
             with atomic_save(filename, "wb") as fileobj:
-                fileobj.write(dump_audio_files(self.get_content()))
+                dump_snapshot(fileobj, items, records)
         except SerializationError:
             # Can happen when we try to pickle while the library is being
             # modified, like in the periodic 15min save.
@@ -279,8 +445,54 @@ class PicklingMixin(object):
         except EnvironmentError:
             print_w("Couldn't save library to path: %r" % filename)
         else:
+            if filename == self.filename:
+                self._journal = journal.Journal(filename)
+                self._journal.clear()
+                if self._pending is not None:
+                    self._pending.clear()
+                self._migrate = False
             self.dirty = False
 
+    def compact(self):
+        """Writes the full library in a background thread, replacing the
+        library file and the journal content written so far.
+
+        Changes made in the meantime go to a new journal.
+        """
+
+        if self._compacting is not None and self._compacting.is_alive():
+            return
+
+        try:
+            self._journal.rotate()
+        except EnvironmentError:
+            print_w("Couldn't rotate journal %r" % self._journal.path)
+            return
+
+        print_d("Compacting %r." % self.filename, self)
+        items, records = self._get_snapshot()
+        # the items can change while they get pickled in the thread
+        items = [_copy_item(item) for item in items]
+        self._compacting = threading.Thread(
+            target=self.__compact, args=(items, records))
+        self._compacting.start()
+
+    def __compact(self, items, records):
+        filename = self.filename
+        try:
+            with atomic_save(filename, "wb") as fileobj:
+                dump_snapshot(fileobj, items, records)
+        except SerializationError:
+            # the items changed while pickling, the old journal stays and
+            # gets merged on the next try
+            util.print_exc()
+        except EnvironmentError:
+            print_w("Couldn't save library to path: %r" % filename)
+        else:
+            self._journal.finish_compaction()
+            self._migrate = False
+            print_d("Done compacting %r." % filename, self)
+
 
 class PicklingLibrary(Library, PicklingMixin):
     """A library that pickles its contents to disk"""
@@ -288,6 +500,7 @@ class PicklingLibrary(Library, PicklingMixin):
         print_d("Using pickling persistence for library \"%s\"" % name)
         PicklingMixin.__init__(self)
         Library.__init__(self, name)
+        self._track_changes()
 
 
 class AlbumLibrary(Library):
@@ -306,6 +519,9 @@ class AlbumLibrary(Library):
             "AlbumLibrary for %s" % library._name)
 
         self._library = library
+        # album key of each song, keyed by id() as that's faster than
+        # AudioFile.__hash__; the albums keep the songs alive
+        self._keys = {}
         self._asig = library.connect('added', self.__added)
         self._rsig = library.connect('removed', self.__removed)
         self._csig = library.connect('changed', self.__changed)
@@ -318,6 +534,7 @@ class AlbumLibrary(Library):
     def destroy(self):
         for sig in [self._asig, self._rsig, self._csig]:
             self._library.disconnect(sig)
+        self._keys.clear()
 
     def _get(self, item):
         return self._contents.get(item)
@@ -325,19 +542,47 @@ class AlbumLibrary(Library):
     def __add(self, items):
         changed = set()
         new = set()
+        contents = self._contents
+        keys = self._keys
         for song in items:
             key = song.album_key
-            if key in self._contents:
-                changed.add(self._contents[key])
-            else:
-                album = Album(song)
-                self._contents[key] = album
+            album = contents.get(key)
+            if album is None:
+                album = contents[key] = Album(song)
                 new.add(album)
-            self._contents[key].songs.add(song)
+            else:
+                changed.add(album)
+            album.songs.add(song)
+            keys[id(song)] = key
 
         changed -= new
         return changed, new
 
+    def __discard(self, items):
+        """Removes songs from their albums, returns the affected albums.
+        Empty albums are left in the library.
+        """
+
+        changed = set()
+        contents = self._contents
+        pop = self._keys.pop
+        for song in items:
+            key = pop(id(song), None)
+            if key is None:
+                continue
+            album = contents[key]
+            album.songs.discard(song)
+            changed.add(album)
+        return changed
+
+    def __remove_empty(self, albums):
+        removed = set()
+        for album in albums:
+            if not album.songs:
+                removed.add(album)
+                del self._contents[album.key]
+        return removed
+
     def __added(self, library, items, signal=True):
         changed, new = self.__add(items)
 
@@ -351,17 +596,8 @@ class AlbumLibrary(Library):
                 self.emit('changed', changed)
 
     def __removed(self, library, items):
-        changed = set()
-        removed = set()
-        for song in items:
-            key = song.album_key
-            album = self._contents[key]
-            album.songs.remove(song)
-            changed.add(album)
-            if not album.songs:
-                removed.add(album)
-                del self._contents[key]
-
+        changed = self.__discard(items)
+        removed = self.__remove_empty(changed)
         changed -= removed
 
         for album in changed:
@@ -373,37 +609,32 @@ class AlbumLibrary(Library):
             self.emit('changed', changed)
 
     def __changed(self, library, items):
-        """Album keys could change between already existing ones.. so we
-        have to do it the hard way and search by id."""
+        """Album keys could change between already existing ones, so the
+        previous album of each song gets looked up in the reverse map."""
+
         print_d("Updating affected albums for %d items" % len(items))
         changed = set()
-        removed = set()
-        to_add = []
+        to_move = []
+        contents = self._contents
+        keys = self._keys
         for song in items:
-            # in case the key hasn't changed
-            key = song.album_key
-            if key in self._contents and song in self._contents[key].songs:
-                changed.add(self._contents[key])
-            else:  # key changed.. look for it in each album
-                to_add.append(song)
-                for key, album in iteritems(self._contents):
-                    if song in album.songs:
-                        album.songs.remove(song)
-                        if not album.songs:
-                            removed.add(album)
-                        else:
-                            changed.add(album)
-                        break
-
-        # get new albums and changed ones because keys could have changed
-        add_changed, new = self.__add(to_add)
+            old_key = keys.get(id(song))
+            if old_key is None:
+                # not in the library
+                continue
+            if old_key == song.album_key:
+                changed.add(contents[old_key])
+            else:
+                to_move.append(song)
+
+        # remove them from their old albums first, the new keys could
+        # belong to any of those
+        changed |= self.__discard(to_move)
+        add_changed, new = self.__add(to_move)
         changed |= add_changed
 
-        # check if albums that were empty at some point are still empty
-        for album in removed:
-            if not album.songs:
-                del self._contents[album.key]
-                changed.discard(album)
+        removed = self.__remove_empty(changed)
+        changed -= removed
 
         for album in changed:
             album.finalize()
@@ -430,10 +661,50 @@ class SongLibrary(PicklingLibrary):
     def albums(self):
         return AlbumLibrary(self)
 
+    @util.cached_property
+    def tag_index(self):
+        """An index for speeding up queries, created on first use
+        (see `Query.filter`)
+        """
+
+        return TagIndex(self)
+
+    @util.cached_property
+    def numeric_columns(self):
+        """Numeric tags of all songs for speeding up queries and sorting,
+        created on first use (see `Query.filter`)
+        """
+
+        return NumericColumns(self)
+
+    @util.cached_property
+    def query_cache(self):
+        """The songs matching recent queries, created on first use
+        (see `Query.filter`)
+        """
+
+        return QueryCache(self)
+
+    @util.cached_property
+    def sort_keys(self):
+        """Cached sort keys of songs, created on first use
+        (see `SongList.add_songs`)
+        """
+
+        return SortKeys(self)
+
     def destroy(self):
         super(SongLibrary, self).destroy()
         if "albums" in self.__dict__:
             self.albums.destroy()
+        if "tag_index" in self.__dict__:
+            self.tag_index.destroy()
+        if "numeric_columns" in self.__dict__:
+            self.numeric_columns.destroy()
+        if "query_cache" in self.__dict__:
+            self.query_cache.destroy()
+        if "sort_keys" in self.__dict__:
+            self.sort_keys.destroy()
 
     def tag_values(self, tag):
         """Return a set of all values for the given tag."""
@@ -454,6 +725,7 @@ class SongLibrary(PicklingLibrary):
         """
         print_d("Renaming %r to %r" % (song.key, newname), self)
         del(self._contents[song.key])
+        self._forget_key(song.key)
         song.rename(newname)
         self._contents[song.key] = song
         if changed is not None:
@@ -463,14 +735,16 @@ class SongLibrary(PicklingLibrary):
             self.changed({song})
 
     def query(self, text, sort=None, star=Query.STAR):
-        """Query the library and return matching songs."""
+        """Query the library and return matching songs, sorted by key."""
         if isinstance(text, bytes):
             text = text.decode('utf-8')
 
-        songs = self.values()
         if text != "":
-            songs = listfilter(Query(text, star).search, songs)
-        return songs
+            songs = Query(text, star).filter(self)
+        else:
+            songs = self.values()
+        # the index and cache based results have no stable order
+        return sorted(songs, key=lambda song: song.key)
 
 
 def iter_paths(root, exclude=[], skip_hidden=True):
@@ -481,6 +755,9 @@ def iter_paths(root, exclude=[], skip_hidden=True):
 
     Directory symlinks are not followed (except root itself)
 
+    Directories get read in a pool of threads (see `DirectoryIndex.walk`),
+    which helps with network file systems.
+
     Args:
         root (fsnative)
         exclude (List[fsnative])
@@ -494,27 +771,10 @@ def iter_paths(root, exclude=[], skip_hidden=True):
     assert all((isinstance(p, fsnative) for p in exclude))
     assert os.path.abspath(root)
 
-    def skip(path):
-        if skip_hidden and ishidden(path):
-            return True
-        # FIXME: normalize paths..
-        return any((path.startswith(p) for p in exclude))
-
-    if skip_hidden and ishidden(root):
-        return
-
-    for path, dnames, fnames in os.walk(root):
-        if skip_hidden:
-            dnames[:] = list(filter(
-                lambda d: not ishidden(os.path.join(path, d)), dnames))
-        for filename in fnames:
-            fullfilename = os.path.join(path, filename)
-            if skip(fullfilename):
-                continue
-            fullfilename = os.path.realpath(fullfilename)
-            if skip(fullfilename):
-                continue
-            yield fullfilename
+    # a walk without an index, reading directories in threads
+    for path in DirectoryIndex().walk(
+            Cancellable(), [root], exclude, skip_hidden):
+        yield path
 
 
 class FileLibrary(PicklingLibrary):
@@ -527,6 +787,25 @@ class FileLibrary(PicklingLibrary):
     def __init__(self, name=None):
         super(FileLibrary, self).__init__(name)
         self._masked = {}
+        self._dir_index = DirectoryIndex()
+
+    def load(self, filename):
+        super(FileLibrary, self).load(filename)
+
+        # the index is only meaningful together with the content it
+        # was created for
+        if self._journal is not None:
+            self._dir_index.load(dirindex_path(filename))
+        else:
+            self._dir_index.clear()
+
+    def save(self, filename=None):
+        super(FileLibrary, self).save(filename)
+
+        # only save the index once the items it refers to are saved
+        if self.filename and filename in (None, self.filename) and \
+                not self.dirty and self._dir_index.dirty:
+            self._dir_index.save(dirindex_path(self.filename))
 
     def _load_init(self, items):
         """Add many items to the library, check if the
@@ -562,6 +841,55 @@ class FileLibrary(PicklingLibrary):
             else:
                 masked[mountpoint][item.key] = item
 
+    def _load_contents(self, contents):
+        """Use the mapping as content without loading the items, except
+        for masking the ones of mount points which aren't available.
+        """
+
+        if self._contents:
+            return super(FileLibrary, self)._load_contents(contents)
+
+        mounts = {}
+        masked = []
+        for key in listkeys(contents):
+            mountpoint = contents.mountpoint(key)
+
+            if mountpoint not in mounts:
+                is_mounted = ismount(mountpoint)
+
+                # see _load_init()
+                if not is_mounted:
+                    item = contents.get(key)
+                    if item is not None:
+                        item.exists()
+                    is_mounted = ismount(mountpoint)
+
+                mounts[mountpoint] = is_mounted
+                if not is_mounted:
+                    self._masked.setdefault(mountpoint, {})
+
+            if not mounts[mountpoint]:
+                masked.append(key)
+
+        for key in masked:
+            item = contents.pop(key, None)
+            if item is not None:
+                self._masked.setdefault(item.mountpoint, {})[key] = item
+
+        self._contents = contents
+
+    def _get_snapshot(self):
+        contents = self._contents
+        if not isinstance(contents, LazyContents):
+            return self.get_content(), []
+
+        # the ones not loaded yet get copied over as is
+        items = contents.loaded()
+        for masked in self._masked.values():
+            items.extend(masked.values())
+        items.sort(key=lambda item: item.key)
+        return items, contents.records()
+
     def _load_item(self, item, force=False):
         """Add an item, or refresh it if it's already in the library.
         No signals will be fired.
@@ -634,7 +962,8 @@ class FileLibrary(PicklingLibrary):
             else:
                 removed.add(item)
 
-    def rebuild(self, paths, force=False, exclude=[], cofuncid=None):
+    def rebuild(self, paths, force=False, exclude=[], cofuncid=None,
+                workers=1):
         """Reload or remove songs if they have changed or been deleted.
 
         This generator rebuilds the library over the course of iteration.
@@ -645,8 +974,11 @@ class FileLibrary(PicklingLibrary):
         Only items present in the library when the rebuild is started
         will be checked.
 
+        The validity of the items gets checked in a thread, only the
+        changed ones get reloaded in the main loop.
+
         If this function is copooled, set "cofuncid" to enable pause/stop
-        buttons in the UI.
+        buttons in the UI. "workers" gets passed to `scan`.
         """
 
         print_d("Rebuilding, force is %s." % force, self)
@@ -661,23 +993,44 @@ class FileLibrary(PicklingLibrary):
                 self.emit('added', listvalues(items))
                 yield True
 
+        def check_items(cancellable, items):
+            for i, item in enumerate(items):
+                try:
+                    is_valid = item.valid()
+                except Exception:
+                    # changed in the main loop meanwhile, check again there
+                    is_valid = False
+                if force or not is_valid:
+                    yield i, item
+                elif i % 1000 == 0:
+                    yield i, None
+
         task = Task(_("Library"), _("Scanning library"))
         if cofuncid:
             task.copool(cofuncid)
         changed, removed = set(), set()
-        for i, (key, item) in task.list(enumerate(sorted(self.items()))):
-            if key in self._contents and force or not item.valid():
-                self.reload(item, changed, removed)
-                # These numbers are pretty empirical. We should yield more
-            # often than we emit signals; that way the main loop stays
-            # interactive and doesn't get bogged down in updates.
-            if len(changed) > 100:
-                self.emit('changed', changed)
-                changed = set()
-            if len(removed) > 100:
-                self.emit('removed', removed)
-                removed = set()
-            if len(changed) > 5 or i % 100 == 0:
+        items = [item for (key, item) in sorted(self.items())]
+        to_check = iter_threaded(
+            check_items, Cancellable(), (items,), batch_size=100)
+        with task:
+            for checked in to_check:
+                for i, item in checked:
+                    task.update(float(i) / len(items))
+                    if item is None:
+                        continue
+                    if item.key in self._contents and force or \
+                            not item.valid():
+                        self.reload(item, changed, removed)
+                    # These numbers are pretty empirical. We should yield
+                    # more often than we emit signals; that way the main
+                    # loop stays interactive and doesn't get bogged down
+                    # in updates.
+                    if len(changed) > 100:
+                        self.emit('changed', changed)
+                        changed = set()
+                    if len(removed) > 100:
+                        self.emit('removed', removed)
+                        removed = set()
                 yield True
         print_d("Removing %d, changing %d." % (len(removed), len(changed)),
                 self)
@@ -686,7 +1039,7 @@ class FileLibrary(PicklingLibrary):
         if changed:
             self.emit('changed', changed)
 
-        for value in self.scan(paths, exclude, cofuncid):
+        for value in self.scan(paths, exclude, cofuncid, workers, force):
             yield value
 
     def add_filename(self, filename, add=True):
@@ -706,7 +1059,29 @@ class FileLibrary(PicklingLibrary):
 
         raise NotImplementedError
 
-    def scan(self, paths, exclude=[], cofuncid=None):
+    _parallel_loader = None
+    """A module level function taking a filename and returning an item or
+    None, used by `scan()` for loading files in worker processes.
+    """
+
+    def scan(self, paths, exclude=[], cofuncid=None, workers=1,
+             force=False):
+        """Scan the paths for new files and add them to the library.
+
+        This is a generator meant to be copooled.
+
+        Directories which haven't changed since the last completed scan
+        don't get listed again (see `quodlibet.library.dirindex`), their
+        files which aren't in the library get loaded again.
+
+        Args:
+            paths (List[fsnative])
+            exclude (List[fsnative]): paths to skip
+            cofuncid (str or None): to enable pause/stop buttons in the UI
+            workers (int): number of processes to read files with (if
+                supported by the library), 0 meaning one per CPU
+            force (bool): look at all directories
+        """
 
         def need_yield(last_yield=[0]):
             current = time.time()
@@ -722,8 +1097,20 @@ class FileLibrary(PicklingLibrary):
                 return True
             return False
 
-        # first scan each path for new files
+        index = self._dir_index
+        if force:
+            index = DirectoryIndex()
+
+        def find_files(cancellable, scan_path, seen):
+            for real_path in index.walk(
+                    cancellable, [scan_path], exclude, seen=seen):
+                # skip unknown file extensions
+                if formats.filter(real_path):
+                    yield real_path
+
+        # first scan each path for new files, in a thread
         paths_to_load = []
+        seen = {}
         for scan_path in paths:
             print_d("Scanning %r." % scan_path)
             desc = _("Scanning %s") % (fsn2text(unexpand(scan_path)))
@@ -731,17 +1118,14 @@ class FileLibrary(PicklingLibrary):
                 if cofuncid:
                     task.copool(cofuncid)
 
-                for real_path in iter_paths(scan_path, exclude=exclude):
-                    if need_yield():
-                        task.pulse()
-                        yield
-                    # skip unknown file extensions
-                    if not formats.filter(real_path):
-                        continue
-                    # already loaded
-                    if self.contains_filename(real_path):
-                        continue
-                    paths_to_load.append(real_path)
+                for real_paths in iter_threaded(
+                        find_files, Cancellable(), (scan_path, seen)):
+                    task.pulse()
+                    for real_path in real_paths:
+                        # already loaded
+                        if not self.contains_filename(real_path):
+                            paths_to_load.append(real_path)
+                    yield
 
         yield
 
@@ -750,21 +1134,43 @@ class FileLibrary(PicklingLibrary):
             if cofuncid:
                 task.copool(cofuncid)
 
-            added = []
-            for real_path in task.gen(paths_to_load):
-                item = self.add_filename(real_path, False)
-                if item is not None:
-                    added.append(item)
-                    if len(added) > 100 or need_added():
+            workers = parallel.get_worker_count(workers)
+            if self._parallel_loader is not None and workers > 1:
+                loaded = parallel.iter_load(
+                    self._parallel_loader, paths_to_load, workers)
+                added = []
+                for items, done in loaded:
+                    added.extend(items)
+                    if added and (len(added) > 100 or need_added()):
                         self.add(added)
                         added = []
-                        yield
-                if added and need_yield():
+                    task.update(float(done) / len(paths_to_load))
                     yield
-            if added:
-                self.add(added)
+                if added:
+                    self.add(added)
+                    yield True
+            else:
                 added = []
-                yield True
+                for real_path in task.gen(paths_to_load):
+                    item = self.add_filename(real_path, False)
+                    if item is not None:
+                        added.append(item)
+                        if len(added) > 100 or need_added():
+                            self.add(added)
+                            added = []
+                            yield
+                    if added and need_yield():
+                        yield
+                if added:
+                    self.add(added)
+                    added = []
+                    yield True
+
+        # all new files were handled, so directories which don't change
+        # don't have to be listed from now on, unless loading failed
+        failed = [p for p in paths_to_load if not self.contains_filename(p)]
+        self._dir_index.update(seen, exclude, failed=failed)
+        self.dirty = True
 
     def get_content(self):
         """Return visible and masked items"""
@@ -780,6 +1186,10 @@ class FileLibrary(PicklingLibrary):
 
         return items
 
+    def _persists(self, item):
+        point = item.mountpoint
+        return item in self or item.key in self._masked.get(point, {})
+
     def masked(self, item):
         """Return true if the item is in the library but masked."""
         try:
@@ -830,9 +1240,17 @@ class SongFileLibrary(SongLibrary, FileLibrary):
     """A library containing song files.
     Pickles contents to disk as `FileLibrary`"""
 
+    _parallel_loader = staticmethod(MusicFile)
+
     def __init__(self, name=None):
         print_d("Initializing SongFileLibrary \"%s\"." % name)
         super(SongFileLibrary, self).__init__(name)
+        self.connect('removed', self.__forget_dirs)
+
+    def __forget_dirs(self, library, songs):
+        # so a scan lists them again, in case the files should come back
+        self._dir_index.forget(
+            song.key for song in songs if isinstance(song.key, fsnative))
 
     def contains_filename(self, filename):
         key = normalize_path(filename, True)
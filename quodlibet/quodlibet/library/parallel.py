@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Loading of many files in worker processes.
+
+Parsing tags is CPU bound and holds the GIL, so threads don't help. The
+files get split into chunks which are loaded in a process pool, the
+items get pickled and sent back in one piece per chunk.
+
+The workers are new processes and not forks, as forking a process with
+running GLib/GStreamer threads can leave locks held in the child.
+"""
+
+import multiprocessing
+from multiprocessing import cpu_count
+
+import quodlibet
+from quodlibet import config
+from quodlibet import util
+from quodlibet.formats import load_audio_files, dump_audio_files, \
+    init_tag_cache, get_tag_cache
+from quodlibet.util.dprint import print_d, print_w
+
+
+CHUNK_SIZE = 50
+"""Number of files a worker loads in one go"""
+
+
+def get_worker_count(workers=0):
+    """The number of worker processes to use
+
+    Args:
+        workers (int): the requested number, 0 or less means one per CPU
+    Returns:
+        int: 1 in case no processes should be used
+    """
+
+    if util.is_windows():
+        # spawning doesn't work in our frozen builds
+        return 1
+
+    if workers <= 0:
+        try:
+            workers = cpu_count()
+        except NotImplementedError:
+            workers = 1
+    return max(workers, 1)
+
+
+def _init_worker(config_file, tag_cache, initializer, initargs):
+    """Runs first in each worker process"""
+
+    # the pool would replace a failing worker over and over, the calls
+    # failing instead makes the caller handle the chunks itself
+    try:
+        quodlibet.init_cli(config_file=config_file)
+        if tag_cache is not None:
+            init_tag_cache(tag_cache)
+        if initializer is not None:
+            initializer(*initargs)
+    except Exception:
+        util.print_exc()
+
+
+class _ProcessPool(object):
+    """The part of the Executor interface `iter_map()` uses, for a process
+    pool starting new processes. ProcessPoolExecutor only supports that
+    and an initializer starting with Python 3.7.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def submit(self, function, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        self._pool.apply_async(
+            function, args, callback=future.set_result,
+            error_callback=future.set_exception)
+        return future
+
+    def shutdown(self, wait=True):
+        # no callbacks get called once this returns
+        if wait:
+            self._pool.close()
+        else:
+            self._pool.terminate()
+        self._pool.join()
+
+
+def _get_pool(workers, initializer, initargs):
+    cache = get_tag_cache()
+    try:
+        context = multiprocessing.get_context("spawn")
+        return _ProcessPool(context.Pool(
+            workers, initializer=_init_worker,
+            initargs=(config.get_filename(),
+                      cache.filename if cache is not None else None,
+                      initializer, initargs)))
+    except (NotImplementedError, EnvironmentError):
+        util.print_exc()
+
+
+def iter_map(function, chunks, workers, initializer=None, initargs=()):
+    """Calls `function(chunk)` for all chunks in a pool of worker
+    processes, or in a thread if there is only one worker or chunk.
+
+    Meant to be driven by the main loop: yields often, including while
+    waiting for the workers, so the caller can stay responsive and stop
+    at any time. Only a few chunks get queued at once, so pausing stops
+    the workers soon. Closing the generator cancels all pending work.
+
+    Args:
+        function (callable): a module level function (so it can be
+            pickled), its result has to be picklable as well
+        chunks (List[list])
+        workers (int): number of worker processes
+        initializer (callable or None): a module level function called
+            with `initargs` in each worker process (not in the thread)
+        initargs (tuple)
+    Yields:
+        List[Tuple[list, Future]]: the chunks finished since the last
+            yield (can be empty), `Future.result()` gives the result or
+            raises the error of the call
+    """
+
+    from concurrent.futures import ThreadPoolExecutor, wait, \
+        FIRST_COMPLETED
+
+    pool = None
+    if workers > 1 and len(chunks) > 1:
+        pool = _get_pool(workers, initializer, initargs)
+    if pool is None:
+        workers = 1
+        pool = ThreadPoolExecutor(1)
+
+    print_d("Handling %d chunks using %d workers" % (len(chunks), workers))
+
+    chunks = list(reversed(chunks))
+    pending = {}
+    try:
+        while chunks or pending:
+            while chunks and len(pending) < workers * 2:
+                chunk = chunks.pop()
+                pending[pool.submit(function, chunk)] = chunk
+
+            finished, not_done = wait(
+                list(pending), timeout=0.015, return_when=FIRST_COMPLETED)
+            yield [(pending.pop(future), future) for future in finished]
+    finally:
+        pool.shutdown(wait=False)
+        for future in pending:
+            future.cancel()
+
+
+def _load_chunk(loader, filenames):
+    """Runs in the worker process.
+
+    Returns:
+        bytes: the pickled items
+    """
+
+    items = []
+    for filename in filenames:
+        try:
+            item = loader(filename)
+        except Exception:
+            util.print_exc()
+            continue
+        if item is not None:
+            items.append(item)
+    return dump_audio_files(items, process=False)
+
+
+class _ChunkLoader(object):
+    # picklable partial of _load_chunk
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def __call__(self, filenames):
+        return _load_chunk(self.loader, filenames)
+
+
+def _load_serial(loader, filenames):
+    items = []
+    for filename in filenames:
+        item = loader(filename)
+        if item is not None:
+            items.append(item)
+    return items
+
+
+def iter_load(loader, filenames, workers):
+    """Loads files in worker processes, see `iter_map()`.
+
+    Args:
+        loader (callable): a module level function (so it can be pickled)
+            taking a filename and returning an item or None
+        filenames (List[fsnative])
+        workers (int): number of worker processes
+    Yields:
+        Tuple[List[AudioFile], int]: newly loaded items (can be empty)
+            and the number of filenames handled so far
+    """
+
+    chunks = [filenames[i:i + CHUNK_SIZE]
+              for i in range(0, len(filenames), CHUNK_SIZE)]
+
+    done = 0
+    for finished in iter_map(_ChunkLoader(loader), chunks, workers):
+        if not finished:
+            yield [], done
+            continue
+
+        for chunk, future in finished:
+            try:
+                items = load_audio_files(future.result(), normalized=True)
+            except Exception:
+                # a crashed worker or something which can't be pickled
+                print_w("Loading in worker failed, loading %d files "
+                        "directly" % len(chunk))
+                util.print_exc()
+                items = _load_serial(loader, chunk)
+            done += len(chunk)
+            yield items, done
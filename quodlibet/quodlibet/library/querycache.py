@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""A cache of the songs matching recently used queries."""
+
+from collections import OrderedDict
+
+from quodlibet import config
+from quodlibet.query import _match as match
+from quodlibet.formats import TIME_TAGS
+from quodlibet.formats._audio import VOLATILE_TAGS
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import itervalues
+
+
+def _is_cacheable_number(expr):
+    if isinstance(expr, (match.NumexprNumber, match.NumexprNumberOrDate)):
+        return True
+    elif isinstance(expr, match.NumexprTag):
+        # compared to the current time
+        return expr._ftag.split(":", 1)[0] not in TIME_TAGS
+    elif isinstance(expr, (match.NumexprGroup, match.NumexprUnary)):
+        return _is_cacheable_number(expr._expr)
+    elif isinstance(expr, match.NumexprBinary):
+        return (_is_cacheable_number(expr._expr) and
+                _is_cacheable_number(expr._expr2))
+    return False
+
+
+def is_cacheable(node):
+    """If the items a query matches only change when the items change.
+
+    Not the case for queries depending on the current time, plugins, or
+    other state than the tags of the items.
+
+    Args:
+        node (Node)
+    Returns:
+        bool
+    """
+
+    if isinstance(node, (match.Inter, match.Union)):
+        return all(is_cacheable(n) for n in node.res)
+    elif isinstance(node, match.Neg):
+        return is_cacheable(node.res)
+    elif isinstance(node, match.Tag):
+        for name in node.names:
+            if name[:1] == "~" and any(v in name for v in VOLATILE_TAGS):
+                return False
+        return is_cacheable(node.res)
+    elif isinstance(node, match.Numcmp):
+        return (_is_cacheable_number(node._expr) and
+                _is_cacheable_number(node._expr2))
+    return isinstance(node, (match.Regex, match.True_, match.False_))
+
+
+class QueryCache(object):
+    """Remembers the songs of a library matching the most recently used
+    queries.
+
+    The results get updated through the library signals by checking only
+    the songs which were added or changed. They are kept as sets, so they
+    have no order.
+    """
+
+    MAX_ENTRIES = 16
+    """Number of queries to remember"""
+
+    MAX_CHECKS = 20000
+    """Number of song checks per signal above which all results get
+    dropped instead of updated"""
+
+    def __init__(self, library):
+        self._library = library
+        self._entries = OrderedDict()
+        self._sig_ids = [
+            library.connect('added', self.__added),
+            library.connect('changed', self.__changed),
+            library.connect('removed', self.__removed),
+        ]
+
+    def destroy(self):
+        for sig_id in self._sig_ids:
+            self._library.disconnect(sig_id)
+        self._sig_ids = []
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_key(self, query):
+        if not is_cacheable(query._match):
+            return
+        # the default rating is used for songs without one
+        return (query.string.strip(), tuple(query.star),
+                config.RATINGS.default)
+
+    def get(self, query):
+        """Returns the songs matching the query, if known
+
+        Args:
+            query (Query)
+        Returns:
+            set or None: in no particular order, must not be modified
+        """
+
+        key = self._get_key(query)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._entries[key] = entry
+        return entry[1]
+
+    def put(self, query, songs):
+        """Remembers the songs a query matches. Queries which can't be
+        cached are ignored. The order of the songs is not kept.
+
+        Args:
+            query (Query)
+            songs (Iterable[AudioFile])
+        """
+
+        key = self._get_key(query)
+        if key is None:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (query.search, set(songs))
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def _too_many(self, songs):
+        if len(songs) * len(self._entries) > self.MAX_CHECKS:
+            print_d("Too many changes, dropping cached results")
+            self._entries.clear()
+            return True
+        return False
+
+    def __added(self, library, songs):
+        if not self._entries or self._too_many(songs):
+            return
+        for search, result in itervalues(self._entries):
+            result.update(s for s in songs if search(s))
+
+    def __changed(self, library, songs):
+        if not self._entries or self._too_many(songs):
+            return
+        songs = [s for s in songs if s in library]
+        for search, result in itervalues(self._entries):
+            for song in songs:
+                if search(song):
+                    result.add(song)
+                else:
+                    result.discard(song)
+
+    def __removed(self, library, songs):
+        for search, result in itervalues(self._entries):
+            result.difference_update(songs)
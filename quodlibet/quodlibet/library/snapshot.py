@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Library snapshot files which can be loaded lazily.
+
+Each item gets pickled on its own, followed by an index mapping the item
+keys to their position in the file and their mount point. Loading only
+reads the index, the file gets memory mapped and items get unpickled
+the first time they are accessed (see `LazyContents`).
+
+Layout:
+
+    MAGIC | version (1 byte) | Python major version (1 byte)
+    records (the result of `dump_audio_files([item], process=False)` each)
+    index (pickled list of mount points and list of
+           (key, mount point index, offset, length) tuples)
+    index offset (8 bytes) | MAGIC
+
+Records of version 2 files written by the same Python major version are
+normalized and get loaded without converting every key and value. Older
+files stay readable, `LazyContents.normalized` tells if a file should be
+written again to get the faster format.
+"""
+
+import os
+import sys
+import mmap
+import struct
+
+from quodlibet.formats import load_audio_files, dump_audio_files, \
+    load_audio_files_many, SerializationError
+from quodlibet.util.picklehelper import pickle_loads, pickle_dumps, \
+    PickleError
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.compat import iteritems, itervalues, listkeys
+
+
+MAGIC = b"QLSNAP"
+VERSION = 2
+"""Version 1 records were dumped with conversion, like the journal ones"""
+
+_HEADER = struct.Struct(">%dsBB" % len(MAGIC))
+_TRAILER = struct.Struct(">Q%ds" % len(MAGIC))
+
+
+def is_snapshot(data):
+    """If the bytes look like the start of a snapshot file"""
+
+    return data[:len(MAGIC)] == MAGIC
+
+
+def _decode(data, normalized):
+    return load_audio_files(bytes(data), normalized=normalized)[0]
+
+
+def _normalize(data):
+    """Converts a record of an older file to the current format
+
+    Raises:
+        SerializationError
+    """
+
+    return dump_audio_files(load_audio_files(data), process=False)
+
+
+def dump_snapshot(fileobj, items, records=None):
+    """Writes a snapshot.
+
+    Args:
+        fileobj (fileobj): opened for binary writing
+        items (List[AudioFile])
+        records (List[Tuple[fsnative, fsnative, bytes, bool]] or None):
+            already pickled items as (key, mount point, data, normalized),
+            see `LazyContents.records()`. Records which aren't normalized
+            get converted, records which fail to convert get left out.
+    Raises:
+        EnvironmentError
+        SerializationError
+    """
+
+    mounts = {}
+    index = []
+
+    def add(key, mountpoint, data):
+        mount_id = mounts.setdefault(mountpoint, len(mounts))
+        index.append((key, mount_id, fileobj.tell(), len(data)))
+        fileobj.write(data)
+
+    fileobj.write(_HEADER.pack(MAGIC, VERSION, sys.version_info[0]))
+    for item in items:
+        add(item.key, item.get("~mountpoint"),
+            dump_audio_files([item], process=False))
+    for key, mountpoint, data, normalized in (records or []):
+        if not normalized:
+            try:
+                data = _normalize(data)
+            except SerializationError:
+                print_w("Failed to convert %r, leaving it out" % key)
+                continue
+        add(key, mountpoint, data)
+
+    index_offset = fileobj.tell()
+    mountpoints = sorted(mounts, key=mounts.__getitem__)
+    try:
+        fileobj.write(pickle_dumps((mountpoints, index), 2))
+    except PickleError as e:
+        raise SerializationError(e)
+    fileobj.write(_TRAILER.pack(index_offset, MAGIC))
+
+
+def load_snapshot(filename):
+    """Opens a snapshot file.
+
+    Args:
+        filename (fsnative)
+    Returns:
+        LazyContents or None: None if the file is not a snapshot
+    Raises:
+        EnvironmentError
+        SerializationError
+    """
+
+    with open(filename, "rb") as fileobj:
+        if not is_snapshot(fileobj.read(len(MAGIC))):
+            return
+        fileobj.seek(0)
+        if os.name == "nt":
+            # a mapped file can't be replaced on Windows
+            data = fileobj.read()
+        else:
+            data = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+    size = len(data)
+    if size < _HEADER.size + _TRAILER.size:
+        raise SerializationError("snapshot too short")
+    magic, version, py_major = _HEADER.unpack_from(data, 0)
+    index_offset, magic = _TRAILER.unpack_from(data, size - _TRAILER.size)
+    if version not in (1, VERSION) or magic != MAGIC or \
+            not _HEADER.size <= index_offset <= size - _TRAILER.size:
+        raise SerializationError("unsupported or truncated snapshot")
+
+    try:
+        mountpoints, entries = pickle_loads(
+            bytes(data[index_offset:size - _TRAILER.size]))
+    except PickleError as e:
+        raise SerializationError(e)
+
+    normalized = version == VERSION and py_major == sys.version_info[0]
+    contents = LazyContents(data, mountpoints, normalized)
+    index = contents._index
+    for key, mount_id, offset, length in entries:
+        index[key] = (offset, length, mount_id)
+
+    if py_major != sys.version_info[0]:
+        # keys and mount points in the index have the wrong types, but
+        # decoding the items takes care of converting them
+        print_d("Snapshot from a different Python version, decoding all")
+        items = contents.values()
+        contents = LazyContents(normalized=False)
+        for item in items:
+            contents[item.key] = item
+
+    return contents
+
+
+class LazyContents(object):
+    """A dict-like key -> item mapping which unpickles items from snapshot
+    data the first time they get accessed.
+
+    Iterating over the values or items decodes everything.
+    """
+
+    def __init__(self, data=None, mountpoints=None, normalized=True):
+        self._items = {}
+        self._index = {}
+        self._data = data
+        self._mountpoints = mountpoints or []
+        # if the items come from a file in the current format, otherwise
+        # the file should be written again (see dump_snapshot())
+        self.normalized = normalized
+
+    @property
+    def pending(self):
+        """Number of items not decoded yet"""
+
+        return len(self._index)
+
+    def _load(self, key):
+        offset, length, mount_id = self._index.pop(key)
+        try:
+            item = _decode(
+                self._data[offset:offset + length], self.normalized)
+        except SerializationError:
+            print_w("Failed to load %r from library" % key)
+            item = None
+        else:
+            self._items[key] = item
+        if not self._index:
+            self._data = None
+        return item
+
+    def _load_all(self):
+        if not self._index:
+            return
+        print_d("Loading %d remaining items" % len(self._index))
+        data = self._data
+        keys = listkeys(self._index)
+        # in file order, to read the mapped file sequentially
+        keys.sort(key=self._index.__getitem__)
+        records = [data[o:o + l] for (o, l, m) in map(self._index.get, keys)]
+        items = self._items
+        loaded_many = load_audio_files_many(
+            records, normalized=self.normalized)
+        for key, loaded in zip(keys, loaded_many):
+            if loaded:
+                items[key] = loaded[0]
+            else:
+                print_w("Failed to load %r from library" % key)
+        self._index.clear()
+        self._data = None
+
+    def mountpoint(self, key):
+        """The mount point of the item without loading it
+
+        Raises:
+            KeyError
+        """
+
+        try:
+            return self._mountpoints[self._index[key][2]]
+        except KeyError:
+            return self._items[key].mountpoint
+
+    def records(self):
+        """The (key, mount point, data, normalized) tuples of all items
+        which were not loaded yet, suitable for `dump_snapshot()`.
+        """
+
+        data = self._data
+        mountpoints = self._mountpoints
+        normalized = self.normalized
+        return [(k, mountpoints[m], bytes(data[o:o + l]), normalized)
+                for (k, (o, l, m)) in iteritems(self._index)]
+
+    def loaded(self):
+        """All items which were already loaded"""
+
+        return list(self._items.values())
+
+    def __getitem__(self, key):
+        try:
+            return self._items[key]
+        except KeyError:
+            if key not in self._index:
+                raise
+        item = self._load(key)
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, item):
+        self._index.pop(key, None)
+        self._items[key] = item
+
+    def __delitem__(self, key):
+        if self._index.pop(key, None) is None:
+            del self._items[key]
+
+    def pop(self, key, *args):
+        if key in self._index:
+            self._load(key)
+        return self._items.pop(key, *args)
+
+    def update(self, other):
+        for key, item in iteritems(other):
+            self[key] = item
+
+    def clear(self):
+        self._items.clear()
+        self._index.clear()
+        self._data = None
+
+    def __contains__(self, key):
+        return key in self._items or key in self._index
+
+    def __len__(self):
+        return len(self._items) + len(self._index)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        if not self._index:
+            return self._items.keys()
+        return listkeys(self._items) + listkeys(self._index)
+
+    def values(self):
+        self._load_all()
+        return self._items.values()
+
+    def items(self):
+        self._load_all()
+        return self._items.items()
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        self._load_all()
+        return itervalues(self._items)
+
+    def iteritems(self):
+        self._load_all()
+        return iteritems(self._items)
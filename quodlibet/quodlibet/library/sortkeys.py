@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Cached sort keys of songs, for sorting the same songs again and again."""
+
+from quodlibet.formats._audio import AudioFile, VOLATILE_TAGS
+from quodlibet.compat import itervalues, string_types
+
+
+def is_cacheable(tag):
+    """If the sort key for a tag only changes when the song changes
+
+    Args:
+        tag (str or callable): see `AudioFile.sort_by_func`
+    Returns:
+        bool
+    """
+
+    if not isinstance(tag, string_types):
+        return False
+    return not any(v in tag for v in VOLATILE_TAGS)
+
+
+class SortKeys(object):
+    """Remembers the results of `AudioFile.sort_by_func()` per tag and song.
+
+    Keys of changed and removed songs get forgotten through the library
+    signals. Songs which aren't in the library can be passed as well.
+    """
+
+    MAX_FACTOR = 2
+    """Entries per tag relative to the library size above which they get
+    dropped, so songs which aren't in the library don't pile up"""
+
+    def __init__(self, library):
+        self._library = library
+        self._keys = {}
+        self._sig_ids = [
+            library.connect('changed', self.__forget),
+            library.connect('removed', self.__forget),
+        ]
+
+    def destroy(self):
+        for sig_id in self._sig_ids:
+            self._library.disconnect(sig_id)
+        self._sig_ids = []
+        self._keys.clear()
+
+    def __forget(self, library, songs):
+        for keys in itervalues(self._keys):
+            pop = keys.pop
+            for song in songs:
+                pop(id(song), None)
+
+    def get_sort_func(self, tag):
+        """Like `AudioFile.sort_by_func()`, but the keys get cached if
+        possible.
+
+        Args:
+            tag (str or callable)
+        Returns:
+            callable: taking a song, returning the sort key
+        """
+
+        sort_func = AudioFile.sort_by_func(tag)
+        if not is_cacheable(tag):
+            return sort_func
+
+        keys = self._keys.setdefault(tag, {})
+        if len(keys) > max(len(self._library), 1000) * self.MAX_FACTOR:
+            keys.clear()
+        get = keys.get
+
+        def cached_sort_func(song):
+            # keyed by id() as that's faster than AudioFile.__hash__,
+            # the song is kept to notice reused ids
+            entry = get(id(song))
+            if entry is not None and entry[0] is song:
+                return entry[1]
+            key = sort_func(song)
+            keys[id(song)] = (song, key)
+            return key
+
+        return cached_sort_func
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""An inverted index of tag values for finding query candidates."""
+
+from quodlibet.query._match import Tag
+from quodlibet.unisearch import fold
+from quodlibet.util.dprint import print_d
+from quodlibet.compat import iteritems, itervalues, text_type
+
+
+_IN, _PREFIX, _SUFFIX, _EXACT = range(4)
+
+
+def _narrows(old, new, kind):
+    # if all words matching `new` also match `old`
+    if kind == _IN:
+        return old in new
+    elif kind == _PREFIX:
+        return new.startswith(old)
+    return new.endswith(old)
+
+
+class TagIndex(object):
+    """Maps the words of the folded (see `quodlibet.unisearch.fold`) values
+    of a tag to the songs containing them.
+
+    The index of a tag gets built the first time it's needed and is kept
+    up to date through the library signals. Songs only get added to it,
+    so lookups can return songs which have changed since; once there are
+    too many of those the index gets rebuilt. Removed songs are left out.
+    """
+
+    MIN_PART = 2
+    """Shorter parts of words match too much to be worth looking up"""
+
+    MAX_STALE = 0.25
+    """Fraction of changed/removed songs after which the index gets
+    rebuilt"""
+
+    MAX_CANDIDATES = 0.5
+    """Fraction of the library above which a lookup result isn't
+    considered helpful"""
+
+    def __init__(self, library):
+        self._library = library
+        self._tags = {}
+        self._matches = {}
+        self._removed = set()
+        self._stale = 0
+        self._sig_ids = [
+            library.connect('added', self.__added),
+            library.connect('changed', self.__changed),
+            library.connect('removed', self.__removed),
+        ]
+
+    def destroy(self):
+        for sig_id in self._sig_ids:
+            self._library.disconnect(sig_id)
+        self._sig_ids = []
+        self._tags.clear()
+        self._matches.clear()
+        self._removed.clear()
+
+    def _index(self, words, tag, songs):
+        get_value = Tag.get_value
+        for song in songs:
+            value = get_value(song, tag)
+            if not isinstance(value, text_type):
+                continue
+            for word in set(fold(value).split()):
+                songs_ = words.get(word)
+                if songs_ is None:
+                    words[word] = {song}
+                else:
+                    songs_.add(song)
+
+    def _get_words(self, tag):
+        words = self._tags.get(tag)
+        if words is None:
+            print_d("Indexing %r" % tag)
+            words = self._tags[tag] = {}
+            self._index(words, tag, itervalues(self._library))
+        return words
+
+    def __added(self, library, songs):
+        self._matches.clear()
+        if self._removed:
+            self._removed.difference_update(songs)
+        for tag, words in iteritems(self._tags):
+            self._index(words, tag, songs)
+
+    def __changed(self, library, songs):
+        self.__added(library, songs)
+        self._add_stale(len(songs))
+
+    def __removed(self, library, songs):
+        if self._tags:
+            self._removed.update(songs)
+        self._add_stale(len(songs))
+
+    def _add_stale(self, count):
+        self._stale += count
+        if self._stale > max(len(self._library), 1000) * self.MAX_STALE:
+            print_d("Too many changes, dropping index")
+            self._tags.clear()
+            self._matches.clear()
+            self._removed.clear()
+            self._stale = 0
+
+    def _find_words(self, tag, kind, part):
+        words = self._get_words(tag)
+        if kind == _EXACT:
+            return [part] if part in words else []
+
+        key = (tag, kind, part)
+        found = self._matches.get(key)
+        if found is not None:
+            return found
+
+        # while typing, the previous result for a shorter part contains
+        # all the words needed
+        source = words
+        for (t, k, p), old_found in iteritems(self._matches):
+            if t == tag and k == kind and len(old_found) < len(source) \
+                    and _narrows(p, part, kind):
+                source = old_found
+
+        if kind == _IN:
+            found = [w for w in source if part in w]
+        elif kind == _PREFIX:
+            found = [w for w in source if w.startswith(part)]
+        else:
+            found = [w for w in source if w.endswith(part)]
+
+        if len(self._matches) > 100:
+            self._matches.clear()
+        self._matches[key] = found
+        return found
+
+    def lookup(self, tag, literal):
+        """Find songs where the value of `tag` (see `Tag.get_value`) might
+        contain the literal, in any way a query regex would match it.
+
+        Args:
+            tag (str): a lowercase tag name, not numeric
+            literal (text_type)
+        Returns:
+            set or None: a new set containing at least all songs of the
+                library where the literal matches, but maybe more. None if
+                all songs could match.
+        """
+
+        parts = fold(literal).split(u" ")
+        last = len(parts) - 1
+        max_size = len(self._library) * self.MAX_CANDIDATES
+
+        result = None
+        for i, part in enumerate(parts):
+            if len(part) < self.MIN_PART:
+                continue
+
+            if i == 0:
+                kind = _IN if i == last else _SUFFIX
+            else:
+                kind = _PREFIX if i == last else _EXACT
+
+            words = self._get_words(tag)
+            songs = set()
+            for word in self._find_words(tag, kind, part):
+                songs.update(words[word])
+                if len(songs) > max_size:
+                    break
+            else:
+                if result is None:
+                    result = songs
+                else:
+                    result &= songs
+                if not result:
+                    break
+
+        if result and self._removed:
+            result -= self._removed
+        return result
@@ -53,6 +53,20 @@ def main(argv=None):
     app.id = "io.github.quodlibet.QuodLibet"
     quodlibet.set_application_info(Icons.QUODLIBET, "quodlibet", app.name)
 
+    from quodlibet.util import compilecache
+    compilecache.init(os.path.join(quodlibet.get_cache_dir(), "compiled"))
+    from quodlibet.formats import init_tag_cache, get_tag_cache
+    init_tag_cache(os.path.join(quodlibet.get_cache_dir(), "tags.sqlite"))
+    from quodlibet.util.cover.embedded import init_embedded_cache, \
+        get_embedded_cache
+    init_embedded_cache(os.path.join(quodlibet.get_cache_dir(), "embedded"))
+    # drop the entries of deleted and moved files
+    from quodlibet.util.thread import call_async_background, Cancellable
+    prune_cancellable = Cancellable()
+    for cache in [get_tag_cache(), get_embedded_cache()]:
+        call_async_background(cache.prune, prune_cancellable,
+                              lambda removed: None, args=(prune_cancellable,))
+
     library_path = os.path.join(quodlibet.get_user_dir(), "songs")
 
     print_d("Initializing main library (%s)" % (
@@ -207,7 +221,9 @@ def main(argv=None):
     fsiface.destroy()
 
     tracker.destroy()
+    prune_cancellable.cancel()
     quodlibet.library.save()
+    compilecache.save()
 
     config.save()
 
@@ -6,10 +6,15 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import os
 import sys
+import multiprocessing
+from collections import deque
 from optparse import OptionParser
 
+import quodlibet
 from quodlibet import _
+from quodlibet import formats
 from quodlibet.formats import MusicFile, AudioFileError
 from quodlibet.util import print_
 
@@ -18,6 +23,65 @@ class CommandError(Exception):
     pass
 
 
+def iter_files(paths, recursive=False):
+    """Yields the passed paths, with directories replaced by the supported
+    files they contain if recursive is True.
+
+    Args:
+        paths (List[fsnative])
+        recursive (bool)
+    Yields:
+        fsnative
+    """
+
+    for path in paths:
+        if not recursive or not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, dnames, fnames in os.walk(path):
+            dnames.sort()
+            for filename in sorted(fnames):
+                if formats.filter(filename):
+                    yield os.path.join(root, filename)
+
+
+def load_songs(paths, jobs=1):
+    """Loads files while iterating over them.
+
+    With more than one job the files get loaded in a pool of processes,
+    with only a few files per process loaded ahead, so memory use doesn't
+    depend on the number of files.
+
+    Args:
+        paths (Iterable[fsnative])
+        jobs (int): number of processes to use
+    Yields:
+        Tuple[fsnative, AudioFile]: in the order of paths, the song is None
+            if the file failed to load
+    """
+
+    if jobs <= 1:
+        for path in paths:
+            yield path, MusicFile(path)
+        return
+
+    pool = multiprocessing.Pool(jobs, initializer=quodlibet.init_cli)
+    try:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.apply_async(MusicFile, (path,))))
+            if len(pending) >= jobs * 4:
+                path, result = pending.popleft()
+                yield path, result.get()
+        while pending:
+            path, result = pending.popleft()
+            yield path, result.get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 class Command(object):
     """Base class for commands.
 
@@ -41,6 +105,7 @@ class Command(object):
         if options is None:
             options = self.__parser.parse_args([])[0]
         self.__options = options
+        self._originals = {}
         self._add_options(self.__parser)
 
     def _add_options(self, parser):
@@ -71,8 +136,51 @@ class Command(object):
             raise CommandError(_("Failed to load file: %r") % path)
         return song
 
-    def save_songs(self, songs):
-        """Save all passed songs"""
+    def iter_songs(self, paths, options, strict=False):
+        """Loads the files while iterating over them, see `load_songs()`.
+        The options of `util.add_stream_options()` are used.
+
+        Args:
+            paths (List[fsnative]): files, or directories if recursive
+            options: the parsed options
+            strict (bool): if loading errors should stop the iteration
+        Yields:
+            Tuple[fsnative, AudioFile]
+        Raises:
+            CommandError: if a file failed to load, with strict right away,
+                otherwise once all other files are done
+        """
+
+        failed = False
+        paths = iter_files(paths, options.recursive)
+        for path, song in load_songs(paths, max(options.jobs, 1)):
+            self.log("Load file: %r" % path)
+            if not song:
+                if strict:
+                    raise CommandError(_("Failed to load file: %r") % path)
+                self.log(_("Failed to load file: %r") % path)
+                failed = True
+                continue
+            if getattr(options, "journal", None):
+                # to record what gets changed
+                from .batch import get_tags
+                self._originals[song("~filename")] = get_tags(song)
+            yield path, song
+
+        if failed:
+            raise CommandError(_("One or more files failed to load."))
+
+    def save_songs(self, songs, options=None):
+        """Save all passed songs.
+
+        If a journal was passed (see `util.add_batch_options()`) the
+        changes of all songs get recorded in it first and then written
+        in `options.jobs` processes, see `quodlibet.operon.batch`.
+        """
+
+        if getattr(options, "journal", None):
+            self.__save_batch(songs, options)
+            return
 
         self.log("Saving songs...")
 
@@ -82,6 +190,33 @@ class Command(object):
             except AudioFileError as e:
                 raise CommandError(e)
 
+    def __save_batch(self, songs, options):
+        from . import batch
+
+        journal = batch.Journal(options.journal)
+        if journal.exists():
+            raise CommandError(
+                _("Journal %r already exists") % options.journal)
+
+        changes = []
+        planned = set()
+        try:
+            for song in songs:
+                path = song("~filename")
+                if path in planned:
+                    continue
+                planned.add(path)
+                old, new = batch.get_changes(
+                    self._originals[path], batch.get_tags(song))
+                if new:
+                    journal.plan(path, old, new)
+                    changes.append((path, new))
+        finally:
+            journal.close()
+
+        self.log("Saving %d songs..." % len(changes))
+        batch.execute(journal, changes, max(options.jobs, 1), self.log)
+
     def _execute(self, options, args):
         """Override to execute something"""
 
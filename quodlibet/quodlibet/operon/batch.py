@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Tag writes planned up front, recorded in a journal and executed in a
+pool of processes.
+
+The journal is a text file with one JSON object per line. It starts with
+the planned changes of all files, followed by the result of each write,
+so an interrupted batch can be resumed or rolled back. Files changed by
+something else in the meantime are left alone.
+"""
+
+import os
+import io
+import json
+import time
+import multiprocessing
+
+from senf import fsn2uri, uri2fsn, fsn2text
+
+import quodlibet
+from quodlibet import _
+from quodlibet.formats import MusicFile, AudioFileError
+from quodlibet.compat import iteritems, text_type
+
+from .base import CommandError
+
+
+PENDING, WRITTEN, ROLLED_BACK = "pending", "written", "rolled back"
+"""States of a file in the journal"""
+
+
+def get_tags(song):
+    """Returns all values of all tags which can be written
+
+    Args:
+        song (AudioFile)
+    Returns:
+        Dict[str, List[text_type]]
+    """
+
+    return dict((k, song.list(k)) for k in song.realkeys())
+
+
+def get_changes(old, new):
+    """Returns the tags which differ between old and new
+
+    Args:
+        old (Dict[str, List[text_type]]): see `get_tags()`
+        new (Dict[str, List[text_type]])
+    Returns:
+        Tuple[Dict, Dict]: old and new values of the changed tags, an empty
+            list for a missing tag
+    """
+
+    old_changes = {}
+    new_changes = {}
+    for key in set(old) | set(new):
+        old_values = old.get(key, [])
+        new_values = new.get(key, [])
+        if old_values != new_values:
+            old_changes[key] = old_values
+            new_changes[key] = new_values
+    return old_changes, new_changes
+
+
+def get_stat(path):
+    """Returns what identifies the written state of a file
+
+    Args:
+        path (fsnative)
+    Returns:
+        Tuple[float, int] or None: the modification time and size, None if
+            the file doesn't exist
+    """
+
+    try:
+        stat = os.stat(path)
+    except EnvironmentError:
+        return None
+    return stat.st_mtime, stat.st_size
+
+
+def _has_tags(song, tags):
+    current = get_tags(song)
+    for key, values in iteritems(tags):
+        if current.get(key, []) != values:
+            return False
+    return True
+
+
+def apply_changes(path, tags, expected=None, stat=None):
+    """Loads a file, sets the tags and writes it. Tags with no values get
+    removed.
+
+    Args:
+        path (fsnative)
+        tags (Dict[str, List[text_type]])
+        expected (List[Dict] or None): the file only gets written if it
+            has the values of one of them, see `get_tags()`
+        stat (Tuple[float, int] or None): the file only gets written if it
+            still has this modification time and size, see `get_stat()`
+    Returns:
+        Tuple[fsnative, float, text_type or None, Tuple[float, int] or None]:
+            the path, the time it took in seconds, an error message if it
+            failed and the modification time and size after the write
+    """
+
+    start = time.time()
+    if stat is not None and get_stat(path) != tuple(stat):
+        return path, time.time() - start, _("File changed since it was "
+                                            "written"), None
+
+    song = MusicFile(path)
+    if not song:
+        return path, time.time() - start, _("Failed to load file"), None
+
+    if expected is not None and \
+            not any(_has_tags(song, e) for e in expected):
+        return path, time.time() - start, _("Tags changed since they were "
+                                            "planned"), None
+
+    for key, values in iteritems(tags):
+        if values:
+            song[key] = u"\n".join(values)
+        elif key in song:
+            del song[key]
+
+    try:
+        song.write()
+    except AudioFileError as e:
+        return path, time.time() - start, text_type(e), None
+    return path, time.time() - start, None, get_stat(path)
+
+
+def _apply_changes(args):
+    return apply_changes(*args)
+
+
+def run_changes(changes, jobs=1):
+    """Writes tags to files, in a pool of processes if jobs > 1
+
+    Args:
+        changes (Iterable[Tuple]): the arguments for each
+            `apply_changes()` call, at least the path and the tags to set
+        jobs (int)
+    Yields:
+        Tuple: see `apply_changes()`, in the order they finish
+    """
+
+    if jobs <= 1:
+        for args in changes:
+            yield apply_changes(*args)
+        return
+
+    pool = multiprocessing.Pool(jobs, initializer=quodlibet.init_cli)
+    try:
+        for result in pool.imap_unordered(_apply_changes, changes):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class Journal(object):
+    """A record of planned tag changes and which of them got written or
+    rolled back.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _append(self, entry):
+        if self._file is None:
+            self._file = io.open(self.path, "a", encoding="utf-8")
+        self._file.write(text_type(json.dumps(entry, sort_keys=True)))
+        self._file.write(u"\n")
+        # so nothing gets lost if the process gets killed
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def plan(self, path, old, new):
+        """Records the planned change of a file
+
+        Args:
+            path (fsnative)
+            old (Dict[str, List[text_type]]): the current values of the
+                changed tags
+            new (Dict[str, List[text_type]]): the new values
+        """
+
+        self._append({"plan": fsn2uri(os.path.abspath(path)),
+                      "old": old, "new": new})
+
+    def done(self, path, seconds, error=None, rollback=False, stat=None):
+        """Records the result of writing a file
+
+        Args:
+            path (fsnative)
+            seconds (float): the time the write took
+            error (text_type or None): why it failed, if it did
+            rollback (bool): if the old values were written
+            stat (Tuple[float, int] or None): the modification time and
+                size after the write
+        """
+
+        entry = {"done": fsn2uri(os.path.abspath(path)),
+                 "time": round(seconds, 4)}
+        if error is not None:
+            entry["error"] = error
+        if rollback:
+            entry["rollback"] = True
+        if stat is not None:
+            entry["mtime"], entry["size"] = stat
+        self._append(entry)
+
+    def read(self):
+        """Returns the recorded state of all planned files
+
+        Returns:
+            List[Dict]: in the planned order, with the keys "path", "old",
+                "new", "state" (one of `PENDING`, `WRITTEN`, `ROLLED_BACK`),
+                "time" and "stat" (of the last successful write or None,
+                see `get_stat()`) and "error" (of the last write or None)
+        Raises:
+            CommandError
+        """
+
+        files = []
+        by_uri = {}
+        try:
+            with io.open(self.path, "r", encoding="utf-8") as h:
+                for line in h:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line, if the process got killed
+                        continue
+                    if "plan" in entry:
+                        state = {"path": uri2fsn(entry["plan"]),
+                                 "old": entry["old"], "new": entry["new"],
+                                 "state": PENDING, "time": None,
+                                 "stat": None, "error": None}
+                        by_uri[entry["plan"]] = state
+                        files.append(state)
+                    elif "done" in entry:
+                        state = by_uri[entry["done"]]
+                        state["error"] = entry.get("error")
+                        if state["error"] is None:
+                            state["time"] = entry["time"]
+                            state["stat"] = None
+                            if "mtime" in entry:
+                                state["stat"] = (entry["mtime"],
+                                                 entry["size"])
+                            state["state"] = ROLLED_BACK \
+                                if entry.get("rollback") else WRITTEN
+        except (EnvironmentError, ValueError, KeyError, TypeError) as e:
+            raise CommandError(
+                _("Failed to read journal %r: %s") % (self.path, e))
+        return files
+
+
+def execute(journal, changes, jobs=1, log=None, rollback=False):
+    """Writes the changes and records the results in the journal
+
+    Args:
+        journal (Journal)
+        changes (List[Tuple]): see `run_changes()`
+        jobs (int)
+        log (callable or None): gets passed a message for each file
+        rollback (bool): if the changes restore the old values
+    Raises:
+        CommandError: if any file failed, once all are done
+    """
+
+    start = time.time()
+    failed = 0
+    try:
+        for path, seconds, error, stat in run_changes(changes, jobs):
+            journal.done(path, seconds, error, rollback, stat)
+            if error is not None:
+                failed += 1
+                message = u"%s: %s" % (fsn2text(path), error)
+            else:
+                message = u"%s: %.3fs" % (fsn2text(path), seconds)
+            if log is not None:
+                log(message)
+    finally:
+        journal.close()
+
+    if log is not None:
+        log(_("Wrote %(count)d files in %(seconds).3fs") % {
+            "count": len(changes) - failed, "seconds": time.time() - start})
+    if failed:
+        raise CommandError(
+            _("Failed to write %(count)d files, see %(journal)r") % {
+                "count": failed, "journal": journal.path})
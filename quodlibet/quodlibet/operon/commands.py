@@ -28,15 +28,18 @@ from quodlibet.util.tagsfrompath import TagsFromPattern
 from quodlibet.compat import text_type, iteritems
 
 from .base import Command, CommandError
+from . import batch
 from .util import print_terse_table, copy_mtime, list_tags, print_table, \
-    get_editor_args
+    get_editor_args, add_stream_options, print_json, add_batch_options, \
+    add_jobs_option
 
 
 @Command.register
 class ListCommand(Command):
     NAME = "list"
     DESCRIPTION = _("List tags")
-    USAGE = "[-a] [-t] [-c <c1>,<c2>...] <file>"
+    USAGE = "[-a] [-t] [-c <c1>,<c2>...] [--json [-r] [-j N]] <file> " \
+        "[<files>]"
 
     def _add_options(self, p):
         p.add_option("-t", "--terse", action="store_true",
@@ -46,11 +49,17 @@ class ListCommand(Command):
                      % "desc,value,tag")
         p.add_option("-a", "--all", action="store_true",
                      help=_("Also list programmatic tags"))
+        add_stream_options(p)
 
     def _execute(self, options, args):
         if len(args) < 1:
             raise CommandError(_("Not enough arguments"))
-        elif len(args) > 1:
+
+        if options.json:
+            self.__print_json(options, args)
+            return
+
+        if len(args) > 1 or options.recursive:
             raise CommandError(_("Too many arguments"))
 
         path = args[0]
@@ -70,12 +79,20 @@ class ListCommand(Command):
         else:
             print_table(tags, headers, nicks, order)
 
+    def __print_json(self, options, args):
+        for path, song in self.iter_songs(args, options):
+            tags = {}
+            for desc, value, key in list_tags(song, machine=options.all,
+                                              terse=True):
+                tags.setdefault(key, []).append(value)
+            print_json({"file": fsn2text(path), "tags": tags})
+
 
 @Command.register
 class TagsCommand(Command):
     NAME = "tags"
     DESCRIPTION = _("List all common tags")
-    USAGE = "[-t] [-c <c1>,<c2>...]"
+    USAGE = "[-t] [-c <c1>,<c2>...] [--json]"
 
     def _add_options(self, p):
         p.add_option("-t", "--terse", action="store_true",
@@ -85,6 +102,8 @@ class TagsCommand(Command):
                      % "tag,desc")
         p.add_option("-a", "--all", action="store_true",
                      help=_("Also list programmatic tags"))
+        p.add_option("--json", action="store_true",
+                     help=_("Print one JSON object per line"))
 
     def _execute(self, options, args):
         if len(args) != 0:
@@ -107,7 +126,10 @@ class TagsCommand(Command):
             tags.append((key, util.tag(key)))
         tags.sort()
 
-        if not options.terse:
+        if options.json:
+            for key, desc in tags:
+                print_json({"tag": key, "desc": desc})
+        elif not options.terse:
             print_table(tags, headers, nicks, order)
         else:
             print_terse_table(tags, nicks, order)
@@ -283,11 +305,14 @@ class EditCommand(Command):
 class SetCommand(Command):
     NAME = "set"
     DESCRIPTION = _("Set a tag and remove existing values")
-    USAGE = "[--dry-run] <tag> <value> <file> [<files>]"
+    USAGE = "[--dry-run] [-r] [-j N] [--journal <file>] <tag> <value> " \
+        "<file> [<files>]"
 
     def _add_options(self, p):
         p.add_option("--dry-run", action="store_true",
                      help=_("Show changes, don't apply them"))
+        add_stream_options(p, json=False)
+        add_batch_options(p)
 
     def _execute(self, options, args):
         if len(args) < 3:
@@ -298,9 +323,7 @@ class SetCommand(Command):
         paths = args[2:]
 
         songs = []
-        for path in paths:
-            song = self.load_song(path)
-
+        for path, song in self.iter_songs(paths, options, strict=True):
             if not song.can_change(tag):
                 raise CommandError(_("Can not set %r") % tag)
 
@@ -311,14 +334,15 @@ class SetCommand(Command):
             songs.append(song)
 
         if not options.dry_run:
-            self.save_songs(songs)
+            self.save_songs(songs, options)
 
 
 @Command.register
 class ClearCommand(Command):
     NAME = "clear"
     DESCRIPTION = _("Remove tags")
-    USAGE = "[--dry-run] [-a | -e <pattern> | <tag>] <file> [<files>]"
+    USAGE = "[--dry-run] [-r] [-j N] [--journal <file>] " \
+        "[-a | -e <pattern> | <tag>] <file> [<files>]"
 
     def _add_options(self, p):
         p.add_option("--dry-run", action="store_true",
@@ -327,6 +351,8 @@ class ClearCommand(Command):
                      help=_("Value is a regular expression"))
         p.add_option("-a", "--all", action="store_true",
                      help=_("Remove all tags"))
+        add_stream_options(p, json=False)
+        add_batch_options(p)
 
     def _execute(self, options, args):
         if options.all and options.regexp is not None:
@@ -345,9 +371,7 @@ class ClearCommand(Command):
             self.verbose = True
 
         songs = []
-        for path in paths:
-            song = self.load_song(path)
-
+        for path, song in self.iter_songs(paths, options, strict=True):
             tags = []
             realkeys = song.realkeys()
             if options.all:
@@ -371,7 +395,7 @@ class ClearCommand(Command):
                 songs.append(song)
 
         if not options.dry_run:
-            self.save_songs(songs)
+            self.save_songs(songs, options)
 
 
 @Command.register
@@ -653,11 +677,14 @@ class RenameCommand(Command):
 class FillCommand(Command):
     NAME = "fill"
     DESCRIPTION = _("Fill tags based on the file path")
-    USAGE = "[--dry-run] <pattern> <file> [<files>]"
+    USAGE = "[--dry-run] [-r] [-j N] [--json] [--journal <file>] " \
+        "<pattern> <file> [<files>]"
 
     def _add_options(self, p):
         p.add_option("--dry-run", action="store_true",
                      help="show changes, don't apply them")
+        add_stream_options(p)
+        add_batch_options(p)
 
     def _execute(self, options, args):
         if len(args) < 2:
@@ -669,9 +696,17 @@ class FillCommand(Command):
 
         pattern = TagsFromPattern(pattern_text)
 
+        if options.dry_run and options.json:
+            # nothing gets written, so no need to check all files first
+            for path, song in self.iter_songs(paths, options):
+                match = pattern.match(song)
+                tags = dict((h, match[h]) for h in pattern.headers
+                            if h in match)
+                print_json({"file": fsn2text(path), "tags": tags})
+            return
+
         songs = []
-        for path in paths:
-            song = self.load_song(path)
+        for path, song in self.iter_songs(paths, options, strict=True):
             for header in pattern.headers:
                 if not song.can_change(header):
                     raise CommandError(_("Can not set %r") % header)
@@ -680,9 +715,9 @@ class FillCommand(Command):
         if options.dry_run:
             self.__preview(pattern, songs)
         else:
-            self.__apply(pattern, songs)
+            self.__apply(pattern, songs, options)
 
-    def __apply(self, pattern, songs):
+    def __apply(self, pattern, songs, options):
         for song in songs:
             match = pattern.match(song)
             self.log("%r: %r" % (song("~basename"), match))
@@ -691,7 +726,7 @@ class FillCommand(Command):
                     value = match[header]
                     song[header] = value
 
-        self.save_songs(songs)
+        self.save_songs(songs, options)
 
     def __preview(self, pattern, songs):
         rows = []
@@ -707,6 +742,52 @@ class FillCommand(Command):
         print_table(rows, headers, nicks, nicks)
 
 
+@Command.register
+class JournalCommand(Command):
+    NAME = "journal"
+    DESCRIPTION = _("Show, resume or roll back changes recorded with "
+                    "--journal")
+    USAGE = "[-j N] [status | resume | rollback] <journal>"
+
+    def _add_options(self, p):
+        add_jobs_option(p)
+
+    def _execute(self, options, args):
+        if len(args) < 2:
+            raise CommandError(_("Not enough arguments"))
+        elif len(args) > 2:
+            raise CommandError(_("Too many arguments"))
+
+        action, path = args
+        journal = batch.Journal(path)
+        files = journal.read()
+        jobs = max(options.jobs, 1)
+
+        if action == "status":
+            rows = []
+            for f in files:
+                state = f["state"]
+                if f["error"] is not None:
+                    state = u"%s (%s)" % (state, f["error"])
+                time_ = u"%.3f" % f["time"] if f["time"] is not None else u""
+                rows.append([fsn2text(f["path"]), state, time_])
+            headers = [_("File"), _("State"), _("Time")]
+            nicks = ["file", "state", "time"]
+            print_table(rows, headers, nicks, nicks)
+        elif action == "resume":
+            # the last write might have happened without being recorded
+            changes = [(f["path"], f["new"], [f["old"], f["new"]])
+                       for f in files if f["state"] == batch.PENDING]
+            batch.execute(journal, changes, jobs, self.log)
+        elif action == "rollback":
+            # don't overwrite changes made after ours
+            changes = [(f["path"], f["old"], [f["new"]], f["stat"])
+                       for f in files if f["state"] == batch.WRITTEN]
+            batch.execute(journal, changes, jobs, self.log, rollback=True)
+        else:
+            raise CommandError(_("Unknown action %r") % action)
+
+
 # @Command.register
 class FillTracknumberCommand(Command):
     NAME = "fill-tracknumber"
@@ -730,11 +811,12 @@ class FillTracknumberCommand(Command):
 class PrintCommand(Command):
     NAME = "print"
     DESCRIPTION = _("Print tags based on the given pattern")
-    USAGE = "[-p <pattern>] <file> [<files>]"
+    USAGE = "[-p <pattern>] [-r] [-j N] [--json] <file> [<files>]"
 
     def _add_options(self, p):
         p.add_option("-p", "--pattern", action="store", type="string",
                      help="use a custom pattern")
+        add_stream_options(p)
 
     def _execute(self, options, args):
         if len(args) < 1:
@@ -751,16 +833,11 @@ class PrintCommand(Command):
         except PatternError:
             raise CommandError("Invalid pattern: %r" % pattern)
 
-        paths = args
-        error = False
-        for path in paths:
-            try:
-                util.print_(pattern % self.load_song(path))
-            except CommandError:
-                error = True
-
-        if error:
-            raise CommandError("One or more files failed to load.")
+        for path, song in self.iter_songs(args, options):
+            if options.json:
+                print_json({"file": fsn2text(path), "output": pattern % song})
+            else:
+                util.print_(pattern % song)
 
 
 @Command.register
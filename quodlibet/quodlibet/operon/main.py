@@ -14,6 +14,7 @@ from senf import argv as sys_argv
 
 import quodlibet
 from quodlibet import const
+from quodlibet.formats import init_tag_cache
 from quodlibet.util.dprint import print_
 
 from .base import Command, CommandError
@@ -102,6 +103,9 @@ def main(argv=None):
             _print_help(main_cmd, parser)
             return 0
 
+    # files which didn't change since the last run don't get parsed again
+    init_tag_cache(os.path.join(quodlibet.get_cache_dir(), "tags.sqlite"))
+
     # get the right sub command and pass the remaining args
     for command in Command.COMMANDS:
         if command.NAME == arg:
@@ -9,6 +9,7 @@
 import os
 import stat
 import shlex
+import json
 
 from senf import environ
 
@@ -16,6 +17,7 @@ from quodlibet import _
 from quodlibet.util.tags import MACHINE_TAGS, sortkey
 from quodlibet.util.dprint import print_, Colorise
 from quodlibet import util
+from quodlibet.compat import text_type
 
 from .base import CommandError
 
@@ -142,3 +144,39 @@ def get_editor_args(fallback_command="nano"):
         editor_args = [fallback_command]
 
     return editor_args
+
+
+def add_jobs_option(parser):
+    """Adds -j/--jobs for the number of processes to use"""
+
+    parser.add_option("-j", "--jobs", action="store", type="int",
+                      default=1, metavar="N",
+                      help=_("Load and write files in N processes"))
+
+
+def add_stream_options(parser, json=True):
+    """Adds the options used by `Command.iter_songs()`, and --json if
+    json is True.
+    """
+
+    parser.add_option("-r", "--recursive", action="store_true",
+                      help=_("Also use the supported files in directories"))
+    add_jobs_option(parser)
+    if json:
+        parser.add_option("--json", action="store_true",
+                          help=_("Print one JSON object per line"))
+
+
+def add_batch_options(parser):
+    """Adds the options used by `Command.save_songs()`"""
+
+    parser.add_option("--journal", action="store", type="string",
+                      metavar="FILE",
+                      help=_("Plan all changes first and record them in a "
+                             "journal, to resume or roll them back later"))
+
+
+def print_json(obj):
+    """Prints an object as JSON on one line"""
+
+    print_(text_type(json.dumps(obj, sort_keys=True)))
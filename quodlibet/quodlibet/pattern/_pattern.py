@@ -14,15 +14,18 @@
 
 import os
 import re
+import marshal
 from re import Scanner  # type: ignore
 
 from senf import sep, fsnative, expanduser
 
 from quodlibet import util
 from quodlibet.query import Query
-from quodlibet.compat import exec_, itervalues
+from quodlibet.compat import exec_
+from quodlibet.util import compilecache
 from quodlibet.util.path import strip_win32_incompat_from_path, limit_path
-from quodlibet.formats._audio import decode_value, FILESYSTEM_TAGS
+from quodlibet.formats._audio import decode_value, FILESYSTEM_TAGS, \
+    VOLATILE_TAGS, AudioFile
 from quodlibet.compat import quote_plus, text_type, number_types
 
 # Token types.
@@ -188,10 +191,30 @@ class PatternFormatter(object):
     _post = None
     _text = None
 
-    def __init__(self, func, list_func, tags):
+    MAX_MEMO_PATTERNS = 10
+    """Number of different patterns each song remembers results for"""
+
+    def __init__(self, func, list_func, tags, cacheable=False, source=None):
+        """
+        Args:
+            func (callable): the compiled pattern, for `format()`
+            list_func (callable): the compiled pattern, for `format_list()`
+            tags (List[str]): all tags the pattern uses
+            cacheable (bool): if the pattern uses anything besides tags,
+                like queries, results can't be remembered
+            source (str or None): the pattern string, results only get
+                remembered if given
+        """
+
         self.__func = func
         self.__list_func = list_func
         self.tags = util.list_unique(tags)
+        if cacheable and source is not None and not any(
+                v in t for t in self.tags for v in VOLATILE_TAGS):
+            # equal patterns share results, even if compiled again
+            self._memo_key = (type(self), source)
+        else:
+            self._memo_key = None
         self.format(self.Dummy())  # Validate string
 
     class Dummy(dict):
@@ -211,35 +234,35 @@ class PatternFormatter(object):
 
     class SongProxy(object):
         def __init__(self, realsong, formatter):
-            self.__song = realsong
-            self.__formatter = formatter
+            self._song = realsong
+            self._formatter = formatter
 
         def __call__(self, key, *args):
-            return self.__song(key, *args)
+            return self._song(key, *args)
 
         def get(self, key, default=None):
-            return self.__song.get(key, default)
+            return self._song.get(key, default)
 
         def comma(self, key):
-            value = self.__song.comma(key)
+            value = self._song.comma(key)
             if isinstance(value, number_types):
                 value = decode_value(key, value)
-            if self.__formatter:
-                return self.__formatter(key, value)
+            if self._formatter:
+                return self._formatter(key, value)
             return value
 
         def list_separate(self, key):
             if key.startswith("~#") and "~" not in key[2:]:
-                value = self.__song(key)
+                value = self._song(key)
                 value = decode_value(key, value)
-                if self.__formatter:
-                    value = self.__formatter(key, value)
+                if self._formatter:
+                    value = self._formatter(key, value)
                 values = [(value, value)]
             else:
-                values = self.__song.list_separate(key)
-                if self.__formatter:
-                    return [(self.__formatter(key, v[0]),
-                             self.__formatter(key, v[1])) for v in values]
+                values = self._song.list_separate(key)
+                if self._formatter:
+                    return [(self._formatter(key, v[0]),
+                             self._formatter(key, v[1])) for v in values]
 
             return values
 
@@ -249,6 +272,51 @@ class PatternFormatter(object):
             return self._post(value, song)
         return value
 
+    def format_many(self, songs):
+        """Like `format()` for many songs.
+
+        If the pattern only depends on the tags of the songs, the results
+        get remembered by each song until it changes, for at most
+        `MAX_MEMO_PATTERNS` patterns at a time.
+
+        Args:
+            songs (Iterable[AudioFile])
+        Returns:
+            List[text_type or fsnative]: the results in the order of `songs`
+        """
+
+        func = self.__func
+        post = self._post
+        proxy = self.SongProxy(None, self._format)
+        memo_key = self._memo_key
+        max_patterns = self.MAX_MEMO_PATTERNS
+
+        result = []
+        append = result.append
+        for song in songs:
+            if memo_key is not None and isinstance(song, AudioFile):
+                memo = song.memo.get(PatternFormatter)
+                if memo is None:
+                    memo = song.memo[PatternFormatter] = {}
+                try:
+                    append(memo[memo_key])
+                    continue
+                except KeyError:
+                    if len(memo) >= max_patterns:
+                        memo.clear()
+            else:
+                memo = None
+
+            proxy._song = song
+            value = u"".join(func(proxy))
+            if post:
+                value = post(value, song)
+            if memo is not None:
+                memo[memo_key] = value
+            append(value)
+        proxy._song = None
+        return result
+
     def format_list(self, song):
         """Formats the output of a list pattern, generating all the
         combinations always returns pairs of display and sort values. The
@@ -277,23 +345,39 @@ class PatternCompiler(object):
         self.__root = root.node
 
     def compile(self, song_func, text_formatter=None):
+        code, tags, queries = self.compile_code(
+            song_func, bool(text_formatter))
+        func = _load_func(code, queries, text_formatter, self._matchers)
+        return func, tags
+
+    def compile_code(self, song_func, use_formatter=False):
+        """Like `compile()`, but returns the code object of the function
+        instead, which can be passed to `marshal`.
+
+        Args:
+            song_func (str): the song method to get tag values with
+            use_formatter (bool): if the code applies a text formatter
+        Returns:
+            Tuple[code, List[str], List[Tuple[str, text_type]]]: the code,
+                the used tags and the variable names and strings of the
+                queries it uses
+        """
+
         tags = []
         queries = {}
+        self._matchers = {}
         content = [
             "def f(s):",
             "  x = s." + song_func,
             "  r = []",
             "  a = r.append"]
         content.extend(
-            self.__tag(self.__root, {}, {}, tags, queries, text_formatter))
+            self.__tag(self.__root, {}, {}, tags, queries, use_formatter))
         content.append("  return r")
         code = "\n".join(content)
 
-        scope = dict(itervalues(queries))
-        if text_formatter:
-            scope["_format"] = text_formatter
-        exec_(compile(code, "<string>", "exec"), scope)
-        return scope["f"], tags
+        queries = sorted((v, q) for q, v in queries.items())
+        return compile(code, "<string>", "exec"), tags, queries
 
     def __get_value(self, text, scope, tag):
         if tag not in scope:
@@ -307,7 +391,7 @@ class PatternCompiler(object):
     def __get_query(self, text, scope, qscope, query, queries):
         if query not in qscope:
             if query in queries:
-                q_var = queries[query][0]
+                q_var = queries[query]
                 r_var = 'r%d' % len(qscope)
                 text.append('%s = %s(s)' % (r_var, q_var))
                 qscope[query] = r_var
@@ -316,7 +400,8 @@ class PatternCompiler(object):
                 if q is not None:
                     q_var = 'q%d' % len(queries)
                     r_var = 'r%d' % len(qscope)
-                    queries[query] = (q_var, q.search)
+                    queries[query] = q_var
+                    self._matchers[query] = q
                     text.append('%s = %s(s)' % (r_var, q_var))
                     qscope[query] = r_var
                 else:
@@ -363,14 +448,68 @@ class PatternCompiler(object):
         return text
 
 
+def _load_func(code, queries, text_formatter=None, matchers={}):
+    """Creates the function compiled by `PatternCompiler.compile_code()`
+
+    Raises:
+        ValueError: in case a query can't be parsed
+    """
+
+    scope = {}
+    for q_var, query in queries:
+        q = matchers.get(query)
+        if q is None:
+            q = Query.StrictQueryMatcher(query)
+        if q is None:
+            raise ValueError("Invalid query %r" % query)
+        scope[q_var] = q.search
+    if text_formatter:
+        scope["_format"] = text_formatter
+    exec_(code, scope)
+    return scope["f"]
+
+
+def _compile(string, text_formatter):
+    """Returns the compiled functions for `format()` and `format_list()`,
+    the used tags and if queries are used. Remembered by the compile cache
+    (see `quodlibet.util.compilecache`) if enabled.
+    """
+
+    cache = compilecache.get_cache()
+    kind = "pattern-text" if text_formatter else "pattern"
+    if cache is not None:
+        data = cache.get(kind, string)
+        if data is not None:
+            try:
+                (code, queries), (list_code, list_queries), tags = \
+                    marshal.loads(data)
+                return (_load_func(code, queries, text_formatter),
+                        _load_func(list_code, list_queries, text_formatter),
+                        tags, bool(queries))
+            except (ValueError, EOFError, TypeError):
+                pass
+
+    comp = PatternCompiler(PatternParser(PatternLexer(string)))
+    code, tags, queries = comp.compile_code("comma", bool(text_formatter))
+    func = _load_func(code, queries, text_formatter, comp._matchers)
+    list_code, tags, list_queries = comp.compile_code(
+        "list_separate", bool(text_formatter))
+    list_func = _load_func(
+        list_code, list_queries, text_formatter, comp._matchers)
+
+    if cache is not None:
+        cache.put(kind, string, marshal.dumps(
+            ((code, queries), (list_code, list_queries), tags)))
+    return func, list_func, tags, bool(queries)
+
+
 def Pattern(string, Kind=PatternFormatter, MAX_CACHE_SIZE=100, cache={}):
     if (Kind, string) not in cache:
         if len(cache) > MAX_CACHE_SIZE:
             cache.clear()
-        comp = PatternCompiler(PatternParser(PatternLexer(string)))
-        func, tags = comp.compile("comma", Kind._text)
-        list_func, tags = comp.compile("list_separate", Kind._text)
-        cache[(Kind, string)] = Kind(func, list_func, tags)
+        func, list_func, tags, uses_queries = _compile(string, Kind._text)
+        cache[(Kind, string)] = Kind(
+            func, list_func, tags, cacheable=not uses_queries, source=string)
     return cache[(Kind, string)]
 
 
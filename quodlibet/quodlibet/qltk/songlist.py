@@ -186,6 +186,40 @@ def header_tag_split(header):
         return util.tagsplit(header)
 
 
+def _get_sort_key(song):
+    return song.sort_key
+
+
+def _bisect_right(songs, key, get_key, reverses, lo=0):
+    """Like `bisect.bisect_right` for songs sorted by multiple keys, each
+    ascending or descending.
+
+    Args:
+        songs (List[AudioFile]): the sorted songs
+        key (list): the keys of the song to insert, as returned by get_key
+        get_key (callable): returns the keys of a song
+        reverses (List[bool]): if the list is descending for each key
+        lo (int): the index to start searching at
+    Returns:
+        int: the index after all songs sorting equal or before the key
+    """
+
+    hi = len(songs)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        for a, b, reverse in zip(key, get_key(songs[mid]), reverses):
+            if a != b:
+                before = (b < a) if reverse else (a < b)
+                break
+        else:
+            before = False
+        if before:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
 class SongListDnDMixin(object):
     """DnD support for the SongList class"""
 
@@ -408,6 +442,7 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
         # might contain column header names not present...
         self._sort_sequence = []
         self.set_column_headers(self.headers)
+        self._library = library
         librarian = library.librarian or library
 
         connect_destroy(librarian, 'changed', self.__song_updated)
@@ -746,33 +781,46 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
             return []
         return model.get()
 
-    def _sort_songs(self, songs):
-        """Sort passed songs in place based on the column sort orders"""
+    def _get_sort_funcs(self):
+        """Returns a list of (sort_func, reverse) to sort with, one after
+        the other, based on the column sort orders
+        """
 
-        last_tag = None
-        last_order = None
-        first = True
+        columns = getattr(self._library, "numeric_columns", None)
+        sort_keys = getattr(self._library, "sort_keys", None)
+
+        funcs = []
+        last = None
         for tag, reverse in self.get_sort_orders():
             tag = get_sort_tag(tag)
 
             # always sort using the default sort key first
-            if first:
-                first = False
-                songs.sort(key=lambda s: s.sort_key, reverse=reverse)
-                last_order = reverse
-                last_tag = ""
+            if not funcs:
+                funcs.append((_get_sort_key, reverse))
+                last = ("", reverse)
 
             # no need to sort twice in a row with the same key/order
-            if tag == last_tag and last_order == reverse:
+            if (tag, reverse) == last:
                 continue
-            last_order = reverse
-            last_tag = tag
+            last = (tag, reverse)
 
             if tag == "":
-                songs.sort(key=lambda s: s.sort_key, reverse=reverse)
+                sort_func = _get_sort_key
+            elif columns is not None and tag in columns.TAGS:
+                sort_func = columns.get_sort_func(tag)
+            elif sort_keys is not None:
+                sort_func = sort_keys.get_sort_func(tag)
             else:
                 sort_func = AudioFile.sort_by_func(tag)
-                songs.sort(key=sort_func, reverse=reverse)
+            funcs.append((sort_func, reverse))
+
+        return funcs
+
+    def _sort_songs(self, songs):
+        """Sort passed songs in place based on the column sort orders"""
+
+        for sort_func, reverse in self._get_sort_funcs():
+            songs.sort(key=sort_func, reverse=reverse)
 
     def add_songs(self, songs):
         """Add songs to the list in the right order and position"""
@@ -789,14 +837,24 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
             model.append_many(songs)
             return
 
-        # FIXME: Replace with something fast
-        old_songs = self.get_songs()
-        old_songs.extend(songs)
+        funcs = self._get_sort_funcs()
+        songs = list(songs)
+        for sort_func, reverse in funcs:
+            songs.sort(key=sort_func, reverse=reverse)
 
-        self._sort_songs(old_songs)
+        # the last sort decides first, earlier ones break the ties
+        funcs.reverse()
+        reverses = [reverse for sort_func, reverse in funcs]
 
-        for index, song in sorted(zip(map(old_songs.index, songs), songs)):
-            model.insert(index, row=[song])
+        def get_key(song):
+            return [sort_func(song) for sort_func, reverse in funcs]
+
+        old_songs = self.get_songs()
+        index = 0
+        for offset, song in enumerate(songs):
+            index = _bisect_right(old_songs, get_key(song), get_key,
+                                  reverses, index)
+            model.insert(index + offset, row=[song])
 
     def set_songs(self, songs, sorted=False, scroll=True, scroll_select=False):
         """Fill the song list.
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Compiles a tree of query nodes into a single Python function.
+
+Instead of calling `search()` on every node for every item, the nodes get
+inlined into the source of one function. Plain tag values are looked up
+once at the start, constant numeric expressions are evaluated beforehand
+and `Inter`/`Union` short-circuit through plain if statements:
+
+    &(artist=foo, #(playcount > 2 * 3))
+
+results in
+
+    def search(data):
+        get = data.get
+        v1 = get('artist')
+        if v1 is None:
+            v1 = get('~artist', u'')
+        ok = r2(v1)
+        if not ok:
+            return False
+        n3 = data('~#playcount', None)
+        if n3 is not None:
+            n3 = round(n3, 2)
+        ok = n3 is not None and n3 > c6
+        if not ok:
+            return False
+        return True
+
+Nodes the compiler doesn't know (like `Extension`) get called through
+their `search()` method, so the result is the same as for `node.search`.
+"""
+
+import time
+import operator
+from functools import partial
+from unicodedata import normalize
+
+from senf import fsn2text, fsnative
+
+from quodlibet.util import parse_date
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.formats import FILESYSTEM_TAGS, TIME_TAGS
+
+from . import _match as match
+
+
+_COMPARE = {
+    operator.lt: "<",
+    operator.le: "<=",
+    operator.gt: ">",
+    operator.ge: ">=",
+    operator.eq: "==",
+    operator.ne: "!=",
+}
+
+_ARITHMETIC = {
+    operator.sub: "-",
+    operator.add: "+",
+    operator.mul: "*",
+}
+
+_NOT_CONSTANT = object()
+
+
+_dates = {}
+
+
+def _parse_date(date):
+    # like NumexprTag.evaluate(), but libraries only contain a few distinct
+    # dates, so remember them
+    if not date:
+        return None
+    try:
+        return _dates[date]
+    except KeyError:
+        pass
+    try:
+        result = parse_date(date)
+    except ValueError:
+        result = None
+    if len(_dates) > 10000:
+        _dates.clear()
+    _dates[date] = result
+    return result
+
+
+def _binary(op, val, val2):
+    # like NumexprBinary.evaluate()
+    try:
+        return op(val, val2)
+    except ZeroDivisionError:
+        return val * float('inf')
+
+
+class _Number(object):
+
+    def __init__(self, source, maybe_none=True, value=_NOT_CONSTANT):
+        self.source = source
+        self.maybe_none = maybe_none
+        self.value = value
+
+    @property
+    def is_constant(self):
+        return self.value is not _NOT_CONSTANT
+
+
+class _Compiler(object):
+
+    def __init__(self):
+        self._namespace = {
+            "_time": time.time,
+            "_fsn2text": fsn2text,
+            "_normalize": normalize,
+            "_fs_default": fsnative(),
+            "_parse_date": _parse_date,
+            "_binary": _binary,
+        }
+        self._names = {}
+        self._values = {}
+        self._header = []
+        self._lines = []
+        self._count = 0
+        self._uses_time = False
+
+    def _new(self, prefix):
+        self._count += 1
+        return "%s%d" % (prefix, self._count)
+
+    def _emit(self, indent, line):
+        self._lines.append("    " * indent + line)
+
+    def _add_constant(self, value, prefix="c"):
+        # the namespace keeps the value alive, so the id stays unique
+        name = self._names.get(id(value))
+        if name is None:
+            name = self._names[id(value)] = self._new(prefix)
+            self._namespace[name] = value
+        return name
+
+    def _get_value(self, name, nfc=False):
+        """The variable containing the value of a plain tag, looked up at
+        the start of the function (see `Tag.get_value`). If `nfc` is True
+        the value is normalized for `Regex.regex`.
+        """
+
+        if nfc:
+            var = self._values.get((name, nfc))
+            if var is None:
+                value = self._get_value(name)
+                var = self._values[(name, nfc)] = self._new("u")
+                self._header.append(
+                    "    %s = _normalize('NFC', %s)" % (var, value))
+            return var
+
+        var = self._values.get(name)
+        if var is None:
+            var = self._values[name] = self._new("v")
+            header = self._header
+            header.append("    %s = get(%r)" % (var, name))
+            header.append("    if %s is None:" % var)
+            if name in ("filename", "mountpoint"):
+                header.append("        %s = _fsn2text(get(%r, _fs_default))"
+                              % (var, "~" + name))
+            else:
+                header.append("        %s = get(%r, u'')" % (var, "~" + name))
+        return var
+
+    def _value_expr(self, node, get_var):
+        """The source of an expression matching a text against a node
+        usually found in `Tag.res`. `get_var(nfc)` returns the variable
+        containing the text, normalized if `nfc` is True.
+        """
+
+        if isinstance(node, match.Regex):
+            return "%s(%s)" % (
+                self._add_constant(node.regex.search, "r"), get_var(True))
+        elif isinstance(node, match.Inter):
+            if not node.res:
+                return "True"
+            return "(%s)" % " and ".join(
+                self._value_expr(n, get_var) for n in node.res)
+        elif isinstance(node, match.Union):
+            if not node.res:
+                return "False"
+            return "(%s)" % " or ".join(
+                self._value_expr(n, get_var) for n in node.res)
+        elif isinstance(node, match.Neg):
+            return "(not %s)" % self._value_expr(node.res, get_var)
+        elif isinstance(node, match.True_):
+            return "True"
+        elif isinstance(node, match.False_):
+            return "False"
+        return "%s(%s)" % (
+            self._add_constant(node.search, "s"), get_var(False))
+
+    def _number(self, expr, use_date, indent):
+        """Emits the statements evaluating a `Numexpr`, like
+        `Numexpr.evaluate()`.
+
+        Returns:
+            _Number
+        """
+
+        if isinstance(expr, match.NumexprNumber):
+            value = expr._value
+        elif isinstance(expr, match.NumexprNumberOrDate):
+            value = expr.date if use_date else expr.number
+        elif isinstance(expr, match.NumexprGroup):
+            return self._number(expr._expr, use_date, indent)
+        elif isinstance(expr, match.NumexprUnary):
+            val = self._number(expr._expr, use_date, indent)
+            if val.is_constant:
+                value = expr._op(val.value)
+            else:
+                var = self._new("n")
+                if expr._op is operator.neg:
+                    source = "-%s" % val.source
+                else:
+                    source = "%s(%s)" % (
+                        self._add_constant(expr._op), val.source)
+                if val.maybe_none:
+                    source += " if %s is not None else None" % val.source
+                self._emit(indent, "%s = %s" % (var, source))
+                return _Number(var, val.maybe_none)
+        elif isinstance(expr, match.NumexprBinary):
+            val = self._number(expr._expr, use_date, indent)
+            val2 = self._number(expr._expr2, use_date, indent)
+            if val.is_constant and val2.is_constant:
+                value = _binary(expr._op, val.value, val2.value)
+            else:
+                var = self._new("n")
+                if expr._op in _ARITHMETIC:
+                    source = "%s %s %s" % (
+                        val.source, _ARITHMETIC[expr._op], val2.source)
+                else:
+                    source = "_binary(%s, %s, %s)" % (
+                        self._add_constant(expr._op),
+                        val.source, val2.source)
+                checks = ["%s is not None" % v.source
+                          for v in (val, val2) if v.maybe_none]
+                if checks:
+                    source += " if %s else None" % " and ".join(checks)
+                self._emit(indent, "%s = %s" % (var, source))
+                return _Number(var, bool(checks))
+        elif isinstance(expr, match.NumexprNow):
+            self._uses_time = True
+            var = self._new("n")
+            self._emit(indent, "%s = t - %s" % (
+                var, self._add_constant(expr._offset)))
+            return _Number(var, False)
+        elif isinstance(expr, match.NumexprTag):
+            var = self._new("n")
+            if expr._tag == "date":
+                self._emit(indent, "%s = _parse_date(data('date'))" % var)
+            else:
+                self._emit(indent, "%s = data(%r, None)" % (var, expr._ftag))
+            self._emit(indent, "if %s is not None:" % var)
+            # strip aggregate function from tag
+            tag = expr._ftag.split(":", 1)[0]
+            if tag in TIME_TAGS:
+                self._uses_time = True
+                self._emit(indent + 1, "%s = t - %s" % (var, var))
+            self._emit(indent + 1, "%s = round(%s, 2)" % (var, var))
+            return _Number(var)
+        else:
+            self._uses_time = True
+            var = self._new("n")
+            self._emit(indent, "%s = %s(data, t, %r)" % (
+                var, self._add_constant(expr.evaluate), use_date))
+            return _Number(var)
+
+        return _Number(self._add_constant(value), False, value)
+
+    def _numcmp(self, node, indent):
+        use_date = node._expr.use_date() or node._expr2.use_date()
+        start = len(self._lines)
+        self._uses_time = False
+        val = self._number(node._expr, use_date, indent)
+        val2 = self._number(node._expr2, use_date, indent)
+
+        if val.is_constant and val2.is_constant:
+            self._emit(indent, "ok = %r" % bool(
+                node._op(val.value, val2.value)))
+            return
+
+        # like Numcmp.search(), get the time for each comparison
+        if self._uses_time:
+            self._lines.insert(start, "    " * indent + "t = _time()")
+
+        parts = ["%s is not None" % v.source
+                 for v in (val, val2) if v.maybe_none]
+        if node._op in _COMPARE:
+            parts.append("%s %s %s" % (
+                val.source, _COMPARE[node._op], val2.source))
+        else:
+            parts.append("%s(%s, %s)" % (
+                self._add_constant(node._op), val.source, val2.source))
+        self._emit(indent, "ok = %s" % " and ".join(parts))
+
+    def _tag(self, node, indent):
+        names = node.names
+        plain = [n for n in names if n[:1] != "~"]
+        special = [n for n in names if n[:1] == "~"]
+
+        exprs = [
+            self._value_expr(node.res, partial(self._get_value, n))
+            for n in plain]
+        self._emit(indent, "ok = %s" % (" or ".join(exprs) or "False"))
+
+        for name in special:
+            var = self._new("w")
+            nfc_var = self._new("u")
+            used = set()
+
+            def get_var(nfc):
+                used.add(nfc)
+                return nfc_var if nfc else var
+
+            expr = self._value_expr(node.res, get_var)
+            self._emit(indent, "if not ok:")
+            if name in FILESYSTEM_TAGS:
+                self._emit(indent + 1, "%s = _fsn2text(data(%r, _fs_default))"
+                           % (var, name))
+            else:
+                self._emit(indent + 1, "%s = data(%r)" % (var, name))
+            if True in used:
+                self._emit(indent + 1, "%s = _normalize('NFC', %s)" % (
+                    nfc_var, var))
+            self._emit(indent + 1, "ok = %s" % expr)
+
+    def _node(self, node, indent, outer=False):
+        """Emits statements setting `ok` to the result of `node.search`.
+        For the outermost node `Inter`/`Union` return early instead of
+        nesting.
+        """
+
+        if isinstance(node, (match.Inter, match.Union)):
+            is_inter = isinstance(node, match.Inter)
+            if not node.res:
+                self._emit(indent, "ok = %r" % is_inter)
+                return
+            # the condition for checking the next child
+            check = "if ok:" if is_inter else "if not ok:"
+            for i, child in enumerate(node.res):
+                self._node(child, indent)
+                if outer:
+                    self._emit(indent, "if not ok:" if is_inter else "if ok:")
+                    self._emit(indent + 1, "return %r" % (not is_inter))
+                elif i != len(node.res) - 1:
+                    self._emit(indent, check)
+                    indent += 1
+        elif isinstance(node, match.Neg):
+            self._node(node.res, indent)
+            self._emit(indent, "ok = not ok")
+        elif isinstance(node, match.Tag):
+            self._tag(node, indent)
+        elif isinstance(node, match.Numcmp):
+            self._numcmp(node, indent)
+        elif isinstance(node, match.True_):
+            self._emit(indent, "ok = True")
+        elif isinstance(node, match.False_):
+            self._emit(indent, "ok = False")
+        else:
+            self._emit(indent, "ok = %s(data)" % self._add_constant(
+                node.search, "s"))
+
+    def compile(self, node):
+        self._node(node, 1, outer=True)
+
+        lines = ["def search(data):"]
+        if self._header:
+            lines.append("    get = data.get")
+            lines.extend(self._header)
+        lines.extend(self._lines)
+        if isinstance(node, (match.Inter, match.Union)) and node.res:
+            lines.append("    return %r" % isinstance(node, match.Inter))
+        else:
+            lines.append("    return True if ok else False")
+        source = "\n".join(lines) + "\n"
+
+        namespace = self._namespace
+        exec(compile(source, "<query>", "exec"), namespace)
+        return namespace["search"], source
+
+
+def compile_node(node):
+    """Compiles a node into a function with the same result as
+    `node.search`.
+
+    Args:
+        node (Node)
+    Returns:
+        callable: taking the item to match and returning a bool
+    """
+
+    try:
+        search, source = _Compiler().compile(node)
+    except (SyntaxError, RuntimeError, MemoryError) as e:
+        # too deeply nested for the Python compiler
+        print_w("Couldn't compile query: %r" % e)
+        return node.search
+    print_d("Compiled %r" % node)
+    return search
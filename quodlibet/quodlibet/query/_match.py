@@ -11,10 +11,11 @@
 
 import time
 import operator
+from unicodedata import normalize
 
 from senf import fsn2text, fsnative
 
-from quodlibet.unisearch import compile
+from quodlibet.unisearch import compile_regex
 from quodlibet.compat import floordiv, text_type
 from quodlibet.util import parse_date
 from quodlibet.formats import FILESYSTEM_TAGS, TIME_TAGS
@@ -59,11 +60,15 @@ class Regex(Node):
         dot_all = "s" in self.mod_string
         asym = "d" in self.mod_string
         try:
-            self.search = compile(self.pattern, ignore_case, dot_all, asym)
+            self.regex = compile_regex(
+                self.pattern, ignore_case, dot_all, asym)
         except ValueError:
             raise ParseError(
                 "The regular expression /%s/ is invalid." % self.pattern)
 
+    def search(self, text):
+        return self.regex.search(normalize("NFC", text))
+
     def __repr__(self):
         return "<Regex pattern=%s mod=%s>" % (self.pattern, self.mod_string)
 
@@ -313,20 +318,20 @@ class NumexprUnary(Numexpr):
     }
 
     def __init__(self, op, expr):
-        self.__op = self.operators[op]
-        self.__expr = expr
+        self._op = self.operators[op]
+        self._expr = expr
 
     def evaluate(self, data, time, use_date):
-        val = self.__expr.evaluate(data, time, use_date)
+        val = self._expr.evaluate(data, time, use_date)
         if val is not None:
-            return self.__op(val)
+            return self._op(val)
         return None
 
     def __repr__(self):
-        return "<NumexprUnary op=%r expr=%r>" % (self.__op, self.__expr)
+        return "<NumexprUnary op=%r expr=%r>" % (self._op, self._expr)
 
     def use_date(self):
-        return self.__expr.use_date()
+        return self._expr.use_date()
 
 
 class NumexprBinary(Numexpr):
@@ -347,52 +352,52 @@ class NumexprBinary(Numexpr):
     }
 
     def __init__(self, op, expr, expr2):
-        self.__op = self.operators[op]
-        self.__expr = expr
-        self.__expr2 = expr2
+        self._op = self.operators[op]
+        self._expr = expr
+        self._expr2 = expr2
         # Rearrange expressions for operator precedence
-        if (isinstance(self.__expr, NumexprBinary) and
-                self.precedence[self.__expr.__op] <
-                self.precedence[self.__op]):
-            self.__expr = expr.__expr
-            self.__op = expr.__op
-            expr.__expr = expr.__expr2
-            expr.__op = self.operators[op]
-            expr.__expr2 = expr2
-            self.__expr2 = expr
+        if (isinstance(self._expr, NumexprBinary) and
+                self.precedence[self._expr._op] <
+                self.precedence[self._op]):
+            self._expr = expr._expr
+            self._op = expr._op
+            expr._expr = expr._expr2
+            expr._op = self.operators[op]
+            expr._expr2 = expr2
+            self._expr2 = expr
 
     def evaluate(self, data, time, use_date):
-        val = self.__expr.evaluate(data, time, use_date)
-        val2 = self.__expr2.evaluate(data, time, use_date)
+        val = self._expr.evaluate(data, time, use_date)
+        val2 = self._expr2.evaluate(data, time, use_date)
         if val is not None and val2 is not None:
             try:
-                return self.__op(val, val2)
+                return self._op(val, val2)
             except ZeroDivisionError:
                 return val * float('inf')
         return None
 
     def __repr__(self):
         return "<NumexprBinary op=%r expr=%r expr2=%r>" % (
-            self.__op, self.__expr, self.__expr2)
+            self._op, self._expr, self._expr2)
 
     def use_date(self):
-        return self.__expr.use_date() or self.__expr2.use_date()
+        return self._expr.use_date() or self._expr2.use_date()
 
 
 class NumexprGroup(Numexpr):
     """Parenthesized group in numeric expression"""
 
     def __init__(self, expr):
-        self.__expr = expr
+        self._expr = expr
 
     def evaluate(self, data, time, use_date):
-        return self.__expr.evaluate(data, time, use_date)
+        return self._expr.evaluate(data, time, use_date)
 
     def __repr__(self):
-        return "<NumexprGroup expr=%r>" % (self.__expr)
+        return "<NumexprGroup expr=%r>" % (self._expr)
 
     def use_date(self):
-        return self.__expr.use_date()
+        return self._expr.use_date()
 
 
 class NumexprNumber(Numexpr):
@@ -412,13 +417,13 @@ class NumexprNow(Numexpr):
     """Current time, with optional offset"""
 
     def __init__(self, offset=0):
-        self.__offset = offset
+        self._offset = offset
 
     def evaluate(self, data, time, use_date):
-        return time - self.__offset
+        return time - self._offset
 
     def __repr__(self):
-        return "<NumexprNow offset=%r>" % (self.__offset)
+        return "<NumexprNow offset=%r>" % (self._offset)
 
 
 class NumexprNumberOrDate(Numexpr):
@@ -509,6 +514,7 @@ class Tag(Node):
         self.__fs = []
 
         names = [Tag.ABBRS.get(n.lower(), n.lower()) for n in names]
+        self.names = names
         for name in names:
             if name[:1] == "~":
                 if name.startswith("~#"):
@@ -545,6 +551,28 @@ class Tag(Node):
 
         return False
 
+    @staticmethod
+    def get_value(data, name):
+        """The text `search` matches against for one of the `names`
+
+        Returns:
+            text_type
+        """
+
+        fs_default = fsnative()
+        if name[:1] == "~":
+            if name in FILESYSTEM_TAGS:
+                return fsn2text(data(name, fs_default))
+            return data(name)
+
+        val = data.get(name)
+        if val is None:
+            if name in ("filename", "mountpoint"):
+                val = fsn2text(data.get("~" + name, fs_default))
+            else:
+                val = data.get("~" + name, u"")
+        return val
+
     def __repr__(self):
         names = self._names + self.__intern
         return ("<Tag names=%r, res=%r>" % (names, self.res))
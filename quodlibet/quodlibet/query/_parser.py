@@ -40,6 +40,8 @@ class QueryParser(object):
         self.index = 0
         self.last_match = None
         self.star = star
+        self.uses_extensions = False
+        """If the parsed query contains plugin extensions"""
 
     def space(self):
         """Advance to the first non-space token"""
@@ -211,6 +213,7 @@ class QueryParser(object):
         else:
             body = None
         self.expect(')')
+        self.uses_extensions = True
         return match.Extension(name, body)
 
     def ExtBody(self):
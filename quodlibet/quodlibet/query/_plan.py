@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Finding the items a query matches using indices of a library instead of
+checking every item.
+
+See `TagIndex` and `NumericColumns`.
+"""
+
+import time
+import operator
+from itertools import compress, repeat
+
+from quodlibet.formats import TIME_TAGS
+from quodlibet.unisearch import get_literals
+from quodlibet.compat import integer_types
+
+from . import _match as match
+from ._compiler import _binary
+
+
+def _plan_value(node, tag, index):
+    """Like `plan()` for the value of a `Tag`, using a `TagIndex`
+
+    Returns:
+        set or None
+    """
+
+    if isinstance(node, match.Regex):
+        result = None
+        for literal in get_literals(node.pattern):
+            songs = index.lookup(tag, literal)
+            if songs is not None:
+                result = songs if result is None else result & songs
+        return result
+    elif isinstance(node, match.Inter):
+        result = None
+        for child in node.res:
+            songs = _plan_value(child, tag, index)
+            if songs is not None:
+                result = songs if result is None else result & songs
+        return result
+    elif isinstance(node, match.Union):
+        result = set()
+        for child in node.res:
+            songs = _plan_value(child, tag, index)
+            if songs is None:
+                return
+            result |= songs
+        return result
+
+
+def _is_number(value):
+    return isinstance(value, (float, ) + integer_types)
+
+
+def _evaluate(expr, columns, time_, use_date):
+    """Evaluates a `Numexpr` for all rows of a `NumericColumns` at once,
+    like `Numexpr.evaluate()`.
+
+    Returns:
+        a number in case it's the same for all rows, a sequence containing
+        the value for each row (NaN instead of None) or None in case
+        it can't be evaluated using the columns
+    """
+
+    if isinstance(expr, match.NumexprTag):
+        if expr._ftag not in columns.TAGS:
+            return
+        values = columns.get_column(expr._ftag)
+        if expr._ftag in TIME_TAGS:
+            values = map(operator.sub, repeat(time_), values)
+        return list(map(round, values, repeat(2)))
+    elif isinstance(expr, (match.NumexprNumber, match.NumexprNumberOrDate,
+                           match.NumexprNow)):
+        return expr.evaluate(None, time_, use_date)
+    elif isinstance(expr, match.NumexprGroup):
+        return _evaluate(expr._expr, columns, time_, use_date)
+    elif isinstance(expr, match.NumexprUnary):
+        val = _evaluate(expr._expr, columns, time_, use_date)
+        if val is None:
+            return
+        elif _is_number(val):
+            return expr._op(val)
+        return list(map(expr._op, val))
+    elif isinstance(expr, match.NumexprBinary):
+        val = _evaluate(expr._expr, columns, time_, use_date)
+        val2 = _evaluate(expr._expr2, columns, time_, use_date)
+        if val is None or val2 is None:
+            return
+        elif _is_number(val) and _is_number(val2):
+            return _binary(expr._op, val, val2)
+
+        def iter_values(value):
+            return repeat(value) if _is_number(value) else value
+
+        try:
+            return list(map(expr._op, iter_values(val), iter_values(val2)))
+        except ZeroDivisionError:
+            return [_binary(expr._op, v, v2) for v, v2 in
+                    zip(iter_values(val), iter_values(val2))]
+
+
+class _Rows(object):
+    """The rows of a `NumericColumns` which match, as a list of bools"""
+
+    def __init__(self, columns, mask):
+        self.columns = columns
+        self.mask = mask
+
+    def get_songs(self):
+        return [s for s in compress(self.columns.songs, self.mask)
+                if s is not None]
+
+    def intersect(self, songs):
+        index = self.columns.index
+        mask = self.mask
+        result = set()
+        for song in songs:
+            row = index(song)
+            if row is not None and mask[row]:
+                result.add(song)
+        return result
+
+
+def _intersect(result, other):
+    """Intersection of two results of `plan()`"""
+
+    if result is None:
+        return other
+    elif other is None:
+        return result
+    elif isinstance(result, _Rows):
+        if isinstance(other, _Rows):
+            return _Rows(result.columns,
+                         list(map(operator.and_, result.mask, other.mask)))
+        return result.intersect(other)
+    elif isinstance(other, _Rows):
+        return other.intersect(result)
+    return result & other
+
+
+def _union(result, other):
+    """Union of two results of `plan()`, not None"""
+
+    if isinstance(result, _Rows):
+        if isinstance(other, _Rows):
+            return _Rows(result.columns,
+                         list(map(operator.or_, result.mask, other.mask)))
+        result = set(result.get_songs())
+    if isinstance(other, _Rows):
+        other = other.get_songs()
+    return result.union(other)
+
+
+def _plan_numcmp(node, columns):
+    """Like `plan()` for a `Numcmp`, using `NumericColumns`"""
+
+    time_ = time.time()
+    use_date = node._expr.use_date() or node._expr2.use_date()
+    val = _evaluate(node._expr, columns, time_, use_date)
+    val2 = _evaluate(node._expr2, columns, time_, use_date)
+    if val is None or val2 is None:
+        return None, False
+
+    op = node._op
+    if _is_number(val) and _is_number(val2):
+        return (None if op(val, val2) else set()), True
+
+    values = repeat(val) if _is_number(val) else val
+    values2 = repeat(val2) if _is_number(val2) else val2
+    if op is operator.ne:
+        # NaN (None) never matches, but is unequal to everything
+        mask = [v != v2 and v == v and v2 == v2
+                for v, v2 in zip(values, values2)]
+    else:
+        mask = list(map(op, values, values2))
+    return _Rows(columns, mask), True
+
+
+def _plan(node, index, columns):
+    """Like `plan()`, but the result can also be `_Rows`"""
+
+    if isinstance(node, match.Inter):
+        result = None
+        exact = True
+        for child in node.res:
+            songs, child_exact = _plan(child, index, columns)
+            exact = exact and child_exact
+            result = _intersect(result, songs)
+        return result, exact
+    elif isinstance(node, match.Union):
+        result = set()
+        exact = True
+        for i, child in enumerate(node.res):
+            songs, child_exact = _plan(child, index, columns)
+            if songs is None:
+                return None, child_exact
+            exact = exact and child_exact
+            result = songs if i == 0 else _union(result, songs)
+        return result, exact
+    elif isinstance(node, match.Neg):
+        songs, exact = _plan(node.res, index, columns)
+        if exact:
+            if songs is None:
+                return set(), True
+            elif isinstance(songs, _Rows):
+                return _Rows(columns, list(map(operator.not_, songs.mask))), \
+                    True
+            elif not songs:
+                return None, True
+        return None, False
+    elif isinstance(node, match.Tag) and index is not None:
+        result = set()
+        for name in node.names:
+            songs = _plan_value(node.res, name, index)
+            if songs is None:
+                return None, False
+            result |= songs
+        return result, False
+    elif isinstance(node, match.Numcmp) and columns is not None:
+        return _plan_numcmp(node, columns)
+    elif isinstance(node, match.True_):
+        return None, True
+    elif isinstance(node, match.False_):
+        return set(), True
+    return None, False
+
+
+def plan(node, index=None, columns=None):
+    """Find the items of a library a query matches using its `TagIndex`
+    and `NumericColumns`.
+
+    Only `Tag` nodes with regexes containing literals can make use of the
+    index and only `Numcmp` nodes comparing tags found in the columns
+    can make use of the latter. `Inter`, `Union` and `Neg` nodes combine
+    the results of their children.
+
+    Args:
+        node (Node)
+        index (TagIndex or None)
+        columns (NumericColumns or None)
+    Returns:
+        Tuple[list or None, bool]: a superset of all items the query
+            matches, or None in case every item has to be checked. And
+            whether only the matched items are included (None meaning all).
+    """
+
+    result, exact = _plan(node, index, columns)
+    if isinstance(result, _Rows):
+        result = result.get_songs()
+    elif result is not None:
+        result = list(result)
+    return result, exact
@@ -8,13 +8,80 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import re
+
 from quodlibet import print_d
 from quodlibet.util.dprint import frame_info
 from . import _match as match
 from ._match import error, Node, False_
 from ._parser import QueryParser
+from ._compiler import compile_node
+from ._plan import plan
 from quodlibet.util import re_escape, enum, cached_property
-from quodlibet.compat import PY2, text_type
+from quodlibet.util import compilecache
+from quodlibet.util.picklehelper import pickle_loads, pickle_dumps, \
+    PickleError
+from quodlibet.compat import PY2, text_type, listfilter, itervalues, \
+    copyreg
+
+
+def _get_unpickle_globals():
+    funcs = [re._compile, copyreg._reconstructor, copyreg.__newobj__]
+    for node in [match.Numcmp, match.NumexprUnary, match.NumexprBinary]:
+        funcs.extend(itervalues(node.operators))
+    return funcs
+
+
+def _lookup(func, mod, name):
+    # a cached file shouldn't be able to call anything but the
+    # constructors of query nodes
+    if mod == match.__name__:
+        obj = func(mod, name)
+        if isinstance(obj, type) and issubclass(
+                obj, (match.Node, match.Numexpr)):
+            return obj
+    elif mod in ("re", "operator", "_operator", "copy_reg", "copyreg"):
+        obj = func(mod, name)
+        if any(obj is f for f in _get_unpickle_globals()):
+            return obj
+    raise ImportError("%s.%s not allowed" % (mod, name))
+
+
+def _parse(string, star):
+    """Like `QueryParser.StartQuery()`, but remembered by the compile cache
+    (see `quodlibet.util.compilecache`) if enabled.
+
+    Raises:
+        error
+    """
+
+    cache = compilecache.get_cache()
+    if cache is None:
+        return QueryParser(string, star=star).StartQuery()
+
+    source = (string, tuple(star))
+    data = cache.get("query", source)
+    if data is not None:
+        if not data:
+            raise error("Invalid query")
+        try:
+            return pickle_loads(data, _lookup)
+        except PickleError:
+            pass
+
+    parser = QueryParser(string, star=star)
+    try:
+        node = parser.StartQuery()
+    except error:
+        cache.put("query", source, b"")
+        raise
+
+    if not parser.uses_extensions:
+        try:
+            cache.put("query", source, pickle_dumps(node, 2))
+        except PickleError:
+            pass
+    return node
 
 
 @enum
@@ -68,7 +135,7 @@ class Query(Node):
 
         self.type = QueryType.VALID
         try:
-            self._match = QueryParser(string, star=star).StartQuery()
+            self._match = _parse(string, star)
             return
         except self.error:
             pass
@@ -80,7 +147,7 @@ class Query(Node):
 
             try:
                 self.type = QueryType.TEXT
-                self._match = QueryParser(string, star=star).StartQuery()
+                self._match = _parse(string, star)
                 return
             except self.error:
                 pass
@@ -96,7 +163,7 @@ class Query(Node):
            or `None` if this fails.
         """
         try:
-            return QueryParser(string).StartQuery()
+            return _parse(string, [])
         except error:
             return None
 
@@ -106,11 +173,42 @@ class Query(Node):
 
     @cached_property
     def search(self):
-        return self._match.search
+        return compile_node(self._match)
 
-    @cached_property
-    def filter(self):
-        return self._match.filter
+    def filter(self, sequence):
+        """Returns a new list of the items of the sequence which match.
+
+        If the sequence provides a `query_cache`, `tag_index` or
+        `numeric_columns` (see `SongLibrary`) the result is taken from the
+        cache or only the candidates found through them get checked.
+        The order of the result is undefined in that case and can differ
+        between calls with the same query, callers needing a stable order
+        have to sort it (see `SongLibrary.query()`).
+        """
+
+        cache = getattr(sequence, "query_cache", None)
+        if cache is not None:
+            result = cache.get(self)
+            if result is not None:
+                return list(result)
+
+        result = self._filter(sequence)
+        if cache is not None:
+            cache.put(self, result)
+        return result
+
+    def _filter(self, sequence):
+        index = getattr(sequence, "tag_index", None)
+        columns = getattr(sequence, "numeric_columns", None)
+        if index is not None or columns is not None:
+            candidates, exact = plan(self._match, index, columns)
+            if candidates is not None:
+                if exact:
+                    return candidates
+                sequence = candidates
+            elif exact:
+                return list(sequence)
+        return listfilter(self.search, sequence)
 
     @property
     def valid(self):
@@ -20,7 +20,8 @@ The goal is to make searching easy using a english keyboard without any
 knowledge of other languages.
 """
 
-from .parser import compile
+from .parser import compile, compile_regex, get_literals
+from .fold import fold
 
 
-compile
+compile, compile_regex, get_literals, fold
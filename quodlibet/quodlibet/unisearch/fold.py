@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Normalization of text for building search indices.
+
+`fold()` maps text so that everything a literal can match (ignoring
+case, with or without similar looking unicode chars, see `compile()`)
+gets mapped to the same text as the literal: case and diacritics get
+removed, letters which decompose for collation get decomposed and
+punctuation turns into a space.
+
+    fold(u"Björk - Jóga") -> u"bjork   joga"
+
+So if a literal matches a text, the words of fold(literal) appear
+in fold(text) in the same order, only the first and the last one can be
+part of a longer word.
+"""
+
+import unicodedata
+
+from quodlibet.util import cached_func
+from quodlibet.compat import iteritems, unichr, xrange
+
+from .db import get_decomps_mapping, get_punctuation_mapping
+
+
+def _case(char):
+    # upper() first so chars like "ς" or "ı" end up like their
+    # case-insensitive equivalents
+    upper = char.upper()
+    if len(upper) == 1:
+        return upper.lower()
+    return char.lower()
+
+
+def _strip(text):
+    text = unicodedata.normalize("NFKD", text)
+    return u"".join(
+        _case(c) for c in text if not unicodedata.combining(c))
+
+
+class _FoldTable(dict):
+    """A mapping for unicode.translate(), computing entries when needed"""
+
+    def __init__(self):
+        super(_FoldTable, self).__init__()
+
+        self._decomps = {}
+        for key, chars in iteritems(get_decomps_mapping()):
+            key = _strip(key)
+            for char in chars:
+                char = _strip(char)
+                if char != key:
+                    self._decomps[char] = key
+
+        self._punct = set()
+        for chars in get_punctuation_mapping().values():
+            self._punct.update(_case(c) for c in chars)
+
+    def __missing__(self, code):
+        char = unichr(code)
+        if _case(char) in self._punct:
+            folded = u" "
+        elif char == u"ͅ":
+            # combining ypogegrammeni, case-insensitive equal to iota
+            folded = u"ι"
+        else:
+            # a letter stays a letter (e.g. "ŉ" -> "n")
+            is_letter = unicodedata.category(char).startswith("L")
+            parts = []
+            for c in _strip(char):
+                for c in self._decomps.get(c, c):
+                    if c in self._punct or not c.isalnum():
+                        if not is_letter:
+                            parts.append(u" ")
+                    else:
+                        parts.append(c)
+            folded = u"".join(parts)
+
+        self[code] = folded
+        return folded
+
+
+@cached_func
+def _get_fold_table():
+    return _FoldTable()
+
+
+@cached_func
+def _get_ascii_table():
+    table = _get_fold_table()
+    folded = [table[i] for i in xrange(128)]
+    assert all(len(c) == 1 for c in folded)
+    return (u"".join(folded) + u"\x00" * 128).encode("latin-1")
+
+
+def fold(text):
+    """Folds text for indexing, see the module docstring
+
+    Args:
+        text (text_type)
+    Returns:
+        text_type: lowercase alphanumeric words separated by spaces
+    """
+
+    try:
+        data = text.encode("ascii")
+    except UnicodeEncodeError:
+        text = unicodedata.normalize("NFC", text)
+        return text.translate(_get_fold_table())
+    # faster and the common case
+    return data.translate(_get_ascii_table()).decode("ascii")
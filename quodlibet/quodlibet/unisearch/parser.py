@@ -264,6 +264,34 @@ def re_add_variants(text):
     return re_replace_literals(text, get_replacement_mapping())
 
 
+def get_literals(pattern):
+    """Returns literal parts every match of the regex contains
+
+    "foo.*bar" -> [u"foo", u"bar"]
+    "foo|bar" -> []
+
+    Args:
+        pattern (text_type): a unicode regex
+    Returns:
+        List[text_type]: NFC normalized literals, can be empty
+    """
+
+    assert isinstance(pattern, text_type)
+
+    pattern = unicodedata.normalize("NFC", pattern)
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, NotImplementedError):
+        return []
+
+    # only the top level is a sequence which has to match as a whole
+    literals = []
+    for op, av in _merge_literals(parsed):
+        if op == "literals":
+            literals.append(u"".join(map(unichr, av)))
+    return literals
+
+
 def compile(pattern, ignore_case=True, dot_all=False, asym=False):
     """
     Args:
@@ -278,6 +306,25 @@ def compile(pattern, ignore_case=True, dot_all=False, asym=False):
         ValueError: In case the regex is invalid
     """
 
+    reg = compile_regex(pattern, ignore_case, dot_all, asym)
+    normalize = unicodedata.normalize
+
+    def search(text):
+        return reg.search(normalize("NFC", text))
+
+    return search
+
+
+def compile_regex(pattern, ignore_case=True, dot_all=False, asym=False):
+    """Like `compile()`, but returns the regex object, which only matches
+    text normalized to NFC.
+
+    Returns:
+        A compiled regular expression object
+    Raises:
+        ValueError: In case the regex is invalid
+    """
+
     assert isinstance(pattern, text_type)
 
     pattern = unicodedata.normalize("NFC", pattern)
@@ -298,12 +345,6 @@ def compile(pattern, ignore_case=True, dot_all=False, asym=False):
         mods |= re.DOTALL
 
     try:
-        reg = re.compile(pattern, mods)
+        return re.compile(pattern, mods)
     except re.error as e:
         raise ValueError(e)
-    normalize = unicodedata.normalize
-
-    def search(text):
-        return reg.search(normalize("NFC", text))
-
-    return search
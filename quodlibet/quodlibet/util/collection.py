@@ -22,7 +22,7 @@ from quodlibet.formats._audio import TAG_TO_SORT, NUMERIC_ZERO_DEFAULT
 from quodlibet.formats._audio import PEOPLE as _PEOPLE
 from quodlibet.compat import xrange, text_type, number_types, string_types, \
     swap_to_string, listmap
-from collections import Iterable
+from collections import Iterable, OrderedDict
 from quodlibet.util.path import escape_filename, unescape_filename
 from quodlibet.util.dprint import print_d
 from quodlibet.util.misc import total_ordering, hashable
@@ -74,6 +74,59 @@ NUM_FUNCS = {
 }
 
 
+def _parse_numeric(key):
+    """Returns (tag, func name) for numeric keys which aggregate the values
+    of all songs, or None
+    """
+
+    if not key.startswith("~#"):
+        return
+    key = key[2:]
+    if key[-4:-3] == ":":
+        return "~#" + key[:-4], key[-3:]
+    elif key in ("tracks", "discs", "bitrate"):
+        return
+    return "~#" + key, NUM_DEFAULT_FUNCS.get(key, "avg")
+
+
+def _get_numeric_values(songs, key):
+    """The numeric values of all songs for aggregating, like
+    song(key) but reading stored values directly
+    """
+
+    if key in NUMERIC_ZERO_DEFAULT:
+        default = 0
+    elif key == "~#rating":
+        default = config.RATINGS.default
+    else:
+        default = None
+
+    values = []
+    append = values.append
+    for song in songs:
+        value = song.get(key, default)
+        if value is None:
+            # synthetic or not stored
+            value = song(key)
+            if value == "":
+                continue
+        append(value)
+    return values
+
+
+def prefetch(collections, keys):
+    """Computes the values of the keys for all collections, so later
+    lookups get them from the cache. See `Collection.prefetch()`.
+
+    Args:
+        collections (Iterable[Collection])
+        keys (List[str])
+    """
+
+    for collection in collections:
+        collection.prefetch(keys)
+
+
 class Collection(object):
     """A collection of songs which implements some methods similar to the
     AudioFile class.
@@ -86,18 +139,49 @@ class Collection(object):
     songs = ()
 
     def __init__(self):
-        """Cache in _cache, LRU key order in _used, keys that return default
+        """Cache in _cache (oldest first), keys that return default
         are in _default"""
-        self.__cache = {}
+        self.__cache = OrderedDict()
         self.__default = set()
-        self.__used = []
 
     def finalize(self):
         """Finalize the collection.
         Call this after songs get added or removed"""
         self.__cache.clear()
         self.__default.clear()
-        self.__used = []
+
+    def prefetch(self, keys):
+        """Computes the values of multiple keys, reading the values of all
+        songs once for each numeric tag, e.g. for ~#rating and
+        ~#rating:max.
+
+        Args:
+            keys (List[str])
+        """
+
+        if not self.songs:
+            return
+
+        cache = self.__cache
+        default = self.__default
+        values = {}
+        for key in keys:
+            if key in cache or key in default:
+                continue
+            parsed = _parse_numeric(key)
+            if parsed is None:
+                self.__get_cached_value(key)
+                continue
+            tag, func = parsed
+            func = NUM_FUNCS.get(func)
+            if func:
+                if tag not in values:
+                    values[tag] = _get_numeric_values(self.songs, tag)
+                tag_values = values[tag]
+                value = func(tag_values) if tag_values else None
+            else:
+                value = self.__get_value(key)
+            self.__store(key, value)
 
     def get(self, key, default=u"", connector=u" - "):
         if not self.songs:
@@ -135,24 +219,29 @@ class Collection(object):
         return [] if v == "" else v.split("\n")
 
     def __get_cached_value(self, key):
-        if key in self.__cache:
-            self.__used.remove(key)
-            self.__used.insert(0, key)
-            return self.__cache[key]
+        cache = self.__cache
+        if key in cache:
+            # move to the end, the most recently used
+            val = cache.pop(key)
+            cache[key] = val
+            return val
         elif key in self.__default:
             return None
-        else:
-            val = self.__get_value(key)
-            if val is None:
-                self.__default.add(key)
-            else:
-                self.__used.insert(0, key)
-                self.__cache[key] = val
-            # Remove the oldest if the cache is full
-            if len(self.__used) > self._cache_size:
-                self.__cache.pop(self.__used.pop(-1))
+        val = self.__get_value(key)
+        self.__store(key, val)
         return val
 
+    def __store(self, key, val):
+        if val is None:
+            self.__default.add(key)
+            return
+        cache = self.__cache
+        cache.pop(key, None)
+        cache[key] = val
+        # Remove the oldest if the cache is full
+        while len(cache) > self._cache_size:
+            cache.popitem(last=False)
+
     def __get_value(self, key):
         """This is similar to __call__ in the AudioFile class.
         All internal tags are changed to represent a collection of songs.
@@ -188,8 +277,7 @@ class Collection(object):
             if func:
                 # If none of the songs can return a numeric key,
                 # the album returns default
-                values = (song(key) for song in self.songs)
-                values = [v for v in values if v != ""]
+                values = _get_numeric_values(self.songs, key)
                 return func(values) if values else None
             elif key in NUMERIC_ZERO_DEFAULT:
                 return 0
@@ -224,14 +312,7 @@ class Collection(object):
                 ret = (ret and "\n".join(ret)) or None
 
                 other, values = keys.popitem()
-                other = "~" + other
-                if not values:
-                    self.__default.add(other)
-                else:
-                    if other in self.__used:
-                        self.__used.remove(other)
-                    self.__used.append(other)
-                    self.__cache[other] = "\n".join(values)
+                self.__store("~" + other, "\n".join(values) or None)
                 return ret
             elif numkey == "length":
                 length = self.__get_value("~#" + key)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Parsed queries and compiled patterns, kept on disk between runs.
+
+Entries are serialized by the users of the cache and keyed by a kind and
+the source text. The file is only used by the same program and Python
+version which wrote it.
+"""
+
+import os
+import sys
+from collections import OrderedDict
+
+import quodlibet
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir
+from quodlibet.util.picklehelper import pickle_load, pickle_dumps, \
+    PickleError
+
+
+FORMAT = 1
+"""Gets increased whenever the serialized entries change"""
+
+
+def _get_version():
+    return (FORMAT, quodlibet.get_build_description(), sys.version)
+
+
+_GLOBALS = [("_codecs", "encode"), ("__builtin__", "bytes"),
+            ("builtins", "bytes")]
+
+
+def _lookup(func, mod, name):
+    # only bytes need globals (on Python 3)
+    if (mod, name) not in _GLOBALS:
+        raise ImportError("%s.%s not allowed" % (mod, name))
+    return func(mod, name)
+
+
+class CompileCache(object):
+    """Maps (kind, source) to bytes, stored in a file.
+
+    The file gets loaded the first time an entry is needed. Entries which
+    weren't used for a while get dropped once there are too many.
+    """
+
+    MAX_ENTRIES = 1000
+    """Number of entries to keep"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.dirty = False
+        self._entries = None
+
+    def _load(self):
+        self._entries = OrderedDict()
+        if not os.path.exists(self.filename):
+            return
+
+        try:
+            with open(self.filename, "rb") as fileobj:
+                version, entries = pickle_load(fileobj, _lookup)
+        except (EnvironmentError, PickleError, ValueError, TypeError):
+            print_w("Couldn't load compile cache from: %r" % self.filename)
+            return
+
+        if version != _get_version():
+            print_d("Ignoring compile cache of a different version")
+            return
+
+        self._entries.update(entries)
+        print_d("Loaded %d compiled entries" % len(self._entries))
+
+    def get(self, kind, source):
+        """Returns the bytes stored for the source text, or None
+
+        Args:
+            kind (str)
+            source (object): text or a tuple of texts
+        Returns:
+            bytes or None
+        """
+
+        if self._entries is None:
+            self._load()
+
+        key = (kind, source)
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self._entries[key] = data
+        return data
+
+    def put(self, kind, source, data):
+        """Stores bytes for the source text
+
+        Args:
+            kind (str)
+            source (object): text or a tuple of texts
+            data (bytes)
+        """
+
+        if self._entries is None:
+            self._load()
+
+        key = (kind, source)
+        self._entries.pop(key, None)
+        self._entries[key] = data
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+        self.dirty = True
+
+    def save(self):
+        """Writes the entries to the file if anything changed"""
+
+        if not self.dirty:
+            return
+
+        print_d("Saving %d compiled entries" % len(self._entries))
+        try:
+            data = pickle_dumps(
+                (_get_version(), list(self._entries.items())), 2)
+            mkdir(os.path.dirname(self.filename))
+            with atomic_save(self.filename, "wb") as fileobj:
+                fileobj.write(data)
+        except PickleError:
+            return
+        except EnvironmentError:
+            print_w("Couldn't save compile cache to: %r" % self.filename)
+            return
+        self.dirty = False
+
+
+_cache = None
+
+
+def init(filename):
+    """Enables the cache for the rest of the process"""
+
+    global _cache
+
+    _cache = CompileCache(filename)
+
+
+def get_cache():
+    """Returns the CompileCache or None if not enabled"""
+
+    return _cache
+
+
+def save():
+    """Saves the CompileCache, if enabled"""
+
+    if _cache is not None:
+        _cache.save()
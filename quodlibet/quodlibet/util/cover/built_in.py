@@ -11,11 +11,15 @@ import glob
 import os.path
 import re
 import sre_constants
+import threading
+import time
+from collections import OrderedDict
 
 from senf import fsn2text
 
 from quodlibet import _
 from quodlibet.plugins.cover import CoverSourcePlugin
+from quodlibet.util.cover.embedded import get_embedded_cache
 from quodlibet.util.dprint import print_w
 from quodlibet import config
 
@@ -28,6 +32,68 @@ def prefer_embedded():
     return config.getboolean("albumart", "prefer_embedded", False)
 
 
+class _DirectoryCache(object):
+    """Remembers values computed from the content of directories, valid
+    as long as the modification times of the directories stay the same.
+    """
+
+    MAX_ENTRIES = 10000
+    """Number of entries to keep, dropping the least recently used ones"""
+
+    MIN_AGE = 2
+    """Seconds since the last modification of a directory below which
+    nothing depending on it gets stored, as a change within the same
+    timestamp resolution would go unnoticed otherwise"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_stamp(self, dirs):
+        stamp = []
+        for path in dirs:
+            try:
+                stamp.append(os.stat(path).st_mtime)
+            except EnvironmentError:
+                stamp.append(None)
+        return stamp
+
+    def get(self, key, func):
+        """Returns the cached value for the key or the result of `func()`
+
+        Args:
+            key (object): identifies the value, including the directory
+            func (callable): returning the value and the list of
+                directories it depends on
+        Returns:
+            object
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+
+        if entry is not None:
+            dirs, stamp, value = entry
+            if self._get_stamp(dirs) == stamp:
+                return value
+
+        value, dirs = func()
+        stamp = self._get_stamp(dirs)
+        now = time.time()
+        if all(m is not None and now - m >= self.MIN_AGE for m in stamp):
+            with self._lock:
+                self._entries[key] = (dirs, stamp, value)
+                while len(self._entries) > self.MAX_ENTRIES:
+                    self._entries.popitem(last=False)
+        return value
+
+
 class EmbeddedCover(CoverSourcePlugin):
     PLUGIN_ID = "embed-cover"
     PLUGIN_NAME = _("Embedded album covers")
@@ -47,6 +113,9 @@ class EmbeddedCover(CoverSourcePlugin):
     @property
     def cover(self):
         if self.song.has_images:
+            cache = get_embedded_cache()
+            if cache is not None:
+                return cache.get_cover(self.song)
             image = self.song.get_primary_image()
             return image.file if image else None
 
@@ -69,6 +138,19 @@ class FilesystemCover(CoverSourcePlugin):
     cover_negative_regexes = frozenset(
         [re.compile(r'(\b|_|)' + s + r'(\b|_)') for s in cover_negative_words])
 
+    _listings = _DirectoryCache()
+    """The image files of directories"""
+
+    _results = _DirectoryCache()
+    """The image files of directories ordered by score, per scoring tags"""
+
+    @classmethod
+    def clear_cache(cls):
+        """Forgets all directory contents, e.g. after a cover changed"""
+
+        cls._listings.clear()
+        cls._results.clear()
+
     @classmethod
     def group_by(cls, song):
         # in the common case this means we only search once per album
@@ -85,81 +167,116 @@ class FilesystemCover(CoverSourcePlugin):
     def priority():
         return 0.80
 
+    def _list_images(self, base):
+        """Returns the image files in the directory and in its cover
+        sub directories as (sub directory or None, filename) tuples, and
+        the listed directories.
+        """
+
+        entries = []
+        dirs = [base]
+        try:
+            entries = os.listdir(base)
+        except EnvironmentError:
+            print_w("Can't list album art directory %s" % base)
+
+        fns = []
+        for entry in entries:
+            lentry = entry.lower()
+            if get_ext(lentry) in self.cover_exts:
+                fns.append((None, entry))
+            if lentry in self.cover_subdirs:
+                subdir = os.path.join(base, entry)
+                sub_entries = []
+                try:
+                    sub_entries = os.listdir(subdir)
+                except EnvironmentError:
+                    pass
+                else:
+                    dirs.append(subdir)
+                for sub_entry in sub_entries:
+                    lsub_entry = sub_entry.lower()
+                    if get_ext(lsub_entry) in self.cover_exts:
+                        fns.append((entry, sub_entry))
+        # the listed directories are part of the value as well, as the
+        # scores depend on them
+        return (fns, dirs), dirs
+
+    def _score_images(self, base, labelid, lowers):
+        """Returns the paths of the images worth a try, best first, and
+        the directories they were found in.
+        """
+
+        fns, dirs = self._listings.get(
+            base, lambda: self._list_images(base))
+
+        images = []
+        for sub, fn in fns:
+            dec_lfn = fsn2text(fn).lower()
+
+            score = 0
+            # check for the album label number
+            if labelid and labelid in dec_lfn:
+                score += 20
+
+            # Track-related keywords
+            score += 2 * sum([value in dec_lfn for value in lowers])
+
+            # Generic keywords
+            score += 3 * sum(r.search(dec_lfn) is not None
+                             for r in self.cover_positive_regexes)
+
+            score -= 2 * sum(r.search(dec_lfn) is not None
+                             for r in self.cover_negative_regexes)
+
+            # print("[%s - %s]: Album art \"%s\" scores %d." %
+            #         (self.song("artist"), self.song("title"), fn, score))
+            if score > 0:
+                if sub is not None:
+                    fn = os.path.join(sub, fn)
+                images.append((score, os.path.join(base, fn)))
+
+        images.sort(reverse=True)
+        return [path for (score, path) in images], dirs
+
+    def _glob_images(self, base, filename):
+        images = []
+        # Issue 374: Specify artwork filename
+        escaped_path = os.path.join(glob.escape(base), filename)
+        try:
+            for path in glob.glob(escaped_path):
+                images.append((100, path))
+        except sre_constants.error:
+            # Use literal filename if globbing causes errors
+            path = os.path.join(base, filename)
+            images = [(100, path)]
+
+        images.sort(reverse=True)
+        dirs = {base, os.path.dirname(os.path.join(base, filename))}
+        return [path for (score, path) in images], sorted(dirs)
+
     @property
     def cover(self):
-        # TODO: Deserves some refactoring
         if not self.song.is_file:
             return None
 
+        # The directory contents and scores get cached, so asking for
+        # the covers of many albums again doesn't list the directories
         base = self.song('~dirname')
-        images = []
-
-        # Issue 374: Specify artwork filename
         if config.getboolean("albumart", "force_filename"):
-            escaped_path = os.path.join(glob.escape(base),
-                                        config.get("albumart", "filename"))
-            try:
-                for path in glob.glob(escaped_path):
-                    images.append((100, path))
-            except sre_constants.error:
-                # Use literal filename if globbing causes errors
-                path = os.path.join(base, config.get("albumart", "filename"))
-                images = [(100, path)]
+            filename = config.get("albumart", "filename")
+            paths = self._results.get(
+                (base, filename), lambda: self._glob_images(base, filename))
         else:
-            entries = []
-            try:
-                entries = os.listdir(base)
-            except EnvironmentError:
-                print_w("Can't list album art directory %s" % base)
-
-            fns = []
-            for entry in entries:
-                lentry = entry.lower()
-                if get_ext(lentry) in self.cover_exts:
-                    fns.append((None, entry))
-                if lentry in self.cover_subdirs:
-                    subdir = os.path.join(base, entry)
-                    sub_entries = []
-                    try:
-                        sub_entries = os.listdir(subdir)
-                    except EnvironmentError:
-                        pass
-                    for sub_entry in sub_entries:
-                        lsub_entry = sub_entry.lower()
-                        if get_ext(lsub_entry) in self.cover_exts:
-                            fns.append((entry, sub_entry))
-
-            for sub, fn in fns:
-                dec_lfn = fsn2text(fn).lower()
-
-                score = 0
-                # check for the album label number
-                labelid = self.song.get("labelid", "").lower()
-                if labelid and labelid in dec_lfn:
-                    score += 20
-
-                # Track-related keywords
-                values = self.song.list("~people") + [self.song("album")]
-                lowers = [value.lower().strip() for value in values
-                          if len(value) > 1]
-                score += 2 * sum([value in dec_lfn for value in lowers])
-
-                # Generic keywords
-                score += 3 * sum(r.search(dec_lfn) is not None
-                                 for r in self.cover_positive_regexes)
-
-                score -= 2 * sum(r.search(dec_lfn) is not None
-                                 for r in self.cover_negative_regexes)
-
-                # print("[%s - %s]: Album art \"%s\" scores %d." %
-                #         (self.song("artist"), self.song("title"), fn, score))
-                if score > 0:
-                    if sub is not None:
-                        fn = os.path.join(sub, fn)
-                    images.append((score, os.path.join(base, fn)))
-
-        images.sort(reverse=True)
-        for score, path in images:
+            labelid = self.song.get("labelid", "").lower()
+            values = self.song.list("~people") + [self.song("album")]
+            lowers = tuple(value.lower().strip() for value in values
+                           if len(value) > 1)
+            paths = self._results.get(
+                (base, labelid, lowers),
+                lambda: self._score_images(base, labelid, lowers))
+
+        for path in paths:
             # could be a directory
             if not os.path.isfile(path):
                 continue
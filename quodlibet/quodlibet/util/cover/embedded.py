@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Images embedded in audio files, extracted once and kept on disk.
+
+Each image is stored in a file named after the hash of its content, so
+all songs of an album with the same image share one file. A small SQLite
+index maps the path of each audio file to the hash of its image, used as
+long as the modification time and size of the file stay the same.
+"""
+
+import os
+import hashlib
+
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir
+from quodlibet.util.sqlitecache import FileCache
+
+
+FORMAT = 1
+"""Gets increased whenever the stored entries change"""
+
+
+def _is_image_name(name):
+    if len(name) != 40:
+        return False
+    try:
+        int(name, 16)
+    except ValueError:
+        return False
+    return True
+
+
+class EmbeddedImageCache(FileCache):
+    """Extracts the primary embedded image of songs into a directory."""
+
+    NAME = u"embedded image index"
+    TABLE = "images"
+    COLUMNS = [("hash", "TEXT")]
+
+    MAX_SIZE = 200 * 1024 * 1024
+    """Bytes of images `prune()` keeps, the most recently extracted ones"""
+
+    def __init__(self, directory):
+        super(EmbeddedImageCache, self).__init__(
+            os.path.join(directory, "index.sqlite"))
+        self.directory = directory
+
+    def _get_version(self):
+        return u"%d" % FORMAT
+
+    def _extract(self, song):
+        image = song.get_primary_image()
+        if image is None:
+            return None, None
+
+        try:
+            data = image.read()
+        except EnvironmentError:
+            return None, image.file
+
+        hash_ = hashlib.sha1(data).hexdigest()
+        path = os.path.join(self.directory, hash_)
+        if not os.path.exists(path):
+            try:
+                mkdir(self.directory)
+                with atomic_save(path, "wb") as fileobj:
+                    fileobj.write(data)
+            except EnvironmentError as e:
+                print_w("Couldn't store embedded image: %s" % e)
+                return None, image.file
+        return hash_, open(path, "rb")
+
+    def get_cover(self, song):
+        """Returns a file object of the primary embedded image of the song
+        or None.
+
+        Args:
+            song (AudioFile)
+        Returns:
+            fileobj or None
+        """
+
+        filename = song("~filename")
+        try:
+            stat = os.stat(filename)
+        except EnvironmentError:
+            return
+
+        values = self.lookup(filename, stat)
+        if values is not None:
+            hash_ = values[0]
+            if hash_ is None:
+                return
+            try:
+                return open(os.path.join(self.directory, hash_), "rb")
+            except EnvironmentError:
+                pass
+
+        hash_, fileobj = self._extract(song)
+        if fileobj is None or hash_ is not None:
+            self.store(filename, stat.st_mtime, stat.st_size, (hash_,))
+        return fileobj
+
+    def prune(self, cancellable=None):
+        """Like `FileCache.prune()`, also removes the images no longer
+        referenced and the oldest ones above `MAX_SIZE`.
+        """
+
+        removed = super(EmbeddedImageCache, self).prune(cancellable)
+        if cancellable is not None and cancellable.is_cancelled():
+            return removed
+
+        rows = self._execute("SELECT DISTINCT hash FROM images")
+        try:
+            names = os.listdir(self.directory)
+        except EnvironmentError:
+            names = []
+        if rows is None or not names:
+            return removed
+        referenced = set(r[0] for r in rows)
+
+        unused = []
+        images = []
+        for name in filter(_is_image_name, names):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except EnvironmentError:
+                continue
+            if name in referenced:
+                images.append((stat.st_mtime, stat.st_size, name))
+            else:
+                unused.append(name)
+
+        # newly extracted images are the newest files
+        images.sort()
+        total = sum(i[1] for i in images)
+        dropped = []
+        while images and total > self.MAX_SIZE:
+            mtime, size, name = images.pop(0)
+            total -= size
+            dropped.append(name)
+
+        # entries first, an image getting referenced again in the meantime
+        # gets extracted again
+        for i in range(0, len(dropped), 500):
+            chunk = dropped[i:i + 500]
+            self._execute("DELETE FROM images WHERE hash IN (%s)" %
+                          ", ".join("?" * len(chunk)), chunk)
+
+        for name in unused + dropped:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except EnvironmentError:
+                pass
+        if unused or dropped:
+            print_d("Removed %d embedded images" % len(unused + dropped))
+        return removed
+
+
+def init_embedded_cache(directory):
+    """Makes `EmbeddedCover` use the cache for the rest of the process"""
+
+    EmbeddedImageCache.install(directory)
+
+
+def get_embedded_cache():
+    """Returns the EmbeddedImageCache or None if not enabled"""
+
+    return EmbeddedImageCache.get_installed()
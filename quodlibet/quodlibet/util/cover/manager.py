@@ -7,18 +7,19 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import threading
 from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
-from gi.repository import GObject
+from gi.repository import GObject, GLib
 
 from quodlibet import _
 from quodlibet.formats import AudioFile
 from quodlibet.plugins import PluginManager, PluginHandler
 from quodlibet.qltk.notif import Task
 from quodlibet.util.cover import built_in
-from quodlibet.util import print_d
-from quodlibet.util.thread import call_async
-from quodlibet.util.thumbnails import get_thumbnail_from_file
+from quodlibet.util import print_d, print_exc
+from quodlibet.util.thumbnails import get_cached_thumbnail_from_file
 from quodlibet.plugins.cover import CoverSourcePlugin
 
 
@@ -47,11 +48,104 @@ class CoverPluginHandler(PluginHandler):
     def sources(self):
         """Yields all active CoverSourcePlugin classes sorted by priority"""
 
-        sources = chain((p.cls for p in self.providers), self.built_in)
+        # a copy, as the sources also get used from threads
+        sources = chain([p.cls for p in self.providers], self.built_in)
         for p in sorted(sources, reverse=True, key=lambda x: x.priority()):
             yield p
 
 
+class _Request(object):
+
+    def __init__(self, key, args):
+        self.key = key
+        self.args = args
+        # (cancellable, callback) of everyone waiting for the result
+        self.waiting = []
+
+    def is_cancelled(self):
+        return all(c is not None and c.is_cancelled()
+                   for c, cb in self.waiting)
+
+
+class AsyncLoader(object):
+    """Runs a function in a pool of threads and passes the results to
+    callbacks in the main loop.
+
+    The newest requests get handled first, as they are usually for what is
+    visible right now, e.g. after scrolling. Requests with the same key
+    which didn't finish yet share one call. Requests which got cancelled
+    before they were started get skipped.
+    """
+
+    MAX_WORKERS = 4
+    """Number of threads"""
+
+    def __init__(self, function):
+        self._function = function
+        self._lock = threading.Lock()
+        # not yet started requests, newest last
+        self._stack = []
+        self._requests = {}
+        self._pool = None
+
+    def request(self, key, args, cancellable, callback):
+        """Calls `function(*args)` in a thread and `callback(result)` in
+        the main loop, unless the result is None or cancellable got
+        cancelled.
+
+        Args:
+            key (hashable): requests with the same key give the same result
+            args (tuple)
+            cancellable (Gio.Cancellable or None)
+            callback (callable)
+        """
+
+        with self._lock:
+            request = self._requests.get(key)
+            if request is None:
+                request = self._requests[key] = _Request(key, args)
+                self._stack.append(request)
+                submit = True
+            else:
+                submit = False
+                if request in self._stack:
+                    # wanted again, so move it up
+                    self._stack.remove(request)
+                    self._stack.append(request)
+            request.waiting.append((cancellable, callback))
+
+        if submit:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.MAX_WORKERS)
+            self._pool.submit(self._run_next)
+
+    def _run_next(self):
+        with self._lock:
+            request = self._stack.pop()
+            if request.is_cancelled():
+                del self._requests[request.key]
+                return
+
+        try:
+            result = self._function(*request.args)
+        except Exception:
+            print_exc()
+            result = None
+
+        with self._lock:
+            del self._requests[request.key]
+
+        if result is not None:
+            GLib.idle_add(self._done, request.waiting, result,
+                          priority=GLib.PRIORITY_DEFAULT)
+
+    def _done(self, waiting, result):
+        for cancellable, callback in waiting:
+            if cancellable is None or not cancellable.is_cancelled():
+                callback(result)
+        return False
+
+
 class CoverManager(GObject.Object):
 
     __gsignals__ = {
@@ -70,6 +164,7 @@ class CoverManager(GObject.Object):
     def __init__(self, use_built_in=True):
         super(CoverManager, self).__init__()
         self.plugin_handler = CoverPluginHandler(use_built_in)
+        self._loader = AsyncLoader(self.get_pixbuf_many)
 
     def init_plugins(self):
         """Register the cover sources plugin handler with the global
@@ -91,6 +186,7 @@ class CoverManager(GObject.Object):
         to re-fetch the cover and do a display update.
         """
 
+        built_in.FilesystemCover.clear_cache()
         self.emit("cover-changed", songs)
 
     def acquire_cover(self, callback, cancellable, song):
@@ -192,14 +288,15 @@ class CoverManager(GObject.Object):
         """Returns a Pixbuf which fits into the boundary defined by width
         and height or None.
 
-        Uses the thumbnail cache if possible.
+        Uses the thumbnail cache if possible. The returned Pixbuf can be
+        shared with other callers and should not be modified.
         """
 
         fileobj = self.get_cover_many(songs)
         if fileobj is None:
             return
 
-        return get_thumbnail_from_file(fileobj, (width, height))
+        return get_cached_thumbnail_from_file(fileobj, (width, height))
 
     def get_pixbuf(self, song, width, height):
         """see get_pixbuf_many()"""
@@ -210,15 +307,15 @@ class CoverManager(GObject.Object):
         """Async variant; callback gets called with a pixbuf or not called
         in case of an error. cancel is a Gio.Cancellable.
 
-        The callback will be called in the main loop.
+        The callback will be called in the main loop. Looking up the cover
+        and loading it happens in a pool of threads, the most recent
+        requests first (see `AsyncLoader`).
         """
 
-        fileobj = self.get_cover_many(songs)
-        if fileobj is None:
-            return
-
-        call_async(get_thumbnail_from_file, cancel, callback,
-                   args=(fileobj, (width, height)))
+        songs = list(songs)
+        key = (frozenset(s.key for s in songs), width, height)
+        self._loader.request(
+            key, (songs, width, height), cancel, callback)
 
     def search_cover(self, cancellable, songs):
         """Search for all the covers applicable to `songs` across all providers
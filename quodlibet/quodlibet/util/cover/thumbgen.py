@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Creation of the thumbnails of all album covers ahead of time.
+
+The covers get looked up in a thread, the thumbnails get created in a
+pool of worker processes (see `quodlibet.library.parallel`) running at
+the lowest priority. Browsing the albums afterwards only has to load the
+existing small thumbnails.
+"""
+
+import os
+
+from gi.repository import GLib
+from senf import fsnative, gettempdir
+
+from quodlibet import _
+from quodlibet import config
+from quodlibet import util
+from quodlibet.library import parallel
+from quodlibet.qltk.notif import Task
+from quodlibet.util import copool
+from quodlibet.util.dprint import print_d
+from quodlibet.util.thread import iter_threaded, Cancellable
+from quodlibet.util.thumbnails import get_thumbnail, ThumbSize
+
+
+CHUNK_SIZE = 10
+"""Number of images a worker handles in one go"""
+
+
+def find_cover_paths(cancellable, manager, albums):
+    """Yields the path of the cover image of each album, skipping images
+    already found for other albums. Meant to be run in a thread.
+
+    Args:
+        cancellable (Cancellable)
+        manager (CoverManager)
+        albums (List[Album])
+    Yields:
+        fsnative
+    """
+
+    seen = set()
+    tempdir = gettempdir()
+    for album in albums:
+        if cancellable.is_cancelled():
+            return
+        fileobj = manager.get_cover_many(album.songs)
+        if fileobj is None:
+            continue
+        path = getattr(fileobj, "name", None)
+        fileobj.close()
+        # temporary files don't get thumbnails
+        if not isinstance(path, fsnative) or path.startswith(tempdir) or \
+                path in seen:
+            continue
+        seen.add(path)
+        yield path
+
+
+def _lower_priority():
+    """Runs first in each worker process"""
+
+    # without an explicitly set I/O priority the kernel derives it from
+    # the CPU one
+    try:
+        os.nice(19)
+    except (AttributeError, OSError):
+        pass
+
+
+def _generate_chunk(paths):
+    """Runs in the worker process.
+
+    Returns:
+        int: the number of images which could be loaded
+    """
+
+    done = 0
+    for path in paths:
+        try:
+            for size in (ThumbSize.NORMAL, ThumbSize.LARGE):
+                get_thumbnail(path, (size, size))
+        except (GLib.GError, EnvironmentError):
+            continue
+        done += 1
+    return done
+
+
+def generate_thumbnails(manager, albums, workers=0, cofuncid=None):
+    """Creates the normal and large thumbnails of the album covers.
+
+    This is a generator meant to be copooled. Closing it stops all
+    pending work (see `quodlibet.library.parallel.iter_map()`).
+
+    Args:
+        manager (CoverManager)
+        albums (Iterable[Album])
+        workers (int): number of worker processes, 0 meaning one per CPU
+        cofuncid (str or None): to enable pause/stop buttons in the UI
+    """
+
+    albums = list(albums)
+    paths = []
+    with Task(_("Covers"), _("Looking up covers")) as task:
+        if cofuncid:
+            task.copool(cofuncid)
+        for found in iter_threaded(
+                find_cover_paths, Cancellable(), (manager, albums)):
+            paths.extend(found)
+            task.pulse()
+            yield
+
+    if not paths:
+        return
+
+    workers = parallel.get_worker_count(workers)
+    print_d("Creating thumbnails for %d covers" % len(paths))
+
+    chunks = [paths[i:i + CHUNK_SIZE]
+              for i in range(0, len(paths), CHUNK_SIZE)]
+    done = created = 0
+    with Task(_("Covers"), _("Creating thumbnails")) as task:
+        if cofuncid:
+            task.copool(cofuncid)
+        for finished in parallel.iter_map(
+                _generate_chunk, chunks, workers, _lower_priority):
+            for chunk, future in finished:
+                try:
+                    created += future.result()
+                except Exception:
+                    util.print_exc()
+                done += len(chunk)
+            task.update(float(done) / len(paths))
+            yield
+
+    print_d("Loaded %d of %d covers" % (created, len(paths)))
+
+
+def pregenerate_thumbnails(library, manager):
+    """Starts creating the thumbnails of all albums in the library in the
+    background, replacing a still running run.
+
+    Args:
+        library (SongLibrary)
+        manager (CoverManager)
+    """
+
+    workers = config.getint("library", "scan_workers")
+    copool.add(generate_thumbnails, manager, library.albums.values(),
+               workers=workers, cofuncid="thumbnails", funcid="thumbnails")
@@ -110,7 +110,8 @@ def scan_library(library, force):
 
     paths = get_scan_dirs()
     exclude = get_exclude_dirs()
-    copool.add(library.rebuild, paths, force, exclude,
+    workers = config.getint("library", "scan_workers")
+    copool.add(library.rebuild, paths, force, exclude, workers=workers,
                cofuncid="library", funcid="library")
 
 
@@ -66,6 +66,15 @@ def pickle_dump(obj, file, protocol=0):
         raise PicklingError(e)
 
 
+class _CustomUnpickler(pickle.Unpickler):
+
+    lookup_func = None
+
+    def find_class(self, module, name):
+        func = super(_CustomUnpickler, self).find_class
+        return self.lookup_func(func, module, name)
+
+
 def pickle_load(file, lookup_func=None):
     """Allows unpickling with manual control over class lookup on both Python
     2 and Python 3.
@@ -99,23 +108,15 @@ def pickle_load(file, lookup_func=None):
 
             inst.find_global = find_global
     else:
-        if lookup_func is not None:
-
-            class CustomUnpickler(pickle.Unpickler):
-
-                def find_class(self, module, name):
-                    func = super(CustomUnpickler, self).find_class
-                    return lookup_func(func, module, name)
-
-            unpickler_type = CustomUnpickler
-        else:
-            unpickler_type = pickle.Unpickler
-
         # helps a lot, but only on py3
         if isinstance(file, BytesIO):
             file = BufferedReader(file)
 
-        inst = unpickler_type(file, encoding="bytes")
+        if lookup_func is not None:
+            inst = _CustomUnpickler(file, encoding="bytes")
+            inst.lookup_func = lookup_func
+        else:
+            inst = pickle.Unpickler(file, encoding="bytes")
 
     try:
         return inst.load()
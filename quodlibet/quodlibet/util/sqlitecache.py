@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Values derived from files, kept in an SQLite database between runs.
+
+Entries are keyed by the path and only used as long as the modification
+time and size of the file stay the same. The database is shared by all
+processes using it and gets cleared if it was written by a different
+version.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from senf import fsn2bytes, bytes2fsn
+
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir
+
+
+class FileCache(object):
+    """Base class for caches storing values for each file in a table of an
+    SQLite database.
+
+    The database gets opened the first time it is needed, again in other
+    processes. Errors are logged and treated as a missing entry.
+    """
+
+    NAME = u"cache"
+    """Used in log messages"""
+
+    TABLE = "files"
+    """Name of the table containing the entries"""
+
+    COLUMNS = []
+    """Names and types of the stored values, List[Tuple[str, str]]"""
+
+    MIN_AGE = 2
+    """Seconds since the last modification below which files don't get
+    stored, as a change within the same timestamp resolution and with the
+    same size would go unnoticed otherwise"""
+
+    MAX_ENTRIES = 200000
+    """Number of entries `prune()` keeps, the most recently stored ones"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_version(self):
+        """Returns a text identifying the format of the stored values,
+        entries of other versions get removed
+        """
+
+        raise NotImplementedError
+
+    def _connect(self):
+        mkdir(os.path.dirname(self.filename))
+        conn = sqlite3.connect(
+            self.filename, timeout=5, isolation_level=None,
+            check_same_thread=False)
+        try:
+            # losing the latest entries on a crash is fine for a cache
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta "
+                         "(key TEXT PRIMARY KEY, value TEXT)")
+            columns = "".join(
+                ", %s %s" % column for column in self.COLUMNS)
+            conn.execute("CREATE TABLE IF NOT EXISTS %s "
+                         "(path BLOB PRIMARY KEY, mtime REAL, "
+                         "size INTEGER%s)" % (self.TABLE, columns))
+            version = self._get_version()
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != version:
+                print_d("Clearing %s of a different version" % self.NAME)
+                conn.execute("DELETE FROM %s" % self.TABLE)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES "
+                             "('version', ?)", (version,))
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _get_conn(self):
+        # connections can't be shared with forked processes
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = None
+            try:
+                self._conn = self._connect()
+            except sqlite3.DatabaseError:
+                print_w("Recreating invalid %s: %r" %
+                        (self.NAME, self.filename))
+                try:
+                    os.remove(self.filename)
+                except EnvironmentError:
+                    pass
+                self._conn = self._connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _execute(self, sql, args=()):
+        """Returns all resulting rows, or None in case of an error"""
+
+        with self._lock:
+            try:
+                return self._get_conn().execute(sql, args).fetchall()
+            except sqlite3.Error as e:
+                print_w("Couldn't access %s: %s" % (self.NAME, e))
+
+    def _key(self, filename):
+        return sqlite3.Binary(fsn2bytes(os.path.abspath(filename), "utf-8"))
+
+    def is_too_recent(self, mtime):
+        """If a file with the modification time can't be stored yet, see
+        `MIN_AGE`
+        """
+
+        return not mtime or time.time() - mtime < self.MIN_AGE
+
+    def lookup(self, filename, stat):
+        """Returns the stored values for a file, or None if there are
+        none or the file has changed since.
+
+        Args:
+            filename (fsnative)
+            stat (os.stat_result): the current state of the file
+        Returns:
+            tuple or None: the values of `COLUMNS`
+        """
+
+        names = "".join(", " + name for name, type_ in self.COLUMNS)
+        rows = self._execute(
+            "SELECT mtime, size%s FROM %s WHERE path = ?" % (
+                names, self.TABLE), (self._key(filename),))
+        if rows and tuple(rows[0][:2]) == (stat.st_mtime, stat.st_size):
+            return tuple(rows[0][2:])
+
+    def store(self, filename, mtime, size, values):
+        """Stores the values for a file. Files which were modified just now
+        are skipped.
+
+        Args:
+            filename (fsnative)
+            mtime (float): the modification time the values belong to
+            size (int): the file size the values belong to
+            values (tuple): the values of `COLUMNS`
+        """
+
+        if self.is_too_recent(mtime):
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO %s VALUES (?, ?, ?%s)" % (
+                self.TABLE, ", ?" * len(self.COLUMNS)),
+            (self._key(filename), mtime, size) + tuple(values))
+
+    def prune(self, cancellable=None):
+        """Removes the entries of files which no longer exist and the
+        oldest entries above `MAX_ENTRIES`. Meant to be run in a thread.
+
+        Args:
+            cancellable (Cancellable or None)
+        Returns:
+            int: the number of removed entries
+        """
+
+        rows = self._execute("SELECT rowid, path FROM %s" % self.TABLE)
+        if not rows:
+            return 0
+
+        removed = set()
+        for rowid, path in rows:
+            if cancellable is not None and cancellable.is_cancelled():
+                return 0
+            if not os.path.exists(bytes2fsn(bytes(path), "utf-8")):
+                removed.add(rowid)
+
+        # replaced entries get a new rowid, so the lowest are the oldest
+        excess = len(rows) - len(removed) - self.MAX_ENTRIES
+        if excess > 0:
+            kept = sorted(r for r, p in rows if r not in removed)
+            removed.update(kept[:excess])
+
+        removed = list(removed)
+        for i in range(0, len(removed), 500):
+            chunk = removed[i:i + 500]
+            self._execute("DELETE FROM %s WHERE rowid IN (%s)" % (
+                self.TABLE, ", ".join("?" * len(chunk))), chunk)
+
+        if removed:
+            print_d("Removed %d entries from %s" % (len(removed), self.NAME))
+        return len(removed)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    @classmethod
+    def install(cls, *args):
+        """Creates the instance returned by `get_installed()` for the rest
+        of the process, closing the previous one.
+
+        Args:
+            args: passed to the constructor, no arguments disable the cache
+        """
+
+        old = cls.get_installed()
+        if old is not None:
+            old.close()
+        cls._installed = cls(*args) if args else None
+
+    @classmethod
+    def get_installed(cls):
+        """Returns the instance created by `install()` or None"""
+
+        # not the one of a base class
+        return cls.__dict__.get("_installed")
@@ -8,6 +8,7 @@
 
 """Utils for executing things in a thread controlled from the main loop"""
 
+import threading
 from multiprocessing import cpu_count
 try:
     from concurrent.futures import ThreadPoolExecutor
@@ -17,6 +18,7 @@ except ImportError as e:
 from gi.repository import GLib
 
 from quodlibet import util
+from quodlibet.compat import queue
 
 
 @util.enum
@@ -148,3 +150,62 @@ def call_async_background(function, cancellable, callback, args=None,
 
     _call_async(Priority.BACKGROUND, function, cancellable, callback,
                 args, kwargs)
+
+
+def iter_threaded(function, cancellable, args=None, kwargs=None,
+                  timeout=0.015, batch_size=1000):
+    """Runs the generator `function` in a thread, which gets passed the
+    `cancellable` and the passed args/kwargs.
+
+    Meant to be driven from the main loop (e.g. copooled): yields lists
+    of the values the generator produced in the meantime, waiting at
+    most `timeout` seconds for new ones and yielding an empty list if
+    there are none. Exceptions raised in the thread get re-raised.
+
+    Closing the returned generator cancels the `cancellable`, the
+    function should check it regularly and stop.
+    """
+
+    if args is None:
+        args = tuple()
+    if kwargs is None:
+        kwargs = {}
+
+    results = queue.Queue()
+    done = object()
+
+    def run():
+        batch = []
+        try:
+            for value in function(cancellable, *args, **kwargs):
+                if cancellable.is_cancelled():
+                    return
+                batch.append(value)
+                if len(batch) >= batch_size:
+                    results.put(batch)
+                    batch = []
+            results.put(batch)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            try:
+                result = results.get(timeout=timeout)
+            except queue.Empty:
+                yield []
+                continue
+            if result is done:
+                break
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        cancellable.cancel()
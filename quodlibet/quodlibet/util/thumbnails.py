@@ -8,13 +8,17 @@
 
 import os
 import hashlib
+import threading
+from collections import OrderedDict
 
 from gi.repository import GdkPixbuf, GLib
 from senf import fsn2uri, fsnative, gettempdir
 
 import quodlibet
+from quodlibet import config
 from quodlibet.util.path import mtime, mkdir, xdg_get_cache_home
 from quodlibet.util import enum
+from quodlibet.util.dprint import print_d
 from quodlibet.qltk.image import scale
 
 
@@ -177,3 +181,119 @@ def get_thumbnail(path, boundary):
         pass
 
     return scale(thumb_pb, boundary)
+
+
+class PixbufCache(object):
+    """Maps keys to pixbufs, dropping the least recently used ones once the
+    pixel data of all of them exceeds `max_bytes`.
+
+    Keeps counts of hits, misses and evictions. Thread-safe.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _get_size(pixbuf):
+        return pixbuf.get_rowstride() * pixbuf.get_height()
+
+    def get(self, key):
+        """Returns the pixbuf stored for key or None"""
+
+        with self._lock:
+            pixbuf = self._entries.pop(key, None)
+            if pixbuf is None:
+                self.misses += 1
+                return
+            self._entries[key] = pixbuf
+            self.hits += 1
+            return pixbuf
+
+    def put(self, key, pixbuf):
+        """Stores a pixbuf, unless it alone is larger than the budget"""
+
+        size = self._get_size(pixbuf)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self._get_size(old)
+            self._entries[key] = pixbuf
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                key, old = self._entries.popitem(last=False)
+                self.bytes -= self._get_size(old)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        """Returns a dict with the number of entries, bytes, hits, misses
+        and evictions
+        """
+
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes,
+                    "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+_pixbuf_cache = None
+_pixbuf_cache_lock = threading.Lock()
+
+
+def get_pixbuf_cache():
+    """Returns the process wide PixbufCache, with a budget of
+    ``albumart.pixbuf_cache_size`` MiB
+    """
+
+    global _pixbuf_cache
+
+    with _pixbuf_cache_lock:
+        if _pixbuf_cache is None:
+            size = config.getint("albumart", "pixbuf_cache_size", 32)
+            _pixbuf_cache = PixbufCache(max(size, 0) * 1024 * 1024)
+        return _pixbuf_cache
+
+
+def get_cached_thumbnail_from_file(fileobj, boundary):
+    """Like get_thumbnail_from_file() but returns the same pixbuf again as
+    long as the file and the boundary stay the same.
+
+    The pixbufs returned should not be modified. Thread-safe.
+    """
+
+    path = fileobj.name
+    # embedded images come from temporary files which don't get reused
+    if not isinstance(path, fsnative) or path.startswith(gettempdir()):
+        return get_thumbnail_from_file(fileobj, boundary)
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return get_thumbnail_from_file(fileobj, boundary)
+
+    cache = get_pixbuf_cache()
+    key = (path, stat.st_mtime, stat.st_size, tuple(boundary))
+    pixbuf = cache.get(key)
+    if pixbuf is None:
+        pixbuf = get_thumbnail_from_file(fileobj, boundary)
+        if pixbuf is not None:
+            cache.put(key, pixbuf)
+            if cache.misses % 100 == 0:
+                print_d("Pixbuf cache: %r" % cache.get_stats())
+    return pixbuf
@@ -75,6 +75,7 @@ class TCommands(TestCase):
         self.__send("quit")
         self.__send("random album")
         self.__send("refresh")
+        self.__send("generate-thumbnails")
         self.__send("repeat 0")
         self.__send("set-browser 1")
         self.__send("set-rating 0.5")
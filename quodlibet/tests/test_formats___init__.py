@@ -15,7 +15,7 @@ from .helper import capture_output
 
 from quodlibet import formats
 from quodlibet.formats import AudioFile, load_audio_files, dump_audio_files, \
-    SerializationError
+    load_audio_files_many, SerializationError
 from quodlibet.compat import PY3, long
 from quodlibet.util.picklehelper import pickle_dumps
 from quodlibet import config
@@ -177,6 +177,44 @@ class TPickle(TestCase):
         for v1, v2 in zip(sorted(new[0].values()), sorted(fixed.values())):
             assert type(v1) is type(v2)
 
+    def test_load_shares_tags(self):
+        songs = [AudioFile({
+            "~filename": fsnative(u"file%d" % i),
+            "~mountpoint": fsnative(u"/"),
+            "genre": u"Rock",
+            "title": u"title",
+            "~#samplerate": 44100,
+        }) for i in range(2)]
+
+        first, second = load_audio_files(dump_audio_files(songs))
+        assert dict(first) == dict(songs[0])
+        assert dict(second) == dict(songs[1])
+        for key in second:
+            assert key in first
+            assert [k for k in first if k == key][0] is key
+        assert first["genre"] is second["genre"]
+        assert first["~#samplerate"] is second["~#samplerate"]
+        assert first["~mountpoint"] is second["~mountpoint"]
+
+    def test_load_normalized(self):
+        songs = [AudioFile({
+            "~filename": fsnative(u"file%d" % i),
+            "~mountpoint": fsnative(u"/"),
+            "genre": u"Rock",
+            "~#samplerate": 44100,
+        }) for i in range(2)]
+
+        datas = [dump_audio_files([s], process=False) for s in songs]
+        first, second = [load_audio_files(d, normalized=True)[0]
+                         for d in datas]
+        assert type(first) is AudioFile
+        assert dict(first) == dict(songs[0])
+        assert dict(second) == dict(songs[1])
+        for key in second:
+            assert [k for k in first if k == key][0] is key
+        assert first["genre"] is second["genre"]
+        assert first["~mountpoint"] is second["~mountpoint"]
+
     def test_dump_audio_files(self):
         data = dump_audio_files(self.instances, process=False)
         items = load_audio_files(data, process=False)
@@ -220,6 +258,16 @@ class TPickle(TestCase):
             self.assertEqual(len(items), len(formats.types) - 1)
             assert all(isinstance(i, AudioFile) for i in items)
 
+    def test_load_audio_files_many(self):
+        datas = [pickle_dumps([i], 2) for i in self.instances]
+        datas.append(b"nope")
+        result = load_audio_files_many(datas)
+        self.assertEqual(len(result), len(self.instances) + 1)
+        self.assertTrue(result[-1] is None)
+        for items, instance in zip(result, self.instances):
+            self.assertEqual(len(items), 1)
+            self.assertTrue(type(items[0]) is type(instance))
+
     def test_unpickle_random_class(self):
         for protocol in [0, 1, 2]:
             data = pickle_dumps([42], protocol)
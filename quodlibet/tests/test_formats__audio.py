@@ -14,7 +14,8 @@ from senf import fsnative, fsn2text, bytes2fsn, mkstemp, mkdtemp
 from quodlibet import config
 from quodlibet.compat import PY2, text_type, long, listkeys, PY3
 from quodlibet.formats import AudioFile, types as format_types, AudioFileError
-from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT
+from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT, share_key, \
+    share_value, share_tags, get_memo_stats, reset_memo_stats
 from quodlibet.formats import decode_value, MusicFile, FILESYSTEM_TAGS
 from quodlibet.util.tags import _TAGS as TAGS
 from quodlibet.util.path import normalize_path, mkdir, get_home_dir, unquote, \
@@ -1001,6 +1002,101 @@ class TAudioFormats(TestCase):
                 pass
 
 
+class Tshare(TestCase):
+
+    def test_share_key(self):
+        key = u"".join([u"arti", u"st"])
+        self.assertEqual(share_key(key), u"artist")
+        self.assertIs(share_key(u"".join([u"arti", u"st"])), share_key(key))
+
+    def test_share_value_types(self):
+        self.assertIs(share_value(1.0), share_value(1.0))
+        self.assertTrue(isinstance(share_value(1), int))
+        self.assertTrue(isinstance(share_value(1.0), float))
+        self.assertTrue(isinstance(share_value(True), bool))
+
+    def test_share_tags(self):
+        song = AudioFile({u"".join([u"gen", u"re"]): u"".join([u"Ro", u"ck"]),
+                          u"title": u"".join([u"Ro", u"ck"])})
+        share_tags(song)
+        key = [k for k in song if k == u"genre"][0]
+        self.assertIs(key, share_key(u"genre"))
+        self.assertIs(song[u"genre"], share_value(u"Rock"))
+        self.assertIsNot(song[u"title"], song[u"genre"])
+
+        # already shared keys are kept
+        other = AudioFile()
+        dict.update(other, [(key, u"Pop")])
+        share_tags(other)
+        self.assertIs([k for k in other][0], key)
+
+    def test_setitem(self):
+        a = AudioFile()
+        b = AudioFile()
+        a["genre"] = u"".join([u"Ro", u"ck"])
+        b["genre"] = u"".join([u"Ro", u"ck"])
+        self.assertIs(a["genre"], b["genre"])
+        a["title"] = u"".join([u"Ro", u"ck"])
+        self.assertIsNot(a["title"], b["genre"])
+
+
+class TMemo(TestCase):
+
+    def setUp(self):
+        reset_memo_stats()
+        self.song = AudioFile({"artist": u"foo", "performer": u"bar",
+                               "tracknumber": u"2/3"})
+
+    def tearDown(self):
+        reset_memo_stats()
+
+    def test_stats(self):
+        self.assertEqual(get_memo_stats(), (0, 0, 0.0))
+        self.song("~people")
+        self.song("~people")
+        self.song("~people")
+        # ~people includes ~performers
+        self.assertEqual(get_memo_stats(), (2, 2, 0.5))
+        reset_memo_stats()
+        self.assertEqual(get_memo_stats(), (0, 0, 0.0))
+
+    def test_not_memoized(self):
+        self.song("~#playcount")
+        self.song("~#playcount")
+        self.song("~artist~~#playcount")
+        self.song("~playlists")
+        self.assertEqual(get_memo_stats()[:2], (0, 0))
+
+    def test_tied(self):
+        self.assertEqual(self.song("~artist~~#track"), u"foo - 2")
+        self.assertEqual(self.song("~artist~~#track"), u"foo - 2")
+        self.assertEqual(get_memo_stats()[:2], (1, 2))
+
+    def test_arguments(self):
+        song = AudioFile({"artist": u"foo", "title": u"bar"})
+        self.assertEqual(song("~artist~title"), u"foo - bar")
+        self.assertEqual(song("~artist~title", connector=u"/"), u"foo/bar")
+        self.assertEqual(song("~#track", 0), 0)
+        self.assertEqual(song("~#track"), u"")
+        self.assertEqual(song("~#track", []), [])
+
+    def test_invalidate(self):
+        song = self.song
+        self.assertEqual(song("~people"), u"foo\nbar")
+        song["artist"] = u"baz"
+        self.assertEqual(song("~people"), u"baz\nbar")
+        del song["performer"]
+        self.assertEqual(song("~people"), u"baz")
+        song.update({"composer": u"x"})
+        self.assertEqual(song("~people"), u"baz\nx")
+        song.pop("composer")
+        self.assertEqual(song("~people"), u"baz")
+        song.setdefault("conductor", u"y")
+        self.assertEqual(song("~people"), u"baz\ny")
+        song.clear()
+        self.assertEqual(song("~people"), u"")
+
+
 class Tdecode_value(TestCase):
 
     def test_main(self):
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import time
+import shutil
+
+from tests import TestCase, mkdtemp, get_data_path
+
+from quodlibet.formats import MusicFile, TagCache, init_tag_cache, \
+    get_tag_cache
+from quodlibet.formats import _tagcache
+
+
+class TTagCache(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.db = os.path.join(self.dir, "cache", "tags.sqlite")
+        self.filename = os.path.join(self.dir, "a.ogg")
+        shutil.copy(get_data_path("silence-44-s.ogg"), self.filename)
+        self._age(self.filename)
+
+    def tearDown(self):
+        TagCache.install()
+        shutil.rmtree(self.dir)
+
+    def _age(self, filename):
+        old = time.time() - 3600
+        os.utime(filename, (old, old))
+
+    def test_get_put(self):
+        cache = TagCache(self.db)
+        self.assertEqual(cache.get(self.filename), None)
+        song = MusicFile(self.filename)
+        cache.put(self.filename, song)
+        cached = cache.get(self.filename)
+        self.assertEqual(type(cached), type(song))
+        self.assertEqual(cached("title"), song("title"))
+        self.assertEqual(cached("~filename"), song("~filename"))
+        self.assertEqual(cached("~#length"), song("~#length"))
+        cache.close()
+
+    def test_persists(self):
+        cache = TagCache(self.db)
+        cache.put(self.filename, MusicFile(self.filename))
+        cache.close()
+        self.assertTrue(TagCache(self.db).get(self.filename))
+
+    def test_changed(self):
+        cache = TagCache(self.db)
+        song = MusicFile(self.filename)
+        cache.put(self.filename, song)
+        song["title"] = u"changed"
+        song.write()
+        self.assertEqual(cache.get(self.filename), None)
+        self._age(self.filename)
+        self.assertEqual(cache.get(self.filename), None)
+        cache.close()
+
+    def test_recent_not_stored(self):
+        cache = TagCache(self.db)
+        os.utime(self.filename, None)
+        cache.put(self.filename, MusicFile(self.filename))
+        self.assertEqual(cache.get(self.filename), None)
+        cache.close()
+
+    def test_other_version(self):
+        cache = TagCache(self.db)
+        cache.put(self.filename, MusicFile(self.filename))
+        cache.close()
+
+        old = _tagcache.FORMAT
+        _tagcache.FORMAT = old + 1
+        try:
+            self.assertEqual(TagCache(self.db).get(self.filename), None)
+        finally:
+            _tagcache.FORMAT = old
+
+    def test_prune(self):
+        other = os.path.join(self.dir, "b.ogg")
+        shutil.copy(self.filename, other)
+        self._age(other)
+        cache = TagCache(self.db)
+        for path in [self.filename, other]:
+            cache.put(path, MusicFile(path))
+        os.rename(other, other + ".moved")
+        self.assertEqual(cache.prune(), 1)
+        self.assertTrue(cache.get(self.filename))
+
+        cache.MAX_ENTRIES = 0
+        self.assertEqual(cache.prune(), 1)
+        self.assertEqual(cache.get(self.filename), None)
+        cache.close()
+
+    def test_invalid_file(self):
+        os.makedirs(os.path.dirname(self.db))
+        with open(self.db, "wb") as fileobj:
+            fileobj.write(b"nope" * 1000)
+        cache = TagCache(self.db)
+        self.assertEqual(cache.get(self.filename), None)
+        cache.put(self.filename, MusicFile(self.filename))
+        self.assertTrue(cache.get(self.filename))
+        cache.close()
+
+    def test_music_file(self):
+        init_tag_cache(self.db)
+        song = MusicFile(self.filename)
+        self.assertTrue(get_tag_cache().get(self.filename))
+        song["title"] = u"cached"
+        song.write()
+        self._age(self.filename)
+        self.assertEqual(MusicFile(self.filename)("title"), u"cached")
+        self.assertEqual(MusicFile(self.filename)("title"), u"cached")
+        self.assertTrue(get_tag_cache().get(self.filename))
+
+    def test_music_file_missing(self):
+        init_tag_cache(self.db)
+        self.assertEqual(
+            MusicFile(os.path.join(self.dir, "nope.ogg")), None)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import time
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.query import Query
+
+
+def AF(name, **kwargs):
+    song = AudioFile({"~filename": fsnative(u"/" + name), "title": name})
+    for key, value in kwargs.items():
+        song["~#" + key] = value
+    return song
+
+
+class TNumericColumns(TestCase):
+
+    def setUp(self):
+        config.init()
+        now = time.time()
+        self.library = SongLibrary()
+        self.songs = [
+            AF(u"a", playcount=3, rating=1.0, length=200),
+            AF(u"b", playcount=12, length=400, added=now - 60),
+            AF(u"c", rating=0.25, lastplayed=now - 3 * 24 * 60 * 60),
+            AF(u"d", playcount=20, rating=0.75, length=100.5),
+        ]
+        self.library.add(self.songs)
+        self.columns = self.library.numeric_columns
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertQuery(self, text):
+        query = Query(text)
+        expected = set(filter(query.search, self.songs))
+        self.assertEqual(set(query.filter(self.library)), expected)
+        return expected
+
+    def test_get_column(self):
+        column = self.columns.get_column("~#playcount")
+        values = dict(zip(self.columns.songs, column))
+        self.assertEqual(values[self.songs[0]], 3)
+        # defaults to 0 like in AudioFile.__call__
+        self.assertEqual(values[self.songs[2]], 0)
+        column = self.columns.get_column("~#added")
+        values = dict(zip(self.columns.songs, column))
+        self.assertEqual(values[self.songs[0]], 0)
+
+    def test_rating_default(self):
+        column = self.columns.get_column("~#rating")
+        values = dict(zip(self.columns.songs, column))
+        self.assertEqual(values[self.songs[1]], config.RATINGS.default)
+
+    def test_filter(self):
+        for text in [u"#(playcount > 10)", u"#(playcount = 0)",
+                     u"#(playcount != 12)", u"#(rating >= 0.75)",
+                     u"#(rating < 0.5)", u"#(added < 1 hour ago)",
+                     u"#(lastplayed > 2 days)", u"#(length < 3 minutes)",
+                     u"#(length * 2 > playcount + 500)",
+                     u"#(length / 0 > 1)", u"#(-playcount < -5)",
+                     u"!#(playcount > 10)", u"#(1 < 2)", u"#(2 < 1)",
+                     u"&(#(playcount > 1), #(rating > 0.5))",
+                     u"|(#(playcount > 15), #(rating < 0.5))",
+                     u"&(#(playcount > 1), title=b)",
+                     u"|(#(playcount > 15), title=a)",
+                     u"#(skipcount < 3)", u"#(playcount:avg > 3)"]:
+            self.assertQuery(text)
+
+    def test_filter_exact(self):
+        query = Query(u"#(playcount > 10)")
+        self.assertEqual(set(query.filter(self.library)),
+                         {self.songs[1], self.songs[3]})
+
+    def test_changed(self):
+        self.assertQuery(u"#(playcount > 10)")
+        self.songs[0]["~#playcount"] = 50
+        self.library.changed([self.songs[0]])
+        self.assertEqual(len(self.assertQuery(u"#(playcount > 10)")), 3)
+
+    def test_added_removed(self):
+        self.assertQuery(u"#(playcount > 10)")
+        self.library.remove([self.songs[1]])
+        self.songs.remove(self.songs[1])
+        self.assertEqual(len(self.assertQuery(u"#(playcount > 10)")), 1)
+        new = [AF(u"e", playcount=11), AF(u"f", playcount=30)]
+        self.library.add(new)
+        self.songs.extend(new)
+        self.assertEqual(len(self.assertQuery(u"#(playcount > 10)")), 3)
+        self.assertEqual(len(self.columns.songs), 5)
+
+    def test_sort_func(self):
+        other = AF(u"x", playcount=7)
+        songs = self.songs + [other]
+        for tag in [u"~#playcount", u"~#rating", u"~#length"]:
+            expected = sorted(songs, key=AudioFile.sort_by_func(tag))
+            self.assertEqual(
+                sorted(songs, key=self.columns.get_sort_func(tag)),
+                expected)
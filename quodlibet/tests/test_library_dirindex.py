@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import shutil
+
+from senf import fsnative
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.library import dirindex
+from quodlibet.library.dirindex import DirectoryIndex
+from quodlibet.util.thread import Cancellable
+
+
+class TDirectoryIndex(TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(mkdtemp())
+        self.sub = os.path.join(self.root, fsnative(u"sub"))
+        os.mkdir(self.sub)
+        self.touch(os.path.join(self.root, fsnative(u"a")))
+        self.touch(os.path.join(self.sub, fsnative(u"b")))
+        self.index = DirectoryIndex()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def touch(self, path):
+        with open(path, "wb"):
+            pass
+        # make sure the mtime changes, even with a coarse resolution
+        dirname = os.path.dirname(path)
+        mtime = os.stat(dirname).st_mtime + 10
+        os.utime(dirname, (mtime, mtime))
+
+    def walk(self, exclude=[], failed=[]):
+        seen = {}
+        listed = []
+        orig_list_dir = dirindex._list_dir
+
+        def list_dir(path):
+            listed.append(path)
+            return orig_list_dir(path)
+
+        dirindex._list_dir = list_dir
+        try:
+            found = list(self.index.walk(
+                Cancellable(), [self.root], exclude, seen=seen))
+        finally:
+            dirindex._list_dir = orig_list_dir
+        self.index.update(seen, exclude, failed=failed)
+        self.listed = sorted(listed)
+        return sorted(found)
+
+    def test_unchanged(self):
+        found = self.walk()
+        self.assertEqual(len(found), 2)
+        self.assertEqual(len(self.listed), 2)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.walk(), found)
+        self.assertEqual(self.listed, [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_failed(self):
+        b = os.path.join(self.sub, fsnative(u"b"))
+        self.walk(failed=[b])
+        self.assertEqual(len(self.index), 1)
+        self.walk()
+        self.assertEqual(self.listed, [self.sub])
+
+    def test_forget(self):
+        self.walk()
+        self.index.forget([os.path.join(self.sub, fsnative(u"b"))])
+        self.assertTrue(self.index.dirty)
+        self.walk()
+        self.assertEqual(self.listed, [self.sub])
+
+    def test_changed_dir(self):
+        self.walk()
+        self.touch(os.path.join(self.sub, fsnative(u"c")))
+        self.assertEqual(
+            self.walk(),
+            [os.path.join(self.root, fsnative(u"a")),
+             os.path.join(self.sub, fsnative(u"b")),
+             os.path.join(self.sub, fsnative(u"c"))])
+        self.assertEqual(self.listed, [self.sub])
+
+    def test_new_dir(self):
+        self.walk()
+        new = os.path.join(self.sub, fsnative(u"new"))
+        os.mkdir(new)
+        self.touch(os.path.join(new, fsnative(u"d")))
+        self.assertTrue(os.path.join(new, fsnative(u"d")) in self.walk())
+        self.assertEqual(len(self.index), 3)
+
+    def test_removed_dir(self):
+        self.walk()
+        shutil.rmtree(self.sub)
+        self.walk()
+        self.assertEqual(len(self.index), 1)
+
+    def test_exclude_changed(self):
+        self.walk()
+        self.assertEqual(
+            self.walk(exclude=[self.sub]),
+            [os.path.join(self.root, fsnative(u"a"))])
+        self.assertEqual(len(self.walk()), 2)
+
+    def test_hidden(self):
+        hidden = os.path.join(self.root, fsnative(u".hidden"))
+        os.mkdir(hidden)
+        self.touch(os.path.join(hidden, fsnative(u"e")))
+        self.touch(os.path.join(self.root, fsnative(u".f")))
+        self.assertEqual(len(self.walk()), 2)
+
+    def test_many_dirs(self):
+        expected = [os.path.join(self.root, fsnative(u"a")),
+                    os.path.join(self.sub, fsnative(u"b"))]
+        path = self.sub
+        for i in range(50):
+            path = os.path.join(path, fsnative(u"%d" % i))
+            os.mkdir(path)
+            for name in [u"x", u"y"]:
+                other = os.path.join(path, fsnative(name))
+                os.mkdir(other)
+                self.touch(os.path.join(other, fsnative(u"c")))
+                expected.append(os.path.join(other, fsnative(u"c")))
+        self.assertEqual(self.walk(), sorted(expected))
+        self.assertEqual(len(self.index), 152)
+
+    def test_symlinks(self):
+        if not hasattr(os, "symlink"):
+            return
+        os.symlink(self.sub, os.path.join(self.root, fsnative(u"dir")))
+        os.symlink(os.path.join(self.sub, fsnative(u"b")),
+                   os.path.join(self.root, fsnative(u"file")))
+        b = os.path.join(self.sub, fsnative(u"b"))
+        self.assertEqual(self.walk().count(b), 2)
+
+    def test_cancel(self):
+        cancellable = Cancellable()
+        cancellable.cancel()
+        self.assertEqual(
+            list(self.index.walk(cancellable, [self.root])), [])
+
+    def test_save_load(self):
+        self.walk()
+        self.assertTrue(self.index.dirty)
+        temp = mkdtemp()
+        try:
+            filename = os.path.join(temp, fsnative(u"index"))
+            self.index.save(filename)
+            self.assertFalse(self.index.dirty)
+
+            self.index = DirectoryIndex()
+            self.index.load(filename)
+        finally:
+            shutil.rmtree(temp)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(len(self.walk()), 2)
+        self.assertEqual(self.listed, [])
+
+    def test_load_invalid(self):
+        filename = os.path.join(self.root, fsnative(u"index"))
+        with open(filename, "wb") as h:
+            h.write(b"foo")
+        self.index.load(filename)
+        self.assertEqual(len(self.index), 0)
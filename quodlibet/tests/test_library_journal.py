@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import shutil
+
+from senf import fsnative
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.formats import AudioFile, dump_audio_files
+from quodlibet.library.journal import Journal, replay, journal_path, \
+    compacting_path, read_records, OP_UPDATE, OP_REMOVE
+
+
+def _song(name, **kwargs):
+    song = AudioFile(kwargs)
+    song["~filename"] = fsnative(name)
+    return song
+
+
+class TJournal(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, fsnative(u"songs"))
+        self.items = [_song(u"/a"), _song(u"/b"), _song(u"/c")]
+        with open(self.filename, "wb") as h:
+            h.write(dump_audio_files(self.items))
+        self.journal = Journal(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _replay(self):
+        contents = dict((i.key, i) for i in self.items)
+        replay(self.filename, contents)
+        return contents
+
+    def _keys(self, contents):
+        return sorted(contents.keys())
+
+    def test_replay_empty(self):
+        self.assertEqual(self._keys(self._replay()), [u"/a", u"/b", u"/c"])
+
+    def test_append_replay(self):
+        self.journal.append([_song(u"/d"), _song(u"/a", title=u"x")], [])
+        self.journal.append([], [fsnative(u"/b")])
+        contents = self._replay()
+        self.assertEqual(self._keys(contents), [u"/a", u"/c", u"/d"])
+        self.assertEqual(contents[u"/a"]("title"), u"x")
+
+    def test_records(self):
+        self.journal.append([_song(u"/d")], [fsnative(u"/a")])
+        records = list(read_records(journal_path(self.filename)))
+        self.assertEqual([r[0] for r in records], [OP_UPDATE, OP_REMOVE])
+        self.assertEqual(records[-1][2], self.journal.size)
+
+    def test_truncated(self):
+        self.journal.append([_song(u"/d")], [])
+        valid_size = self.journal.size
+        self.journal.append([_song(u"/e")], [])
+        with open(self.journal.path, "rb+") as h:
+            h.truncate(self.journal.size - 3)
+
+        contents = self._replay()
+        self.assertEqual(
+            self._keys(contents), [u"/a", u"/b", u"/c", u"/d"])
+        # the broken tail is gone, so new records can be read again
+        self.assertEqual(self.journal.size, valid_size)
+        self.journal.append([_song(u"/f")], [])
+        contents = self._replay()
+        self.assertEqual(
+            self._keys(contents), [u"/a", u"/b", u"/c", u"/d", u"/f"])
+
+    def test_rotate(self):
+        self.journal.append([_song(u"/d")], [])
+        self.journal.rotate()
+        self.assertFalse(os.path.exists(self.journal.path))
+        self.assertTrue(os.path.exists(compacting_path(self.filename)))
+        self.journal.append([], [fsnative(u"/d")])
+        self.assertEqual(
+            self._keys(self._replay()),
+            [u"/a", u"/b", u"/c"])
+
+        # failed compaction, the new journal gets merged into the old one
+        self.journal.rotate()
+        self.assertFalse(os.path.exists(self.journal.path))
+        self.assertEqual(
+            len(list(read_records(compacting_path(self.filename)))), 2)
+
+        self.journal.finish_compaction()
+        self.assertFalse(os.path.exists(compacting_path(self.filename)))
+
+    def test_needs_compaction(self):
+        self.assertFalse(self.journal.needs_compaction())
+        self.journal.COMPACT_MIN_SIZE = 0
+        self.journal.append([_song(u"/d")] * 10, [])
+        self.assertTrue(self.journal.needs_compaction())
+
+    def test_clear(self):
+        self.journal.append([_song(u"/d")], [])
+        self.journal.rotate()
+        self.journal.append([_song(u"/e")], [])
+        self.journal.clear()
+        self.assertEqual(os.listdir(self.dir), [u"songs"])
@@ -13,7 +13,7 @@ from senf import fsnative
 from quodlibet.formats import AudioFileError
 from quodlibet import config
 from quodlibet.util import connect_obj, is_windows
-from quodlibet.formats import AudioFile
+from quodlibet.formats import AudioFile, dump_audio_files
 from quodlibet.compat import text_type, iteritems, iterkeys, itervalues
 
 from tests import TestCase, get_data_path, mkstemp, mkdtemp, skipIf
@@ -257,6 +257,12 @@ def FakeAudioFileRange(*args):
     return list(map(FakeAudioFile, range(*args)))
 
 
+class FakeRenameAudioFile(FakeAudioFile):
+
+    def rename(self, newname):
+        self["~filename"] = newname
+
+
 class TPicklingMixin(TestCase):
 
     class PicklingMockLibrary(PicklingMixin, Library):
@@ -314,6 +320,149 @@ class TPicklingMixin(TestCase):
             os.unlink(filename)
 
 
+class TPicklingLibraryJournal(TestCase):
+
+    def setUp(self):
+        self.temp = mkdtemp()
+        self.filename = os.path.join(self.temp, fsnative(u"songs"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def _reload(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        return library
+
+    def test_only_changes_get_written(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        library.add(FakeAudioFileRange(10))
+        library.save()
+        size = os.path.getsize(self.filename)
+
+        song = library[fsnative(u"3")]
+        song["title"] = u"foo"
+        library.changed([song])
+        library.remove([library[fsnative(u"5")]])
+        library.add([FakeAudioFile(42)])
+        library.save()
+
+        self.assertEqual(os.path.getsize(self.filename), size)
+        self.assertTrue(os.path.exists(self.filename + ".journal"))
+
+        other = self._reload()
+        self.assertEqual(len(other), 10)
+        self.assertFalse(fsnative(u"5") in other)
+        self.assertTrue(fsnative(u"42") in other)
+        self.assertEqual(other[fsnative(u"3")]("title"), u"foo")
+        library.destroy()
+        other.destroy()
+
+    def test_rename(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        song = FakeRenameAudioFile(1)
+        library.add([song])
+        library.save()
+        library.rename(song, fsnative(u"2"))
+        library.save()
+
+        other = self._reload()
+        self.assertEqual(list(other.keys()), [fsnative(u"2")])
+        library.destroy()
+        other.destroy()
+
+    def test_file_library_lazy(self):
+        library = SongFileLibrary()
+        songs = FakeAudioFileRange(10)
+        for song in songs:
+            song["~mountpoint"] = fsnative(u"/")
+        library.add(songs)
+        library.save(self.filename)
+        library.destroy()
+
+        library = SongFileLibrary()
+        library.load(self.filename)
+        self.assertEqual(len(library), 10)
+        self.assertEqual(library._contents.pending, 10)
+        self.assertTrue(fsnative(u"3") in library)
+        self.assertEqual(library[fsnative(u"3")].key, fsnative(u"3"))
+        self.assertEqual(library._contents.pending, 9)
+        self.assertEqual(len(list(library.values())), 10)
+        self.assertEqual(library._contents.pending, 0)
+        library.destroy()
+
+    def test_compact(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        library.add(FakeAudioFileRange(10))
+        library.save()
+        library.add([FakeAudioFile(42)])
+        library.save()
+        library.compact()
+        library._compacting.join()
+
+        self.assertFalse(os.path.exists(self.filename + ".journal"))
+        self.assertFalse(os.path.exists(self.filename + ".journal.old"))
+        self.assertEqual(len(self._reload()), 11)
+        library.destroy()
+
+    def test_compact_copies(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        library.add(FakeAudioFileRange(10))
+        library.save()
+        library.compact()
+        # changes after this point don't end up in the compacted file
+        library[fsnative(u"3")]["title"] = u"foo"
+        library._compacting.join()
+
+        other = self._reload()
+        self.assertEqual(other[fsnative(u"3")].get("title"), None)
+        library.destroy()
+        other.destroy()
+
+    def test_changed_not_in_library(self):
+        library = SongLibrary()
+        library.load(self.filename)
+        library.add(FakeAudioFileRange(3))
+        library.save()
+        # like playlists do
+        library.emit("changed", [FakeAudioFile(42), AudioFile()])
+        library.save()
+
+        other = self._reload()
+        self.assertEqual(len(other), 3)
+        self.assertFalse(fsnative(u"42") in other)
+        library.destroy()
+        other.destroy()
+
+    def test_migrate(self):
+        songs = FakeAudioFileRange(10)
+        for song in songs:
+            song["~mountpoint"] = fsnative(u"/")
+        # libraries used to be a single pickled list
+        with open(self.filename, "wb") as h:
+            h.write(dump_audio_files(songs))
+
+        library = SongFileLibrary()
+        library.load(self.filename)
+        self.assertEqual(len(library), 10)
+        self.assertTrue(library.dirty)
+        library.save()
+        library._compacting.join()
+        self.assertFalse(library._migrate)
+        library.destroy()
+
+        library = SongFileLibrary()
+        library.load(self.filename)
+        self.assertTrue(library._contents.normalized)
+        self.assertFalse(library.dirty)
+        self.assertEqual(library._contents.pending, 10)
+        library.destroy()
+
+
 class TSongLibrary(TLibrary):
     Fake = FakeSong
     Frange = staticmethod(FSrange)
@@ -526,6 +675,49 @@ class TSongFileLibrary(TSongLibrary):
         finally:
             os.unlink(filename)
 
+    def test_scan_workers(self):
+        dir_ = mkdtemp()
+        try:
+            for i in range(60):
+                shutil.copy(get_data_path('empty.ogg'),
+                            os.path.join(dir_, fsnative(u"%d.ogg" % i)))
+            for workers in [1, 2]:
+                library = self.Library()
+                for value in library.scan([dir_], workers=workers):
+                    pass
+                self.assertEqual(len(library), 60)
+                self.assertTrue(library.contains_filename(
+                    os.path.join(dir_, fsnative(u"42.ogg"))))
+                library.destroy()
+        finally:
+            shutil.rmtree(dir_)
+
+    def test_scan_not_in_library(self):
+        dir_ = os.path.realpath(mkdtemp())
+        try:
+            filename = os.path.join(dir_, fsnative(u"a.ogg"))
+            with open(filename, "wb") as h:
+                h.write(b"not yet")
+            mtime = os.stat(dir_).st_mtime - 10
+            os.utime(dir_, (mtime, mtime))
+            for value in self.library.scan([dir_]):
+                pass
+            self.assertFalse(self.library.contains_filename(filename))
+
+            # the file got completed, the directory didn't change
+            shutil.copy(get_data_path('empty.ogg'), filename)
+            os.utime(dir_, (mtime, mtime))
+            for value in self.library.scan([dir_]):
+                pass
+            self.assertTrue(self.library.contains_filename(filename))
+
+            self.library.remove([self.library.get_filename(filename)])
+            for value in self.library.scan([dir_]):
+                pass
+            self.assertTrue(self.library.contains_filename(filename))
+        finally:
+            shutil.rmtree(dir_)
+
     def test_add_filename_normalize_path(self):
         if not os.name == "nt":
             return
@@ -684,6 +876,40 @@ class TAlbumLibrarySignals(TestCase):
         self.failUnlessEqual(self.received,
             ["added", "a_added", "changed", "a_changed"])
 
+    def test_change_album(self):
+        songs = [AlbumSong(1, "a1"), AlbumSong(2, "a1"), AlbumSong(4, "a2")]
+        self.lib.add(songs)
+        old_key = songs[0].album_key
+        songs[0]["album"] = songs[0]["labelid"] = "a2"
+        self.lib.changed(songs[:1])
+        self.failUnlessEqual(self.received,
+            ["added", "a_added", "changed", "a_changed"])
+        self.failUnlessEqual(self.albums[old_key].songs, {songs[1]})
+        self.failUnlessEqual(
+            self.albums[songs[0].album_key].songs, {songs[0], songs[2]})
+
+    def test_change_album_swap(self):
+        songs = [AlbumSong(1, "a1"), AlbumSong(4, "a2")]
+        self.lib.add(songs)
+        songs[0]["album"] = songs[0]["labelid"] = "a2"
+        songs[1]["album"] = songs[1]["labelid"] = "a1"
+        self.lib.changed(songs)
+        self.failUnlessEqual(self.received,
+            ["added", "a_added", "changed", "a_changed"])
+        for song in songs:
+            self.failUnlessEqual(self.albums[song.album_key].songs, {song})
+
+    def test_change_album_new(self):
+        songs = [AlbumSong(1, "a1"), AlbumSong(4, "a2")]
+        self.lib.add(songs)
+        old_key = songs[0].album_key
+        songs[0]["album"] = songs[0]["labelid"] = "a3"
+        self.lib.changed(songs[:1])
+        self.failUnlessEqual(self.received,
+            ["added", "a_added", "changed", "a_removed", "a_added"])
+        self.failIf(old_key in self.albums)
+        self.failUnlessEqual(len(self.albums), 2)
+
     def tearDown(self):
         for s in self._asigs:
             self.albums.disconnect(s)
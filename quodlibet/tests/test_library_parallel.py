@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from tests import TestCase
+from .helper import capture_output
+
+from quodlibet.library import parallel
+
+
+class FailingMultiprocessing(object):
+
+    @staticmethod
+    def get_context(method):
+        raise NotImplementedError
+
+
+def collect(finished_lists):
+    results = []
+    for finished in finished_lists:
+        for chunk, future in finished:
+            results.append((chunk, future.result()))
+    return sorted(results)
+
+
+class Titer_map(TestCase):
+
+    CHUNKS = [[1], [1, 2], [1, 2, 3], [1, 2, 3, 4]]
+    RESULTS = [([1], 1), ([1, 2], 2), ([1, 2, 3], 3), ([1, 2, 3, 4], 4)]
+
+    def test_thread(self):
+        results = collect(parallel.iter_map(len, self.CHUNKS, 1))
+        self.assertEqual(results, self.RESULTS)
+
+    def test_processes(self):
+        results = collect(parallel.iter_map(len, self.CHUNKS, 2))
+        self.assertEqual(results, self.RESULTS)
+
+    def test_no_process_pool(self):
+        old = parallel.multiprocessing
+        parallel.multiprocessing = FailingMultiprocessing
+        try:
+            with capture_output():
+                results = collect(parallel.iter_map(len, self.CHUNKS, 2))
+        finally:
+            parallel.multiprocessing = old
+        self.assertEqual(results, self.RESULTS)
+
+    def test_error(self):
+        for workers in [1, 2]:
+            for finished in parallel.iter_map(len, [None, None], workers):
+                for chunk, future in finished:
+                    self.assertRaises(TypeError, future.result)
+
+    def test_close(self):
+        for workers in [1, 2]:
+            gen = parallel.iter_map(len, self.CHUNKS * 10, workers)
+            next(gen)
+            gen.close()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.library.querycache import is_cacheable
+from quodlibet.query import Query
+
+
+def AF(name, **kwargs):
+    kwargs["~filename"] = fsnative(u"/" + name)
+    return AudioFile(kwargs)
+
+
+class TQueryCache(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.songs = [
+            AF(u"a", artist=u"foo", title=u"one"),
+            AF(u"b", artist=u"bar", title=u"two"),
+            AF(u"c", artist=u"foo", title=u"three"),
+        ]
+        self.library.add(self.songs)
+        self.cache = self.library.query_cache
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertQuery(self, text):
+        query = Query(text)
+        expected = set(filter(query.search, self.library))
+        self.assertEqual(set(query.filter(self.library)), expected)
+        return expected
+
+    def test_is_cacheable(self):
+        for text in [u"foo", u"artist=foo", u"#(playcount > 3)",
+                     u"&(foo, !#(date < 2000))", u"~people=foo",
+                     u"#(rating > 0.5)"]:
+            self.assertTrue(is_cacheable(Query(text)._match), msg=text)
+        for text in [u"#(added < 2 days ago)", u"#(lastplayed > today)",
+                     u"~playlists=foo", u"~lyrics=foo", u"~rating=foo",
+                     u"|(foo, #(now > 3))"]:
+            self.assertFalse(is_cacheable(Query(text)._match), msg=text)
+
+    def test_hit(self):
+        query = Query(u"artist=foo")
+        self.assertEqual(len(query.filter(self.library)), 2)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache.get(Query(u"artist=foo ")),
+                         {self.songs[0], self.songs[2]})
+        self.assertEqual(self.cache.get(Query(u"artist=foo", ["title"])),
+                         None)
+        self.assertEqual(self.cache.get(Query(u"artist=bar")), None)
+
+    def test_hit_is_new_list(self):
+        query = Query(u"artist=foo")
+        key = lambda s: s.key
+        miss = query.filter(self.library)
+        hit = query.filter(self.library)
+        self.assertTrue(isinstance(hit, list))
+        self.assertEqual(sorted(hit, key=key), sorted(miss, key=key))
+        del hit[:]
+        self.assertEqual(len(query.filter(self.library)), 2)
+
+    def test_not_cacheable(self):
+        Query(u"#(added < 2 days ago)").filter(self.library)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_updated(self):
+        self.assertQuery(u"artist=foo")
+        new = AF(u"d", artist=u"foo")
+        self.library.add([new])
+        self.assertEqual(self.cache.get(Query(u"artist=foo")),
+                         {self.songs[0], self.songs[2], new})
+        self.songs[0]["artist"] = u"bar"
+        self.library.changed([self.songs[0]])
+        self.assertEqual(len(self.assertQuery(u"artist=foo")), 2)
+        self.library.remove([new])
+        self.assertEqual(self.cache.get(Query(u"artist=foo")),
+                         {self.songs[2]})
+
+    def test_lru(self):
+        for i in range(self.cache.MAX_ENTRIES + 1):
+            Query(u"title=%d" % i).filter(self.library)
+            Query(u"title=0").filter(self.library)
+        self.assertEqual(len(self.cache), self.cache.MAX_ENTRIES)
+        self.assertTrue(self.cache.get(Query(u"title=0")) is not None)
+        self.assertTrue(self.cache.get(Query(u"title=1")) is None)
+
+    def test_many_changes(self):
+        self.assertQuery(u"artist=foo")
+        songs = [AF(u"x%d" % i, artist=u"foo")
+                 for i in range(self.cache.MAX_CHECKS + 1)]
+        self.library.add(songs)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(len(self.assertQuery(u"artist=foo")), len(songs) + 2)
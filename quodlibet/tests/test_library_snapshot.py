@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import sys
+import shutil
+
+from senf import fsnative
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.formats import AudioFile, SerializationError, \
+    dump_audio_files
+from quodlibet.library import snapshot
+from quodlibet.library.snapshot import dump_snapshot, load_snapshot, \
+    LazyContents
+from quodlibet.util.picklehelper import pickle_dumps
+
+
+def _song(name, mountpoint=u"/"):
+    song = AudioFile({"title": name})
+    song["~filename"] = fsnative(u"/" + name)
+    song["~mountpoint"] = fsnative(mountpoint)
+    return song
+
+
+class TSnapshot(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, fsnative(u"songs"))
+        self.songs = [_song(u"a"), _song(u"b", u"/mnt"), _song(u"c")]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, items, records=None):
+        with open(self.filename, "wb") as h:
+            dump_snapshot(h, items, records)
+
+    def _write_v1(self, items):
+        # like version 1 wrote them, converted for Python 2
+        with open(self.filename, "wb") as h:
+            h.write(snapshot._HEADER.pack(
+                snapshot.MAGIC, 1, sys.version_info[0]))
+            index = []
+            for item in items:
+                data = dump_audio_files([item])
+                index.append((item.key, 0, h.tell(), len(data)))
+                h.write(data)
+            offset = h.tell()
+            h.write(pickle_dumps(([fsnative(u"/")], index), 2))
+            h.write(snapshot._TRAILER.pack(offset, snapshot.MAGIC))
+
+    def test_normalized(self):
+        self._write(self.songs)
+        contents = load_snapshot(self.filename)
+        self.assertTrue(contents.normalized)
+        self.assertEqual(contents[fsnative(u"/a")]("title"), u"a")
+
+    def test_migrate_v1(self):
+        songs = [_song(u"a"), _song(u"b")]
+        self._write_v1(songs)
+        contents = load_snapshot(self.filename)
+        self.assertFalse(contents.normalized)
+        self.assertEqual(contents[fsnative(u"/a")]("title"), u"a")
+
+        self._write(contents.loaded(), contents.records())
+        contents = load_snapshot(self.filename)
+        self.assertTrue(contents.normalized)
+        self.assertEqual(contents.pending, 2)
+        for song in songs:
+            self.assertEqual(dict(contents[song.key]), dict(song))
+
+    def test_migrate_broken_record(self):
+        records = [(fsnative(u"/x"), fsnative(u"/"), b"nope", False)]
+        self._write(self.songs[:1], records)
+        contents = load_snapshot(self.filename)
+        self.assertEqual(list(contents.keys()), [fsnative(u"/a")])
+
+    def test_not_a_snapshot(self):
+        with open(self.filename, "wb") as h:
+            h.write(b"foobar")
+        self.assertTrue(load_snapshot(self.filename) is None)
+
+    def test_truncated(self):
+        self._write(self.songs)
+        with open(self.filename, "rb+") as h:
+            h.truncate(os.path.getsize(self.filename) - 1)
+        self.assertRaises(SerializationError, load_snapshot, self.filename)
+
+    def test_lazy(self):
+        self._write(self.songs)
+        contents = load_snapshot(self.filename)
+        self.assertEqual(len(contents), 3)
+        self.assertEqual(contents.pending, 3)
+        self.assertTrue(fsnative(u"/b") in contents)
+        self.assertEqual(contents.mountpoint(fsnative(u"/b")), u"/mnt")
+        self.assertEqual(contents.pending, 3)
+
+        self.assertEqual(contents[fsnative(u"/b")]("title"), u"b")
+        self.assertEqual(contents.pending, 2)
+        self.assertEqual(contents.mountpoint(fsnative(u"/b")), u"/mnt")
+        self.assertEqual(len(contents.loaded()), 1)
+
+        self.assertEqual(
+            sorted(s("title") for s in contents.values()),
+            [u"a", u"b", u"c"])
+        self.assertEqual(contents.pending, 0)
+
+    def test_modify(self):
+        self._write(self.songs)
+        contents = load_snapshot(self.filename)
+        del contents[fsnative(u"/a")]
+        self.assertEqual(contents.pop(fsnative(u"/c"))("title"), u"c")
+        contents[fsnative(u"/d")] = _song(u"d")
+        self.assertEqual(
+            sorted(contents.keys()), [fsnative(u"/b"), fsnative(u"/d")])
+        self.assertRaises(KeyError, contents.__getitem__, fsnative(u"/a"))
+        self.assertTrue(contents.get(fsnative(u"/a")) is None)
+
+    def test_records_roundtrip(self):
+        self._write(self.songs)
+        contents = load_snapshot(self.filename)
+        contents[fsnative(u"/a")]["title"] = u"new"
+        self._write(contents.loaded(), contents.records())
+
+        contents = load_snapshot(self.filename)
+        self.assertEqual(contents.pending, 3)
+        self.assertEqual(
+            sorted(s("title") for s in contents.values()),
+            [u"b", u"c", u"new"])
+
+    def test_empty(self):
+        self._write([])
+        contents = load_snapshot(self.filename)
+        self.assertEqual(len(contents), 0)
+        self.assertEqual(list(contents.values()), [])
+        self.assertEqual(len(LazyContents()), 0)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.library.sortkeys import is_cacheable
+
+
+def AF(name, **kwargs):
+    kwargs["~filename"] = fsnative(u"/" + name)
+    return AudioFile(kwargs)
+
+
+class TSortKeys(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.library = SongLibrary()
+        self.songs = [
+            AF(u"a", artist=u"foo", title=u"one"),
+            AF(u"b", artist=u"Bar", title=u"two"),
+            AF(u"c", artist=u"baz", title=u"three"),
+        ]
+        self.library.add(self.songs)
+        self.keys = self.library.sort_keys
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def assertSorted(self, tag):
+        songs = sorted(self.library, key=self.keys.get_sort_func(tag))
+        expected = sorted(self.library, key=AudioFile.sort_by_func(tag))
+        self.assertEqual(songs, expected)
+        return songs
+
+    def test_is_cacheable(self):
+        self.assertTrue(is_cacheable("artist"))
+        self.assertTrue(is_cacheable("~#playcount"))
+        self.assertFalse(is_cacheable("~playlists"))
+        self.assertFalse(is_cacheable("~lyrics"))
+        self.assertFalse(is_cacheable(lambda song: song("artist")))
+
+    def test_sort(self):
+        self.assertEqual(
+            [s("artist") for s in self.assertSorted("artist")],
+            [u"Bar", u"baz", u"foo"])
+        self.assertSorted("artist")
+        self.assertSorted("~title~artist")
+        self.assertSorted("~#playcount")
+
+    def test_cached(self):
+        song = self.songs[0]
+        func = self.keys.get_sort_func("artist")
+        key = func(song)
+        # changes without a signal aren't noticed
+        song["artist"] = u"aaa"
+        self.assertIs(func(song), key)
+
+    def test_changed(self):
+        song = self.songs[0]
+        self.assertSorted("artist")
+        song["artist"] = u"aaa"
+        self.library.changed([song])
+        self.assertEqual(self.assertSorted("artist")[0], song)
+
+    def test_removed(self):
+        song = self.songs[0]
+        func = self.keys.get_sort_func("artist")
+        key = func(song)
+        self.library.remove([song])
+        song["artist"] = u"aaa"
+        self.assertNotEqual(func(song), key)
+
+    def test_not_in_library(self):
+        song = AF(u"d", artist=u"aaa")
+        func = self.keys.get_sort_func("artist")
+        self.assertEqual(func(song), AudioFile.sort_by_func("artist")(song))
+
+    def test_destroy(self):
+        self.keys.get_sort_func("artist")(self.songs[0])
+        self.library.destroy()
+        self.library.changed(self.songs)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet.formats import AudioFile
+from quodlibet.library.libraries import SongLibrary
+from quodlibet.query import Query
+
+
+def AF(filename, **kwargs):
+    kwargs["~filename"] = fsnative(filename)
+    kwargs["~#length"] = len(filename)
+    return AudioFile(kwargs)
+
+
+class TTagIndex(TestCase):
+
+    def setUp(self):
+        self.library = SongLibrary()
+        self.songs = [
+            AF(u"/a", title=u"Jóga", artist=u"Björk"),
+            AF(u"/b", title=u"Hyperballad", artist=u"Björk"),
+            AF(u"/c", title=u"Army of Me", artist=u"Bjork Guðmundsdóttir"),
+            AF(u"/d", title=u"Dancing Queen", artist=u"ABBA"),
+            AF(u"/e", title=u"Mamma Mia", artist=u"ABBA",
+               album=u"Arrival"),
+            AF(u"/f", title=u"Knowing Me, Knowing You", artist=u"ABBA"),
+        ]
+        self.library.add(self.songs)
+        self.index = self.library.tag_index
+
+    def tearDown(self):
+        self.library.destroy()
+
+    def assertQuery(self, text):
+        query = Query(text)
+        expected = set(filter(query.search, self.songs))
+        self.assertEqual(set(query.filter(self.library)), expected)
+        return expected
+
+    def test_lookup(self):
+        self.assertEqual(
+            self.index.lookup("artist", u"bjo"), set(self.songs[:3]))
+        self.assertEqual(
+            self.index.lookup("title", u"me, kn"), {self.songs[5]})
+        self.assertEqual(
+            self.index.lookup("title", u"g queen"), {self.songs[3]})
+        self.assertEqual(self.index.lookup("title", u"xyz"), set())
+        # too short to be looked up
+        self.assertTrue(self.index.lookup("title", u"a") is None)
+
+    def test_lookup_is_folded(self):
+        self.assertEqual(
+            self.index.lookup("artist", u"BJÖRK"), set(self.songs[:3]))
+        self.assertEqual(
+            self.index.lookup("artist", u"gudmund"), {self.songs[2]})
+
+    def test_filter(self):
+        for text in [u"bjork", u"Jóga", u"me", u"artist=abba",
+                     u"artist=abba, title=mia", u"title=/^Dan/",
+                     u"|(artist=bjo, title=queen)", u"&(abba, !mia)",
+                     u"album=arr", u"album=xxx", u"#(length < 3)",
+                     u"artist=/b+a/", u"army of", u"~filename=b",
+                     u"title=!me", u"artist=\"ABBA\"c"]:
+            self.assertQuery(text)
+
+    def test_filter_uses_index(self):
+        self.assertEqual(self.assertQuery(u"artist=bjo"),
+                         set(self.songs[:3]))
+        self.assertTrue("artist" in self.index._tags)
+
+    def test_changed(self):
+        self.assertQuery(u"title=queen")
+        song = self.songs[3]
+        song["title"] = u"Waterloo"
+        self.library.changed([song])
+        self.assertEqual(self.assertQuery(u"title=queen"), set())
+        self.assertEqual(self.assertQuery(u"title=water"), {song})
+
+    def test_added_removed(self):
+        self.assertQuery(u"artist=abba")
+        new = AF(u"/g", title=u"Fernando", artist=u"ABBA")
+        self.library.add([new])
+        self.songs.append(new)
+        self.assertQuery(u"artist=abba")
+        self.library.remove([self.songs[4]])
+        self.songs.remove(self.songs[4])
+        self.assertEqual(len(self.assertQuery(u"artist=abba")), 3)
+
+    def test_stale(self):
+        self.index.lookup("artist", u"abba")
+        for i in range(1000 // len(self.songs)):
+            self.library.changed(self.songs)
+        self.assertFalse(self.index._tags)
+        self.assertQuery(u"artist=abba")
+
+    def test_library_query_sorted(self):
+        for text in [u"artist=abba", u"bjo", u""]:
+            songs = self.library.query(text)
+            self.assertEqual(songs, sorted(songs, key=lambda s: s.key))
+            self.assertEqual(self.library.query(text), songs)
+        self.assertEqual(len(self.library.query(u"")), 6)
@@ -8,10 +8,12 @@
 
 import os
 import sys
+import json
+import shutil
 
 from senf import fsnative, path2fsn, environ
 
-from tests import TestCase, get_data_path, mkstemp
+from tests import TestCase, get_data_path, mkstemp, mkdtemp
 from .helper import capture_output, get_temp_copy
 
 from quodlibet import config
@@ -161,6 +163,43 @@ class TOperonPrint(TOperonBase):
         self.check_false(["print", "-p", "<title>", self.f],
                          False, True)
 
+    def test_json(self):
+        o, e = self.check_true(
+            ["print", "--json", "-p", "<title>", self.f, self.f], True, False)
+        lines = [json.loads(line) for line in o.splitlines()]
+        self.assertEqual(
+            lines, [{"file": self.f, "output": "Silence"}] * 2)
+
+    def test_recursive(self):
+        dir_ = mkdtemp()
+        try:
+            sub = os.path.join(dir_, "sub")
+            os.mkdir(sub)
+            shutil.copy(self.f, os.path.join(dir_, "b.ogg"))
+            shutil.copy(self.f2, os.path.join(sub, "a.mp3"))
+            with open(os.path.join(dir_, "c.txt"), "wb"):
+                pass
+
+            o, e = self.check_true(
+                ["print", "-r", "-p", "<~basename>", dir_], True, False)
+            self.assertEqual(o.splitlines(), ["b.ogg", "a.mp3"])
+
+            # without -r the directory can't be loaded
+            self.check_false(["print", dir_], False, True)
+        finally:
+            shutil.rmtree(dir_)
+
+    def test_jobs(self):
+        paths = [self.f, self.f2] * 5
+        o, e = self.check_true(
+            ["print", "-j", "2", "-p", "<~basename>"] + paths, True, False)
+        self.assertEqual(o.splitlines(),
+                         [os.path.basename(p) for p in paths])
+
+        o, e = self.check_false(
+            ["print", "-j", "2", self.f3, self.f2], True, True)
+        self.assertTrue("Quod Libet Test Data" in o)
+
 
 class TOperonRemove(TOperonBase):
     # [--dry-run] <tag> [-e <pattern> | <value>] <file> [<files>]
@@ -281,6 +320,121 @@ class TOperonSet(TOperonBase):
         self.failUnlessEqual(self.s["artist"], "foobar")
 
 
+class TOperonJournal(TOperonBase):
+    # [-j N] [status | resume | rollback] <journal>
+
+    def setUp(self):
+        super(TOperonJournal, self).setUp()
+        fd, self.journal = mkstemp(".journal")
+        os.close(fd)
+        os.unlink(self.journal)
+
+    def tearDown(self):
+        if os.path.exists(self.journal):
+            os.unlink(self.journal)
+        super(TOperonJournal, self).tearDown()
+
+    def test_misc(self):
+        self.check_true(["journal", "-h"], True, False)
+        self.check_false(["journal", "status"], False, True)
+        self.check_false(["journal", "status", self.journal], False, True)
+
+    def test_set_rollback(self):
+        old_artist = self.s["artist"]
+        self.check_true(["set", "--journal", self.journal, "-j", "2",
+                         "artist", "foo", self.f, self.f2], False, False)
+        for song in [self.s, self.s2]:
+            song.reload()
+            self.assertEqual(song["artist"], "foo")
+
+        # an existing journal doesn't get reused
+        self.check_false(["set", "--journal", self.journal,
+                          "artist", "bar", self.f], False, True)
+
+        o, e = self.check_true(
+            ["journal", "status", self.journal], True, False)
+        self.assertEqual(o.count("written"), 2)
+
+        self.check_true(
+            ["journal", "rollback", self.journal], False, False)
+        self.s.reload()
+        self.assertEqual(self.s["artist"], old_artist)
+
+        # nothing left to roll back
+        self.check_true(
+            ["journal", "rollback", self.journal], False, False)
+        o, e = self.check_true(
+            ["journal", "status", self.journal], True, False)
+        self.assertEqual(o.count("rolled back"), 2)
+
+    def test_resume(self):
+        self.check_true(["clear", "--journal", self.journal, "-a", self.f],
+                        False, False)
+        self.s.reload()
+        self.assertFalse(self.s.realkeys())
+
+        # pretend the write never happened
+        with open(self.journal, "rb") as h:
+            plan = h.readlines()[0]
+        with open(self.journal, "wb") as h:
+            h.write(plan)
+        self.check_true(["journal", "rollback", self.journal], False, False)
+        self.s.reload()
+        self.assertFalse(self.s.realkeys())
+
+        self.check_true(["journal", "resume", self.journal], False, False)
+        self.check_true(["journal", "rollback", self.journal], False, False)
+        self.s.reload()
+        self.assertEqual(self.s["title"], "Silence")
+
+    def test_rollback_changed_tags(self):
+        self.check_true(["set", "--journal", self.journal,
+                         "artist", "foo", self.f], False, False)
+        self.check_true(["set", "artist", "bar", self.f], False, False)
+        self.check_false(
+            ["journal", "rollback", self.journal], False, True)
+        self.s.reload()
+        self.assertEqual(self.s["artist"], "bar")
+        o, e = self.check_true(
+            ["journal", "status", self.journal], True, False)
+        self.assertFalse("rolled back" in o)
+
+    def test_rollback_changed_file(self):
+        self.check_true(["set", "--journal", self.journal,
+                         "artist", "foo", self.f], False, False)
+        with open(self.journal, "rb") as h:
+            self.assertEqual(
+                json.loads(h.readlines()[-1].decode("utf-8"))["mtime"],
+                os.stat(self.f).st_mtime)
+        mtime = os.stat(self.f).st_mtime
+        os.utime(self.f, (mtime - 10, mtime - 10))
+        self.check_false(
+            ["journal", "rollback", self.journal], False, True)
+        self.s.reload()
+        self.assertEqual(self.s["artist"], "foo")
+
+    def test_resume_changed_tags(self):
+        self.check_true(["set", "--journal", self.journal,
+                         "artist", "foo", self.f], False, False)
+        with open(self.journal, "rb") as h:
+            plan = h.readlines()[0]
+        with open(self.journal, "wb") as h:
+            h.write(plan)
+        self.check_true(["set", "artist", "bar", self.f], False, False)
+        self.check_false(["journal", "resume", self.journal], False, True)
+        self.s.reload()
+        self.assertEqual(self.s["artist"], "bar")
+
+    def test_fill(self):
+        self.check_true(["fill", "--journal", self.journal, "<title>",
+                         self.f], False, False)
+        self.s.reload()
+        self.assertNotEqual(self.s["title"], "Silence")
+        self.check_true(["journal", "rollback", self.journal], False, False)
+        self.s.reload()
+        self.assertEqual(self.s["title"], "Silence")
+
+
 class TOperonCopy(TOperonBase):
     # [--dry-run] [--ignore-errors] <source> <dest>
 
@@ -446,6 +600,15 @@ class TOperonList(TOperonBase):
         lines = d.splitlines()
         self.assertTrue("a\\:bc\\\\\\:" in lines)
 
+    def test_json(self):
+        self.check_false(["list", "-r", self.f], False, True)
+        o, e = self.check_true(
+            ["list", "--json", self.f, self.f2], True, False)
+        lines = [json.loads(line) for line in o.splitlines()]
+        self.assertEqual([line["file"] for line in lines], [self.f, self.f2])
+        self.assertEqual(lines[0]["tags"]["title"], ["Silence"])
+        self.assertFalse("~#length" in lines[0]["tags"])
+
 
 class TOperonTags(TOperonBase):
     # [-t] [-c <c1>,<c2>...]
@@ -479,6 +642,11 @@ class TOperonTags(TOperonBase):
         assert "tracknumber" in o
         assert "replaygain_album_gain" in o
 
+    def test_json(self):
+        o, e = self.check_true(["tags", "--json"], True, False)
+        tags = [json.loads(line)["tag"] for line in o.splitlines()]
+        self.assertTrue("tracknumber" in tags)
+
 
 class TOperonImageExtract(TOperonBase):
     # [--dry-run] [--primary] [-d <destination>] <file> [<files>]
@@ -669,3 +837,13 @@ class TOperonFill(TOperonBase):
 
         self.assertTrue("title" in o)
         self.assertTrue(self.s("~basename") in o)
+
+    def test_preview_json(self):
+        basename = self.s("~basename")
+        o, e = self.check_true(
+            ["fill", "--dry-run", "--json", "<title>", self.f, self.f],
+            True, False)
+        title = os.path.splitext(basename)[0]
+        lines = [json.loads(line) for line in o.splitlines()]
+        self.assertEqual(
+            lines, [{"file": self.f, "tags": {"title": title}}] * 2)
@@ -13,6 +13,7 @@ from tests import TestCase
 from quodlibet.formats import AudioFile
 from quodlibet.pattern import (FileFromPattern, XMLFromPattern, Pattern,
     XMLFromMarkupPattern, ArbitraryExtensionFileFromPattern)
+from quodlibet.pattern._pattern import PatternFormatter, _compile
 
 
 class _TPattern(TestCase):
@@ -581,3 +582,69 @@ class TPatternFormatList(_TPattern):
     def test_string(s):
         pat = Pattern('display')
         s.assertEqual(pat.format_list(s.a), {("display", "display")})
+
+
+class TPatternFormatMany(_TPattern):
+
+    def _songs(self):
+        return [self.a, self.b, self.c, self.e, self.f, self.g]
+
+    def test_same(self):
+        for kind in [Pattern, FileFromPattern, XMLFromPattern]:
+            for string in ["<artist> - <title>", "<~#track>",
+                           "<tracknumber|<tracknumber>. >x<~basename>"]:
+                pat = kind(string)
+                songs = self._songs()
+                self.assertEqual(pat.format_many(songs),
+                                 [pat.format(s) for s in songs])
+                # remembered results
+                self.assertEqual(pat.format_many(songs),
+                                 [pat.format(s) for s in songs])
+
+    def _is_remembered(self, pat, song):
+        return pat._memo_key in song.memo.get(PatternFormatter, {})
+
+    def test_empty(self):
+        self.assertEqual(Pattern("<title>").format_many([]), [])
+
+    def test_changed(self):
+        pat = Pattern("<title>")
+        self.assertEqual(pat.format_many([self.a]), [u"Title5"])
+        self.assertTrue(self._is_remembered(pat, self.a))
+        self.a["title"] = u"Foo"
+        self.assertEqual(pat.format_many([self.a]), [u"Foo"])
+        del self.a["title"]
+        self.assertEqual(pat.format_many([self.a]), [u"a.mp3 [Unknown]"])
+
+    def test_not_cached(self):
+        for string in ["<~#rating>", "<~title~playlists>",
+                       "<artist=Artist|x|y>"]:
+            pat = Pattern(string)
+            pat.format_many([self.a])
+            self.assertFalse(self._is_remembered(pat, self.a))
+
+    def test_key(self):
+        # recompiled patterns share the results, other kinds don't
+        pat = Pattern("<title>")
+        pat.format_many([self.a])
+        other = PatternFormatter(*_compile("<title>", None)[:3],
+                                 cacheable=True, source="<title>")
+        self.assertEqual(other._memo_key, pat._memo_key)
+        self.assertTrue(self._is_remembered(other, self.a))
+        self.assertFalse(
+            self._is_remembered(XMLFromPattern("<title>"), self.a))
+
+    def test_max_patterns(self):
+        max_patterns = PatternFormatter.MAX_MEMO_PATTERNS
+        for i in range(max_patterns * 3):
+            pat = Pattern("<title>%d" % i)
+            self.assertEqual(pat.format_many([self.a]), [u"Title5%d" % i])
+            self.assertTrue(self._is_remembered(pat, self.a))
+            self.assertTrue(
+                len(self.a.memo[PatternFormatter]) <= max_patterns)
+
+    def test_query_changed(self):
+        pat = Pattern("<artist=Artist|x|y>")
+        self.assertEqual(pat.format_many([self.a]), [u"x"])
+        self.a["artist"] = u"Foo"
+        self.assertEqual(pat.format_many([self.a]), [u"y"])
@@ -170,6 +170,25 @@ class TSongList(TestCase):
 
         self.assertEqual(self.songlist.get_songs(), [song] * 4)
 
+    def test_add_songs_sorted(self):
+        def AF(name, **kwargs):
+            kwargs["~filename"] = fsnative(u"/" + name)
+            return AudioFile(kwargs)
+
+        songs = [AF(str(i), artist=a, title=t) for i, (a, t) in enumerate(
+            [(u"b", u"2"), (u"a", u"9"), (u"c", u"1"), (u"a", u"3")])]
+        self.songlist.set_column_headers(["artist", "title"])
+        self.songlist.set_sort_orders([("title", False), ("artist", True)])
+        self.songlist.set_songs(songs[:2])
+
+        self.songlist.add_songs(songs[2:])
+        expected = list(songs)
+        self.songlist._sort_songs(expected)
+        self.assertEqual(self.songlist.get_songs(), expected)
+        self.assertEqual([s("artist") for s in expected],
+                         [u"c", u"b", u"a", u"a"])
+        self.assertEqual(expected[2]("title"), u"3")
+
     def test_header_menu(self):
         from quodlibet import browsers
         from quodlibet.library import SongLibrary, SongLibrarian
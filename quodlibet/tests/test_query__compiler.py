@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import time
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet.query import Query
+from quodlibet.query._compiler import compile_node
+from quodlibet.query._match import Node, Inter, Union, Neg, True_, False_
+from quodlibet.formats import AudioFile
+from quodlibet.util.collection import Collection
+
+
+class Fake(Node):
+
+    def __init__(self, result):
+        self.result = result
+        self.searched = []
+
+    def search(self, data):
+        self.searched.append(data)
+        return self.result
+
+
+class TCompileNode(TestCase):
+
+    def setUp(self):
+        now = time.time()
+        self.songs = [
+            AudioFile({
+                "artist": u"piman", "title": u"Quuxly",
+                "album": u"I Hate: Tests", "date": u"2007-05-24",
+                "~filename": fsnative(u"/dir1/foobar.ogg"),
+                "~#length": 224, "~#playcount": 24, "~#skipcount": 13,
+                "~#lastplayed": now - 24 * 60 * 60}),
+            AudioFile({
+                "artist": u"mu", "title": u"Rockin' Out",
+                "album": u"Foo the Bar", "tracknumber": u"12/15",
+                "~filename": fsnative(u"/dir2/something.mp3")}),
+            AudioFile({
+                "artist": u"piman\nmu", "title": u"Ångström",
+                "~filename": fsnative(u"/test/\xf6\xe4\xfc/fo\xfc.ogg"),
+                "~mountpoint": fsnative(u"/bla/\xf6\xe4\xfc/fo\xfc"),
+                "~#length": 0, "date": u"2011"}),
+        ]
+
+    def assertSame(self, text):
+        query = Query(text)
+        func = compile_node(query._match)
+        for song in self.songs:
+            self.assertEqual(
+                func(song), bool(query._match.search(song)), msg=text)
+
+    def test_same_result(self):
+        for text in [
+                u"piman", u"foo bar", u"!piman", u"Angstrom",
+                u"artist=piman", u"artist=!piman", u"t=/^Q/",
+                u"artist=|(piman, mu)", u"artist=&(pi, man)",
+                u"|(artist=mu, title=quux)", u"&(artist=mu, title=rock)",
+                u"!&(artist=mu, title=rock)", u"|(&(mu, rock), !piman)",
+                u"filename=foobar", u"~dirname=dir2", u"mountpoint=bla",
+                u"~people=piman", u"album=\"Foo the Bar\"c",
+                u"#(length > 100)", u"#(length < 3 minutes)",
+                u"#(playcount * 2 > skipcount + 30)", u"#(-length < -10)",
+                u"#(playcount / 0 > 1)", u"#(length / 0 < 1)",
+                u"#(date > 2010)", u"#(date < 2008-01-01)",
+                u"#(lastplayed < 2 days ago)", u"#(lastplayed > today)",
+                u"#(1 < 2)", u"#(2 < 1)", u"#(now > today)",
+                u"&(#(length > 100), artist=pi)", u"|()", u"&()"]:
+            self.assertSame(text)
+
+    def test_collection(self):
+        album = Collection()
+        album.songs = self.songs[:2]
+        for text in [u"artist=mu", u"#(playcount > 10)", u"title=quux"]:
+            query = Query(text)
+            self.assertEqual(compile_node(query._match)(album),
+                             bool(query._match.search(album)))
+
+    def test_unknown_node(self):
+        fake = Fake(True)
+        func = compile_node(Inter([fake, Neg(Fake(False))]))
+        self.assertTrue(func(42))
+        self.assertEqual(fake.searched, [42])
+
+    def test_short_circuit(self):
+        fake = Fake(True)
+        self.assertFalse(compile_node(Inter([False_(), fake]))(1))
+        self.assertTrue(compile_node(Union([True_(), fake]))(1))
+        self.assertTrue(compile_node(Union([Inter([False_(), fake]),
+                                            True_()]))(1))
+        self.assertEqual(fake.searched, [])
+
+    def test_deeply_nested(self):
+        node = True_()
+        for i in range(60):
+            node = Inter([Union([node, False_()]), True_()])
+        self.assertTrue(compile_node(node)(None))
+
+
+class TQueryCompiled(TestCase):
+
+    def test_search_filter(self):
+        song = AudioFile({"artist": u"foo", "~#length": 10})
+        query = Query(u"&(artist=foo, #(length > 5))")
+        self.assertTrue(query.search(song))
+        self.assertEqual(query.filter([song, AudioFile()]), [song])
+        self.assertTrue(query.search is query.search)
@@ -11,9 +11,10 @@ import unicodedata
 
 from tests import TestCase
 
-from quodlibet.unisearch import compile
+from quodlibet.unisearch import compile, fold, get_literals
 from quodlibet.unisearch.db import diacritic_for_letters
-from quodlibet.unisearch.parser import re_replace_literals, re_add_variants
+from quodlibet.unisearch.parser import re_replace_literals, re_add_variants, \
+    get_replacement_mapping
 
 
 class TUniSearch(TestCase):
@@ -166,3 +167,32 @@ class TCompileMatch(TestCase):
 
         with self.assertRaises(ValueError):
             compile(u"(F", asym=True)
+
+
+class TFold(TestCase):
+
+    def test_basics(self):
+        self.assertEqual(fold(u"Björk - Jóga").split(), [u"bjork", u"joga"])
+        self.assertEqual(fold(u"FOO_bar"), u"foo bar")
+        self.assertEqual(fold(u"A\u030a"), fold(u"\u212B"))
+        self.assertEqual(fold(u""), u"")
+
+    def test_matches_replacements(self):
+        # everything an asym literal can match has to fold like it
+        for key, values in get_replacement_mapping().items():
+            for value in values:
+                self.assertEqual(
+                    fold(value).split(), fold(key).split(),
+                    msg=repr((key, value)))
+
+    def test_case(self):
+        for text in [u"ΣΑΣ", u"ıI", u"ÅÄÖ"]:
+            self.assertEqual(fold(text), fold(text.lower()))
+            self.assertEqual(fold(text), fold(text.upper()))
+
+    def test_get_literals(self):
+        self.assertEqual(get_literals(u"foo.*bar"), [u"foo", u"bar"])
+        self.assertEqual(get_literals(u"foo|bar"), [])
+        self.assertEqual(get_literals(u"a(b|c)d"), [u"a", u"d"])
+        self.assertEqual(get_literals(u"o\u0308"), [u"\xf6"])
+        self.assertEqual(get_literals(u"(F"), [])
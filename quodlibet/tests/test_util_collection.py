@@ -16,7 +16,7 @@ from tests import TestCase, mkdtemp
 from quodlibet.formats import AudioFile as Fakesong
 from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT, PEOPLE
 from quodlibet.util.collection import Album, Playlist, avg, bayesian_average, \
-    FileBackedPlaylist
+    FileBackedPlaylist, prefetch
 from quodlibet.library.libraries import FileLibrary
 from quodlibet.util import format_rating
 from quodlibet.compat import long
@@ -258,6 +258,55 @@ class TAlbum(TestCase):
         s.failUnlessEqual(album.comma("c"), "cc3, cc1")
         s.failUnlessEqual(album.comma("~c~b"), "cc3, cc1 - bb1, bb4")
 
+    def test_cache_lru(s):
+        song = Fakesong({"a": "x", "b": "y"})
+        album = Album(song)
+        album.songs = {song}
+        keys = ["k%d" % i for i in range(album._cache_size)]
+        for key in ["a"] + keys:
+            song[key] = key
+            album.get(key)
+        # "a" is the oldest, so it gets dropped once "b" is added
+        song["a"] = "changed"
+        album.get(keys[0])
+        album.get("b")
+        s.failUnlessEqual(album.get("a"), "changed")
+        song[keys[0]] = "changed"
+        s.failUnlessEqual(album.get(keys[0]), keys[0])
+        album.finalize()
+        s.failUnlessEqual(album.get(keys[0]), "changed")
+
+    def test_prefetch(s):
+        songs = [
+            Fakesong({"~#rating": 0.5, "~#playcount": 2, "date": "2005"}),
+            Fakesong({"~#playcount": 3, "date": "2001"}),
+        ]
+        album = Album(songs[0])
+        album.songs = set(songs)
+        other = Album(songs[0])
+        other.songs = set(songs)
+
+        keys = ["~#rating", "~#rating:max", "~#playcount", "~#playcount:avg",
+                "~#year", "~#tracks", "~#lastplayed", "~#foo", "~#foo:sum",
+                "~#playcount:bla", "~people", "date"]
+        prefetch([album], keys)
+        for key in keys:
+            s.failUnlessEqual(album.get(key, None), other.get(key, None))
+        s.failUnlessEqual(album("~#playcount"), 5)
+        s.assertTrue(isinstance(album("~#playcount"), int))
+        s.failUnlessEqual(album("~#year"), 2001)
+
+        # values come from the cache now
+        songs[1]["~#playcount"] = 10
+        s.failUnlessEqual(album("~#playcount"), 5)
+        album.finalize()
+        s.failUnlessEqual(album("~#playcount"), 12)
+
+    def test_prefetch_empty(s):
+        album = Album(Fakesong())
+        prefetch([album], ["~#rating"])
+        s.failUnlessEqual(album("~#rating"), "")
+
     def tearDown(self):
         config.quit()
 
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import shutil
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.formats import AudioFile
+from quodlibet.pattern import Pattern
+from quodlibet.pattern._pattern import PatternFormatter, _XMLFromPattern
+from quodlibet.query import Query
+from quodlibet.util import compilecache
+from quodlibet.util.compilecache import CompileCache
+
+
+class TCompileCache(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, "compiled")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_put(self):
+        cache = CompileCache(self.filename)
+        self.assertEqual(cache.get("a", u"foo"), None)
+        self.assertFalse(cache.dirty)
+        cache.put("a", u"foo", b"bar")
+        self.assertTrue(cache.dirty)
+        self.assertEqual(cache.get("a", u"foo"), b"bar")
+        self.assertEqual(cache.get("b", u"foo"), None)
+
+    def test_save_load(self):
+        cache = CompileCache(self.filename)
+        cache.put("a", u"foo", b"bar")
+        cache.put("a", (u"foo", u"x"), b"")
+        cache.save()
+        self.assertFalse(cache.dirty)
+
+        cache = CompileCache(self.filename)
+        self.assertEqual(cache.get("a", u"foo"), b"bar")
+        self.assertEqual(cache.get("a", (u"foo", u"x")), b"")
+
+    def test_save_not_dirty(self):
+        CompileCache(self.filename).save()
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_other_version(self):
+        cache = CompileCache(self.filename)
+        cache.put("a", u"foo", b"bar")
+        cache.save()
+
+        old = compilecache.FORMAT
+        compilecache.FORMAT = old + 1
+        try:
+            self.assertEqual(CompileCache(self.filename).get("a", u"foo"),
+                             None)
+        finally:
+            compilecache.FORMAT = old
+
+    def test_invalid_file(self):
+        with open(self.filename, "wb") as fileobj:
+            fileobj.write(b"nope")
+        self.assertEqual(CompileCache(self.filename).get("a", u"foo"), None)
+
+    def test_max_entries(self):
+        cache = CompileCache(self.filename)
+        cache.MAX_ENTRIES = 2
+        cache.put("a", u"1", b"1")
+        cache.put("a", u"2", b"2")
+        cache.get("a", u"1")
+        cache.put("a", u"3", b"3")
+        self.assertEqual(cache.get("a", u"2"), None)
+        self.assertEqual(cache.get("a", u"1"), b"1")
+
+
+class TCompileCacheUsers(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        compilecache.init(os.path.join(self.dir, "compiled"))
+        self.song = AudioFile({"artist": u"foo", "title": u"bar",
+                               "~#playcount": 3, "~filename": "/a.ogg"})
+
+    def tearDown(self):
+        compilecache._cache = None
+        shutil.rmtree(self.dir)
+
+    def _reload(self):
+        compilecache.save()
+        compilecache.init(compilecache.get_cache().filename)
+
+    def test_query(self):
+        for string in [u"foo", u"&(artist=foo, #(playcount > 2))",
+                       u"#(playcount + 1 > 3)", u"title=/b.r/d",
+                       u"!artist=\"quux\"", u"&(foo", u"#(playcount > )"]:
+            query = Query(string)
+            self._reload()
+            cached = Query(string)
+            self.assertEqual(repr(cached._match), repr(query._match))
+            self.assertEqual(cached.type, query.type)
+            self.assertEqual(cached.search(self.song),
+                             query.search(self.song))
+            self.assertEqual(Query.StrictQueryMatcher(string) is None,
+                             Query(string, []).type != 1)
+
+    def test_query_star(self):
+        self.assertTrue(Query(u"foo", ["artist"]).search(self.song))
+        self.assertFalse(Query(u"foo", ["title"]).search(self.song))
+
+    def test_query_cached(self):
+        Query(u"artist=foo")
+        self.assertTrue(compilecache.get_cache().dirty)
+        self._reload()
+        Query(u"artist=foo")
+        self.assertFalse(compilecache.get_cache().dirty)
+
+    def test_query_extension_not_cached(self):
+        Query(u"@(nopenope)")
+        self.assertFalse(compilecache.get_cache().dirty)
+
+    def test_pattern(self):
+        for string in [u"<artist> - <title>", u"<title|<title>|<artist>>",
+                       u"<artist=foo|x|y> <~#playcount>"]:
+            for kind in [PatternFormatter, _XMLFromPattern]:
+                pattern = Pattern(string, kind, cache={})
+                self._reload()
+                cached = Pattern(string, kind, cache={})
+                self.assertEqual(cached.format(self.song),
+                                 pattern.format(self.song))
+                self.assertEqual(cached.format_list(self.song),
+                                 pattern.format_list(self.song))
+                self.assertEqual(cached.tags, pattern.tags)
+                self.assertEqual(cached._memo_key, pattern._memo_key)
@@ -8,19 +8,28 @@
 import glob
 import os
 import shutil
+import threading
+import time
 
+import mutagen
+from gi.repository import Gio, GLib
 from senf import fsnative
 
 from quodlibet import config
 from quodlibet.ext.covers.artwork_url import ArtworkUrlCover
-from quodlibet.formats import AudioFile
+from quodlibet.formats import AudioFile, MusicFile
 from quodlibet.plugins import Plugin
 from quodlibet.util.cover.http import escape_query_value
-from quodlibet.util.cover.manager import CoverManager
+from quodlibet.util.cover.manager import CoverManager, AsyncLoader
+from quodlibet.util.cover.embedded import EmbeddedImageCache
+from quodlibet.util.cover.thumbgen import generate_thumbnails, \
+    find_cover_paths
+from quodlibet.util.thread import Cancellable
+from quodlibet.util.thumbnails import get_cache_info
 from quodlibet.util.path import normalize_path, path_equal, mkdir
 from quodlibet.compat import text_type
 
-from tests import TestCase, mkdtemp
+from tests import TestCase, mkdtemp, get_data_path
 
 
 bar_2_1 = AudioFile({
@@ -205,6 +214,52 @@ class TCoverManager(TestCase):
             assert path_equal(
                 actual, f, "\"%s\" should trump \"%s\"" % (f, actual))
 
+    def _age(self, path):
+        old = os.stat(path).st_mtime - 60
+        os.utime(path, (old, old))
+
+    def test_cached(self):
+        f = self.add_file("cover.jpg")
+        covers = self.full_path("covers")
+        os.mkdir(covers)
+        self._age(covers)
+        self._age(self.dir)
+
+        listed = []
+        orig_listdir = os.listdir
+
+        def listdir(path):
+            listed.append(path)
+            return orig_listdir(path)
+
+        os.listdir = listdir
+        try:
+            for i in range(3):
+                assert path_equal(
+                    os.path.abspath(self._find_cover(self.song).name), f)
+            self.assertEqual(len(listed), 2)
+
+            # a new file in a sub directory gets found
+            front = os.path.join(covers, "front cover.jpg")
+            open(front, "wb").close()
+            self._age(covers)
+            assert path_equal(
+                os.path.abspath(self._find_cover(self.song).name), front)
+            self.assertEqual(len(listed), 4)
+
+            # different tags, different scores, but the same listing
+            self.song["labelid"] = "12345"
+            assert path_equal(
+                os.path.abspath(self._find_cover(self.song).name),
+                self.full_path("12345.jpg"))
+            self.assertEqual(len(listed), 4)
+
+            self.manager.cover_changed([self.song])
+            self._find_cover(self.song)
+            self.assertEqual(len(listed), 6)
+        finally:
+            os.listdir = orig_listdir
+
     def test_get_thumbnail(self):
         self.assertTrue(self.manager.get_pixbuf(self.song, 10, 10) is None)
         self.assertTrue(
@@ -221,6 +276,171 @@ class TCoverManager(TestCase):
         assert cover
 
 
+class TEmbeddedImageCache(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, "a.mp3")
+        shutil.copy(get_data_path("silence-44-s.mp3"), self.filename)
+        f = mutagen.File(self.filename)
+        f.tags.add(mutagen.id3.APIC(
+            encoding=3, mime="image/jpeg", type=3, desc="", data=b"foo"))
+        f.save()
+        old = time.time() - 3600
+        os.utime(self.filename, (old, old))
+        self.cache = EmbeddedImageCache(os.path.join(self.dir, "embedded"))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def _get_cover(self):
+        song = MusicFile(self.filename)
+        extracted = []
+        get_primary_image = song.get_primary_image
+
+        def get_image():
+            extracted.append(song)
+            return get_primary_image()
+
+        song.get_primary_image = get_image
+        fileobj = self.cache.get_cover(song)
+        data = None
+        if fileobj is not None:
+            with fileobj:
+                data = fileobj.read()
+        return data, bool(extracted)
+
+    def test_get_cover(self):
+        self.assertEqual(self._get_cover(), (b"foo", True))
+        self.assertEqual(self._get_cover(), (b"foo", False))
+        images = [n for n in os.listdir(os.path.join(self.dir, "embedded"))
+                  if not n.startswith("index")]
+        self.assertEqual(len(images), 1)
+
+    def test_changed(self):
+        self._get_cover()
+        f = mutagen.File(self.filename)
+        f.tags.delall("APIC")
+        f.save()
+        self.assertEqual(self._get_cover(), (None, True))
+
+    def test_recent_not_stored(self):
+        os.utime(self.filename, None)
+        self._get_cover()
+        self.assertEqual(self._get_cover(), (b"foo", True))
+
+    def _images(self):
+        return [n for n in os.listdir(os.path.join(self.dir, "embedded"))
+                if not n.startswith("index")]
+
+    def test_prune(self):
+        self._get_cover()
+        image = self._images()[0]
+        unused = os.path.join(self.dir, "embedded", "0" * 40)
+        with open(unused, "wb") as fileobj:
+            fileobj.write(b"bar")
+        self.assertEqual(self.cache.prune(), 0)
+        self.assertEqual(self._images(), [image])
+
+        os.remove(self.filename)
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(self._images(), [])
+
+    def test_prune_max_size(self):
+        self._get_cover()
+        self.cache.MAX_SIZE = 0
+        self.cache.prune()
+        self.assertEqual(self._images(), [])
+        self.assertEqual(self._get_cover(), (b"foo", True))
+
+
+class TAsyncLoader(TestCase):
+
+    def test_order(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func(key):
+            calls.append(key)
+            if key == "block":
+                started.set()
+                release.wait()
+            return key
+
+        loader = AsyncLoader(func)
+        loader.MAX_WORKERS = 1
+        results = []
+        loader.request("block", ("block",), None, results.append)
+        started.wait()
+
+        cancelled = Gio.Cancellable()
+        cancelled.cancel()
+        loader.request("a", ("a",), None, results.append)
+        loader.request("b", ("b",), cancelled, results.append)
+        loader.request("c", ("c",), None, results.append)
+        loader.request("a", ("a",), Gio.Cancellable(), results.append)
+        release.set()
+        loader._pool.shutdown(wait=True)
+
+        context = GLib.MainContext.default()
+        while context.pending():
+            context.iteration(False)
+
+        # newest first, same keys only once, cancelled ones skipped
+        self.assertEqual(calls, ["block", "a", "c"])
+        self.assertEqual(sorted(results), ["a", "a", "block", "c"])
+
+
+class TThumbGen(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.image = os.path.join(self.dir, "cover.png")
+        shutil.copy(get_data_path("test.png"), self.image)
+        self.thumbs = [get_cache_info(self.image, (s, s))[0]
+                       for s in [128, 256]]
+
+    def tearDown(self):
+        for path in self.thumbs:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(self.dir)
+
+    def _manager(self, covers):
+
+        class Manager(object):
+
+            def get_cover_many(self, songs):
+                path = covers.get(songs[0])
+                return open(path, "rb") if path else None
+
+        return Manager()
+
+    def _albums(self, count):
+
+        class Album(object):
+
+            def __init__(self, songs):
+                self.songs = songs
+
+        return [Album([i]) for i in range(count)]
+
+    def test_find_cover_paths(self):
+        manager = self._manager({0: self.image, 2: self.image})
+        paths = list(
+            find_cover_paths(Cancellable(), manager, self._albums(3)))
+        self.assertEqual(paths, [self.image])
+
+    def test_generate(self):
+        manager = self._manager({0: self.image})
+        for step in generate_thumbnails(manager, self._albums(2), workers=1):
+            pass
+        for path in self.thumbs:
+            self.assertTrue(os.path.exists(path))
+
+
 class THttp(TestCase):
 
     def test_escape(self):
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import time
+import shutil
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.util.sqlitecache import FileCache
+from quodlibet.util.thread import Cancellable
+
+
+class ValueCache(FileCache):
+    NAME = u"value cache"
+    TABLE = "values_"
+    COLUMNS = [("value", "TEXT"), ("count", "INTEGER")]
+    VERSION = u"1"
+
+    def _get_version(self):
+        return self.VERSION
+
+
+class TFileCache(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.db = os.path.join(self.dir, "cache", "values.sqlite")
+        self.files = []
+        for name in ["a", "b", "c"]:
+            path = os.path.join(self.dir, name)
+            with open(path, "wb") as fileobj:
+                fileobj.write(name.encode("ascii"))
+            old = time.time() - 3600
+            os.utime(path, (old, old))
+            self.files.append(path)
+        self.cache = ValueCache(self.db)
+
+    def tearDown(self):
+        self.cache.close()
+        ValueCache.install()
+        shutil.rmtree(self.dir)
+
+    def _store(self, path, value=u"x"):
+        stat = os.stat(path)
+        self.cache.store(path, stat.st_mtime, stat.st_size, (value, 1))
+
+    def _lookup(self, path):
+        return self.cache.lookup(path, os.stat(path))
+
+    def test_store_lookup(self):
+        path = self.files[0]
+        self.assertEqual(self._lookup(path), None)
+        self._store(path)
+        self.assertEqual(self._lookup(path), (u"x", 1))
+        self._store(path, u"y")
+        self.assertEqual(self._lookup(path), (u"y", 1))
+
+    def test_changed(self):
+        path = self.files[0]
+        self._store(path)
+        with open(path, "ab") as fileobj:
+            fileobj.write(b"more")
+        os.utime(path, (0, 0))
+        self.assertEqual(self._lookup(path), None)
+
+    def test_recent_not_stored(self):
+        path = self.files[0]
+        os.utime(path, None)
+        self._store(path)
+        self.assertEqual(self._lookup(path), None)
+
+    def test_other_version(self):
+        self._store(self.files[0])
+        self.cache.close()
+        self.cache = ValueCache(self.db)
+        self.cache.VERSION = u"2"
+        self.assertEqual(self._lookup(self.files[0]), None)
+
+    def test_invalid_file(self):
+        os.makedirs(os.path.dirname(self.db))
+        with open(self.db, "wb") as fileobj:
+            fileobj.write(b"nope" * 1000)
+        self.assertEqual(self._lookup(self.files[0]), None)
+        self._store(self.files[0])
+        self.assertEqual(self._lookup(self.files[0]), (u"x", 1))
+
+    def test_prune_missing(self):
+        for path in self.files:
+            self._store(path)
+        os.remove(self.files[1])
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(self.cache.prune(), 0)
+        self.assertTrue(self._lookup(self.files[0]))
+        self.assertTrue(self._lookup(self.files[2]))
+
+    def test_prune_max_entries(self):
+        for path in self.files:
+            self._store(path)
+        self._store(self.files[0], u"y")
+        self.cache.MAX_ENTRIES = 2
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(self._lookup(self.files[1]), None)
+        self.assertTrue(self._lookup(self.files[0]))
+        self.assertTrue(self._lookup(self.files[2]))
+
+    def test_prune_cancelled(self):
+        self._store(self.files[0])
+        os.remove(self.files[0])
+        cancellable = Cancellable()
+        cancellable.cancel()
+        self.assertEqual(self.cache.prune(cancellable), 0)
+        self.assertEqual(self.cache.prune(), 1)
+
+    def test_install(self):
+        self.assertEqual(ValueCache.get_installed(), None)
+        ValueCache.install(self.db)
+        installed = ValueCache.get_installed()
+        self.assertEqual(installed.filename, self.db)
+        self.assertEqual(FileCache.get_installed(), None)
+        ValueCache.install()
+        self.assertEqual(ValueCache.get_installed(), None)
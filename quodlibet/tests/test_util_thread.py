@@ -13,7 +13,7 @@ from tests import TestCase
 from gi.repository import Gtk
 
 from quodlibet.util.thread import call_async, call_async_background, \
-    Cancellable, terminate_all
+    Cancellable, terminate_all, iter_threaded
 
 
 class Tcall_async(TestCase):
@@ -62,3 +62,44 @@ class Tcall_async(TestCase):
 
     def test_terminate_all(self):
         terminate_all()
+
+
+class Titer_threaded(TestCase):
+
+    def test_main(self):
+        def func(cancellable, count):
+            for i in range(count):
+                yield i, threading.current_thread().name
+
+        values = []
+        for batch in iter_threaded(
+                func, Cancellable(), (25,), batch_size=10):
+            values.extend(batch)
+        self.assertEqual([v[0] for v in values], list(range(25)))
+        main_name = threading.current_thread().name
+        self.assertTrue(all(v[1] != main_name for v in values))
+
+    def test_error(self):
+        def func(cancellable):
+            yield 1
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            list(iter_threaded(func, Cancellable()))
+
+    def test_close(self):
+        stopped = threading.Event()
+
+        def func(cancellable):
+            try:
+                while not cancellable.is_cancelled():
+                    yield 1
+            finally:
+                stopped.set()
+
+        cancellable = Cancellable()
+        gen = iter_threaded(func, cancellable)
+        next(gen)
+        gen.close()
+        self.assertTrue(cancellable.is_cancelled())
+        self.assertTrue(stopped.wait(5))
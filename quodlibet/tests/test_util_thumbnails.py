@@ -115,3 +115,51 @@ class TThumb(TestCase):
         #check rights
         if os.name != "nt":
             s.failUnlessEqual(os.stat(path).st_mode, 33152)
+
+
+class TPixbufCache(TestCase):
+
+    def _pixbuf(self, size):
+        return GdkPixbuf.Pixbuf.new(
+            GdkPixbuf.Colorspace.RGB, True, 8, size, size)
+
+    def test_get_put(self):
+        cache = thumbnails.PixbufCache(1024 * 1024)
+        self.assertTrue(cache.get("a") is None)
+        pb = self._pixbuf(10)
+        cache.put("a", pb)
+        self.assertTrue(cache.get("a") is pb)
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["bytes"], 10 * 10 * 4)
+
+    def test_evict(self):
+        cache = thumbnails.PixbufCache(2 * 10 * 10 * 4)
+        cache.put("a", self._pixbuf(10))
+        cache.put("b", self._pixbuf(10))
+        cache.get("a")
+        cache.put("c", self._pixbuf(10))
+        self.assertTrue(cache.get("b") is None)
+        self.assertTrue(cache.get("a"))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_too_large(self):
+        cache = thumbnails.PixbufCache(10)
+        cache.put("a", self._pixbuf(10))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_cached_thumbnail_from_file(self):
+        filename = get_data_path("test.png")
+        with open(filename, "rb") as h:
+            thumb = thumbnails.get_cached_thumbnail_from_file(h, (50, 60))
+            self.assertTrue(thumb)
+            self.assertTrue(
+                thumbnails.get_cached_thumbnail_from_file(h, (50, 60))
+                is thumb)
+            self.assertFalse(
+                thumbnails.get_cached_thumbnail_from_file(h, (50, 50))
+                is thumb)